@@ -0,0 +1,231 @@
+"""
+EcoSage admission control — per-client token buckets and a weighted fair queue in front of the
+chat endpoints, so one noisy client cannot starve everyone else.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from metrics import Histogram
+
+
+class Rejected(Exception):
+    """Turned into a 429 with Retry-After."""
+
+    def __init__(self, kind: str, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.kind        = kind  # rate_limited | queue_full | client_queue_full | queue_timeout
+        self.retry_after = retry_after
+
+
+class TokenBuckets:
+    """One bucket per client (LRU-bounded): `rate` requests per second, bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate        = rate
+        self.burst       = burst
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()  # client -> (tokens, updated)
+
+    def take(self, client: str, cost: float = 1.0) -> Optional[float]:
+        """None if admitted, else seconds until `cost` tokens are available."""
+        if self.rate <= 0:
+            return None
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait   = None
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / self.rate
+        self._buckets[client] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class _Waiter:
+    __slots__ = ("client", "priority", "future", "enqueued")
+
+    def __init__(self, client: str, priority: str, future: asyncio.Future):
+        self.client   = client
+        self.priority = priority
+        self.future   = future
+        self.enqueued = time.monotonic()
+
+
+class FairQueue:
+    """Runs up to `capacity` requests at once. The rest wait in a bounded queue and are started in
+    order of virtual finish time (start-time fair queuing): each client's requests are spaced
+    1/weight apart, so clients share capacity evenly and a class with twice the weight gets
+    twice the share, however many requests any one client piles up."""
+
+    def __init__(self, capacity: int, max_waiting: int, max_per_client: int, queue_timeout: float,
+                 weights: dict[str, float]):
+        self.capacity       = capacity
+        self.max_waiting    = max_waiting
+        self.max_per_client = max_per_client
+        self.queue_timeout  = queue_timeout
+        self.weights        = weights
+        self.active   = 0
+        self.vtime    = 0.0
+        self.admitted = 0
+        self._heap: list[tuple[float, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._last: dict[str, float] = {}     # client -> finish tag of its newest waiter
+        self._queued: dict[str, int] = {}     # client -> waiters in the heap
+        self._by_class: dict[str, int] = {p: 0 for p in weights}
+
+    @property
+    def waiting(self) -> int:
+        return sum(self._queued.values())
+
+    @asynccontextmanager
+    async def slot(self, client: str, priority: str):
+        waited = await self._acquire(client, priority)
+        QUEUE_WAIT.labels(priority).observe(waited)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, client: str, priority: str) -> float:
+        if self.active < self.capacity and not self._heap:
+            self.active += 1
+            self.admitted += 1
+            return 0.0
+        if self.waiting >= self.max_waiting:
+            raise Rejected("queue_full", "admission queue is full", self.queue_timeout)
+        if self._queued.get(client, 0) >= self.max_per_client:
+            raise Rejected("client_queue_full", "too many queued requests for this client", self.queue_timeout)
+
+        waiter = _Waiter(client, priority, asyncio.get_running_loop().create_future())
+        tag    = max(self.vtime, self._last.get(client, 0.0)) + 1.0 / self.weights[priority]
+        self._last[client]      = tag
+        self._queued[client]    = self._queued.get(client, 0) + 1
+        self._by_class[priority] += 1
+        heapq.heappush(self._heap, (tag, next(self._seq), waiter))
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release()  # granted just as we gave up: pass the slot on
+            else:
+                waiter.future.cancel()
+                self._dequeued(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise Rejected("queue_timeout", "timed out in the admission queue", self.queue_timeout)
+        self.admitted += 1
+        return time.monotonic() - waiter.enqueued
+
+    def _dequeued(self, waiter: _Waiter):
+        self._by_class[waiter.priority] -= 1
+        self._queued[waiter.client] -= 1
+        if not self._queued[waiter.client]:
+            del self._queued[waiter.client]
+            if self._last.get(waiter.client, 0.0) <= self.vtime:
+                self._last.pop(waiter.client, None)
+
+    def _release(self):
+        while self._heap:
+            tag, _, waiter = heapq.heappop(self._heap)
+            if waiter.future.cancelled():
+                continue  # gave up while queued; already accounted for
+            self.vtime = tag
+            self._dequeued(waiter)
+            waiter.future.set_result(None)  # the slot passes straight to the waiter
+            return
+        self.active -= 1
+        self._last = {c: t for c, t in self._last.items() if t > self.vtime or c in self._queued}
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            **{f"waiting_{p}": n for p, n in self._by_class.items()},
+        }
+
+
+QUEUE_WAIT = Histogram("ecosage_admission_wait_seconds", "Time spent in the admission queue.", ("priority",))
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware: rate-limits and fair-queues requests to `paths`, holding the slot
+    until the response (including a streamed body) is complete. Rejections are 429s.
+
+    Requests to `batch_paths` are only rate-limited here: one batch fans out into many
+    generations, so the endpoint queues each of those itself, as the client found in
+    `scope["state"]["admission_client"]`."""
+
+    def __init__(self, app, buckets: TokenBuckets, queue: FairQueue, paths: tuple[str, ...],
+                 batch_paths: tuple[str, ...] = (), api_keys: frozenset = frozenset(),
+                 batch_keys: frozenset = frozenset(), trust_proxy: bool = False, on_reject=None):
+        self.app         = app
+        self.buckets     = buckets
+        self.queue       = queue
+        self.paths       = paths
+        self.batch_paths = batch_paths
+        self.api_keys    = api_keys | batch_keys
+        self.batch_keys  = batch_keys
+        self.trust_proxy = trust_proxy
+        self.on_reject   = on_reject
+
+    def identify(self, scope) -> tuple[str, str]:
+        """(client id, priority class). Known API keys identify clients; otherwise the remote
+        address, so made-up keys cannot mint fresh buckets or extra fair-queue shares."""
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        key = headers.get("x-api-key") or headers.get("authorization", "").removeprefix("Bearer ").strip()
+        if key not in self.api_keys:
+            key = ""
+        if key:
+            client = f"key:{key}"
+        elif self.trust_proxy and headers.get("x-forwarded-for"):
+            client = "ip:" + headers["x-forwarded-for"].split(",")[0].strip()
+        else:
+            client = "ip:" + (scope.get("client") or ("unknown",))[0]
+
+        batch = scope["path"] in self.batch_paths or key in self.batch_keys or headers.get("x-priority") == "batch"
+        return client, "batch" if batch else "interactive"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            return await self.app(scope, receive, send)
+
+        client, priority = self.identify(scope)
+        wait = self.buckets.take(client)
+        if wait is not None:
+            return await self.reject(send, Rejected("rate_limited", "rate limit exceeded", wait), priority)
+        if scope["path"] in self.batch_paths:
+            scope.setdefault("state", {})["admission_client"] = client
+            return await self.app(scope, receive, send)
+        try:
+            async with self.queue.slot(client, priority):
+                await self.app(scope, receive, send)
+        except Rejected as e:
+            await self.reject(send, e, priority)
+
+    async def reject(self, send, e: Rejected, priority: str):
+        if self.on_reject:
+            self.on_reject(e, priority)
+        body = json.dumps({"detail": str(e)}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(e.retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -3,17 +3,39 @@ EcoSage RAG Backend — Powered by Gemini API (google-genai SDK)
 """
 
 import os
+import json
+import hashlib
+import uuid
+import math
+import time
+import asyncio
+import itertools
 import logging
 from contextlib import asynccontextmanager
-from typing import Optional
+from typing import Awaitable, Callable, Iterable, NamedTuple, Optional
 
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
+from admission import AdmissionMiddleware, FairQueue, Rejected, TokenBuckets
+from cache import AnswerCache, SemanticCache, SingleFlight, make_key, normalize_question
+from chunking import Hit, make_snippet
+from extractive import extractive_answer
+from index_file import load_index
+from journal import JournalFollower, KnowledgeJournal, apply_mutation
+from knowledge import KnowledgeStore, Snapshot
+from llm import CircuitBreaker, CircuitOpen, ConcurrencyLimiter, GeminiProvider, LocalProvider, Overloaded, ResilientLLM
+from metrics import COUNT_BUCKETS, SIZE_BUCKETS, STAGE_SECONDS, CallbackGauge, Counter, Histogram, MetricsMiddleware, render, stage
+from prompt import HistorySummarizer, Prompt, PromptBuilder
+from querylog import QueryLog, QueryLogMiddleware, annotate
+from sessions import Turn, make_session_store
+from vectors import make_embedder
+
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("ecosage")
@@ -22,6 +44,94 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 LLM_MODEL      = os.getenv("LLM_MODEL", "gemini-2.0-flash")
 TOP_K_DOCS     = int(os.getenv("TOP_K_DOCS", "3"))
 
+RETRIEVER    = os.getenv("RETRIEVER", "keyword")    # keyword | vector | hybrid
+EMBEDDER     = os.getenv("EMBEDDER", "hashing")     # hashing | sentence-transformers:<model>
+EMBED_DIM    = int(os.getenv("EMBED_DIM", "256"))
+HYBRID_ALPHA = float(os.getenv("HYBRID_ALPHA", "0.5"))
+
+PASSAGE_CHARS        = int(os.getenv("PASSAGE_CHARS", "600"))
+PASSAGE_OVERLAP      = int(os.getenv("PASSAGE_OVERLAP", "100"))
+PASSAGE_DEPTH        = 4  # passages ranked per requested document, before per-doc de-duplication
+
+RETRIEVE_MAX_K     = 10   # GET /retrieve (search-as-you-type) result cap
+RETRIEVE_MAX_CHARS = 200
+
+DOCUMENTS_PAGE_SIZE = 100   # GET /documents default and maximum page sizes
+DOCUMENTS_MAX_PAGE  = 1000
+INSTANCE_ID = uuid.uuid4().hex[:8]  # ETags embed the knowledge version, which restarts with the process (without a journal)
+
+BULK_BATCH_DOCS = 500  # documents per published snapshot during bulk ingestion
+
+BATCH_MAX_ITEMS   = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "32"))  # generation calls in flight per /chat/batch request
+
+INDEX_PATH   = os.getenv("INDEX_PATH", "")            # prebuilt artifact from build_index.py
+INDEX_VERIFY = os.getenv("INDEX_VERIFY", "0") == "1"  # full sha256 check at startup
+
+KNOWLEDGE_JOURNAL       = os.getenv("KNOWLEDGE_JOURNAL", "")  # SQLite file shared by workers for document writes; empty = off
+KNOWLEDGE_SYNC_INTERVAL = float(os.getenv("KNOWLEDGE_SYNC_INTERVAL", "0.5"))  # seconds between journal polls
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0") == "1"  # per-stage Server-Timing response header
+
+QUERY_LOG         = os.getenv("QUERY_LOG", "")  # JSON-lines file of chat requests ("{pid}" = worker pid); empty = off
+QUERY_LOG_MAX_MB  = float(os.getenv("QUERY_LOG_MAX_MB", "64"))
+QUERY_LOG_BACKUPS = int(os.getenv("QUERY_LOG_BACKUPS", "5"))
+
+ADMISSION_RATE            = float(os.getenv("ADMISSION_RATE", "10"))   # requests/s per client; 0 = no rate limit
+ADMISSION_BURST           = float(os.getenv("ADMISSION_BURST", "40"))
+ADMISSION_CONCURRENCY     = int(os.getenv("ADMISSION_CONCURRENCY", "64"))  # chat requests served at once
+ADMISSION_MAX_WAITING     = int(os.getenv("ADMISSION_MAX_WAITING", "512"))
+ADMISSION_MAX_PER_CLIENT  = int(os.getenv("ADMISSION_MAX_PER_CLIENT", "32"))
+ADMISSION_QUEUE_TIMEOUT   = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5.0"))
+ADMISSION_WEIGHTS         = {"interactive": 4.0, "batch": 1.0}
+ADMISSION_API_KEYS        = frozenset(k for k in os.getenv("ADMISSION_API_KEYS", "").split(",") if k)  # keys that identify clients
+ADMISSION_BATCH_KEYS      = frozenset(k for k in os.getenv("ADMISSION_BATCH_KEYS", "").split(",") if k)
+TRUST_PROXY               = os.getenv("TRUST_PROXY", "0") == "1"  # take client IPs from X-Forwarded-For
+
+SESSION_BACKEND      = os.getenv("SESSION_BACKEND", "memory")  # memory | sqlite
+SESSION_DB           = os.getenv("SESSION_DB", "sessions.db")
+SESSION_MAX_MB       = float(os.getenv("SESSION_MAX_MB", "64"))
+SESSION_TTL          = float(os.getenv("SESSION_TTL", "3600"))  # idle seconds before a session is dropped
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", "50"))
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "256"))
+LLM_MAX_WAITING     = int(os.getenv("LLM_MAX_WAITING", "512"))
+LLM_QUEUE_TIMEOUT   = float(os.getenv("LLM_QUEUE_TIMEOUT", "2.0"))
+LLM_TIMEOUT         = float(os.getenv("LLM_TIMEOUT", "30.0"))          # total, across retries and hedges
+
+LLM_PROVIDER        = os.getenv("LLM_PROVIDER", "gemini")               # gemini | local (offline stand-in)
+LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "12.0"))
+LLM_RETRIES         = int(os.getenv("LLM_RETRIES", "2"))
+LLM_RETRY_BACKOFF   = float(os.getenv("LLM_RETRY_BACKOFF", "0.25"))
+LLM_HEDGE           = os.getenv("LLM_HEDGE", "0") == "1"
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1.0"))
+BREAKER_FAILURES    = int(os.getenv("BREAKER_FAILURES", "5"))           # consecutive failures; 0 disables
+BREAKER_RESET       = float(os.getenv("BREAKER_RESET", "15.0"))
+
+ANSWER_DEADLINE   = float(os.getenv("ANSWER_DEADLINE", "0"))  # seconds before an extractive answer is served; 0 = off
+EXTRACTIVE_MODEL  = "ecosage-extractive"
+
+LOCAL_LLM_LATENCY    = float(os.getenv("LOCAL_LLM_LATENCY", "0.3"))
+LOCAL_LLM_JITTER     = float(os.getenv("LOCAL_LLM_JITTER", "0.1"))
+LOCAL_LLM_ERROR_RATE = float(os.getenv("LOCAL_LLM_ERROR_RATE", "0.0"))
+LOCAL_LLM_SLOW_RATE  = float(os.getenv("LOCAL_LLM_SLOW_RATE", "0.0"))
+
+ANSWER_CACHE_ENTRIES = int(os.getenv("ANSWER_CACHE_ENTRIES", "2048"))
+ANSWER_CACHE_MB      = float(os.getenv("ANSWER_CACHE_MB", "32"))
+ANSWER_CACHE_TTL     = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+
+SEMANTIC_CACHE_ENTRIES     = int(os.getenv("SEMANTIC_CACHE_ENTRIES", "0"))  # past questions matched by embedding; 0 = off
+SEMANTIC_CACHE_MB          = float(os.getenv("SEMANTIC_CACHE_MB", "16"))
+SEMANTIC_CACHE_THRESHOLD   = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))    # minimum cosine similarity
+SEMANTIC_CACHE_MIN_OVERLAP = float(os.getenv("SEMANTIC_CACHE_MIN_OVERLAP", "0.5"))  # Jaccard of retrieved doc ids
+
+HISTORY_TURNS     = 6  # most recent messages that may be sent verbatim
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))   # estimated input tokens per request
+HISTORY_TOKEN_SHARE = float(os.getenv("HISTORY_TOKEN_SHARE", "0.3"))  # of what the system prompt and question leave
+QUESTION_MAX_TOKENS = int(os.getenv("QUESTION_MAX_TOKENS", "300"))
+GENERATION_PARAMS = {"max_output_tokens": 512, "temperature": 0.7}
+
 SYSTEM_PROMPT = """You are EcoSage, a warm and knowledgeable sustainability advisor.
 Your role is to help people live more eco-friendly lives and understand environmental issues.
 Only discuss topics related to environment, sustainability, ecology, climate, and resources.
@@ -30,22 +140,86 @@ Respond warmly and practically. Give concrete, actionable advice.
 Keep it concise (3-6 sentences or a short list).
 End with one small action the person can take TODAY."""
 
-knowledge_docs: list[dict] = []
-gemini_client = None
+prompt_builder = PromptBuilder(SYSTEM_PROMPT, PROMPT_TOKEN_BUDGET, HISTORY_TOKEN_SHARE, HISTORY_TURNS,
+                               QUESTION_MAX_TOKENS, HistorySummarizer())
+
+knowledge: Optional[KnowledgeStore] = None
+llm: Optional[ResilientLLM] = None
+llm_limiter: Optional[ConcurrencyLimiter] = None
+sessions = None
+knowledge_sync: Optional[JournalFollower] = None
+semantic_cache: Optional[SemanticCache] = None
+answer_cache = AnswerCache(ANSWER_CACHE_ENTRIES, int(ANSWER_CACHE_MB * 1024 * 1024), ANSWER_CACHE_TTL)
+inflight     = SingleFlight()
+query_log    = QueryLog(QUERY_LOG, int(QUERY_LOG_MAX_MB * 1024 * 1024), QUERY_LOG_BACKUPS) if QUERY_LOG else None
+rate_limits  = TokenBuckets(ADMISSION_RATE, ADMISSION_BURST)
+admission    = FairQueue(ADMISSION_CONCURRENCY, ADMISSION_MAX_WAITING, ADMISSION_MAX_PER_CLIENT,
+                         ADMISSION_QUEUE_TIMEOUT, ADMISSION_WEIGHTS)
+
+
+UPSTREAM_ERRORS = Counter("ecosage_upstream_errors_total", "Failed or rejected generation calls.", ("kind",))
+REJECTED        = Counter("ecosage_admission_rejected_total", "Requests turned away with 429.", ("reason", "priority"))
+DEGRADED        = Counter("ecosage_degraded_answers_total", "Extractive answers served instead of generated ones.", ("reason",))
+PROMPT_TOKENS   = Histogram("ecosage_prompt_tokens", "Estimated input tokens per request, by prompt part.", ("part",), buckets=SIZE_BUCKETS)
+ANSWER_CHARS    = Histogram("ecosage_answer_chars", "Characters generated per answer.", buckets=SIZE_BUCKETS)
+DOCS_RETRIEVED  = Histogram("ecosage_docs_retrieved", "Documents returned by retrieval per query.", buckets=COUNT_BUCKETS)
+CallbackGauge("ecosage_llm_calls", "LLM limiter state.", ("state",),
+              lambda: {(k,): v for k, v in llm_limiter.stats().items()} if llm_limiter else {})
+CallbackGauge("ecosage_llm_resilience", "Upstream attempts, retries, hedges and circuit breaker state.", ("stat",),
+              lambda: {(k,): v for k, v in llm.stats().items() if isinstance(v, (int, float)) and not isinstance(v, bool)} if llm else {})
+CallbackGauge("ecosage_llm_circuit_open", "1 while the upstream circuit breaker is failing fast.", (),
+              lambda: {(): int(llm.breaker.state != "closed")} if llm else {})
+CallbackGauge("ecosage_admission", "Admission queue: capacity, active and waiting requests.", ("stat",),
+              lambda: {(k,): v for k, v in admission.stats().items()})
+CallbackGauge("ecosage_answer_cache", "Answer cache counters.", ("stat",),
+              lambda: {(k,): v for k, v in answer_cache.stats().items()})
+CallbackGauge("ecosage_semantic_cache", "Semantic answer cache counters.", ("stat",),
+              lambda: {(k,): v for k, v in semantic_cache.stats().items()} if semantic_cache else {})
+CallbackGauge("ecosage_single_flight", "Coalesced generation calls.", ("stat",),
+              lambda: {(k,): v for k, v in inflight.stats().items()})
+CallbackGauge("ecosage_history_summaries", "Rolling history summary cache.", ("stat",),
+              lambda: {(k,): v for k, v in prompt_builder.summarizer.stats().items()})
+CallbackGauge("ecosage_query_log", "Structured query log writer.", ("stat",),
+              lambda: {(k,): v for k, v in query_log.stats().items()} if query_log else {})
+CallbackGauge("ecosage_sessions", "Conversation session store.", ("stat",),
+              lambda: {(k,): v for k, v in sessions.stats().items() if k != "backend"} if sessions else {})
+CallbackGauge("ecosage_knowledge", "Knowledge base size and version.", ("stat",),
+              lambda: {("documents",): knowledge.snapshot.doc_count, ("passages",): knowledge.snapshot.n_passages,
+                       ("document_bytes",): knowledge.snapshot.docs.nbytes, ("version",): knowledge.snapshot.version}
+                      if knowledge else {})
+CallbackGauge("ecosage_knowledge_journal", "Knowledge journal revision and entries synced from other workers.", ("stat",),
+              lambda: {(k,): v for k, v in knowledge_sync.stats().items() if k != "journal"} if knowledge_sync else {})
+
+
+def retrieve_docs_batch(queries: list[str], top_k: int = TOP_K_DOCS, snapshot: Optional[Snapshot] = None,
+                        category: Optional[str] = None) -> list[list[Hit]]:
+    snapshot = snapshot or knowledge.snapshot
+    with stage("retrieve"):
+        results = snapshot.retrieve(queries, top_k, top_k * PASSAGE_DEPTH, category=category)
+    for hits in results:
+        DOCS_RETRIEVED.observe(len(hits))
+    return results
+
 
+def retrieve_docs(query: str, top_k: int = TOP_K_DOCS, snapshot: Optional[Snapshot] = None,
+                  category: Optional[str] = None) -> list[Hit]:
+    return retrieve_docs_batch([query], top_k, snapshot, category)[0]
 
-def retrieve_docs(query: str, top_k: int = TOP_K_DOCS) -> list[dict]:
-    query_words = set(query.lower().split())
-    stop_words  = {"how", "can", "i", "the", "a", "an", "is", "to", "do", "what", "my", "me"}
-    query_words -= stop_words
-    scored = []
-    for doc in knowledge_docs:
-        text  = (doc["title"] + " " + doc["content"]).lower()
-        score = sum(1 for w in query_words if w in text)
-        if score > 0:
-            scored.append((score, doc))
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [doc for _, doc in scored[:top_k]]
+
+def log_query(question: str, category: Optional[str], retrieved: list[Hit], session_id: str):
+    # sessions are logged by hash: a raw id would let log readers open the conversation
+    annotate(question=question, category=category, session=hashlib.sha256(session_id.encode()).hexdigest()[:16],
+             retrieved=[[hit.doc["id"], round(hit.score, 4)] for hit in retrieved])
+
+
+def resolve_category(category: Optional[str], snapshot: Snapshot) -> Optional[str]:
+    """Normalised category filter (None = all); 400 for a category with no documents."""
+    if category is None or not category.strip():
+        return None
+    category = category.strip().lower()
+    if category not in snapshot.categories:
+        raise HTTPException(status_code=400, detail=f"Unknown category '{category}'. Known: {', '.join(snapshot.categories)}")
+    return category
 
 
 class ChatMessage(BaseModel):
@@ -54,54 +228,154 @@ class ChatMessage(BaseModel):
 
 class ChatRequest(BaseModel):
     message: str
-    history: list[ChatMessage] = []
+    session_id: Optional[str] = None   # from a previous response; the server keeps the history
+    history: list[ChatMessage] = []    # only read to seed a new session (and by /chat/batch)
+    deadline: Optional[float] = None   # seconds; overrides ANSWER_DEADLINE, 0 disables degraded answers
+    category: Optional[str] = None     # only retrieve from this knowledge base category
+
+class ChatBatchRequest(BaseModel):
+    items: list[ChatRequest]
+    stream: bool = False  # NDJSON lines in completion order instead of one ordered JSON body
 
 class ChatResponse(BaseModel):
     answer: str
     retrieved_docs: list[dict]
     model: str
+    degraded: bool = False                 # extractive answer served because generation was too slow or failed
+    degraded_reason: Optional[str] = None  # deadline | circuit_open | overloaded | timeout | upstream_error
+    session_id: Optional[str] = None
+
+class DocumentIn(BaseModel):
+    id: Optional[str] = None
+    title: str
+    content: str
+    category: str = "general"
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global knowledge_docs, gemini_client
+    global llm, llm_limiter, knowledge, sessions, knowledge_sync, semantic_cache
 
-    if not GEMINI_API_KEY:
+    if LLM_PROVIDER == "gemini" and not GEMINI_API_KEY:
         raise RuntimeError("GEMINI_API_KEY is not set in your .env file!")
+    if LLM_PROVIDER not in ("gemini", "local"):
+        raise RuntimeError(f"LLM_PROVIDER must be gemini or local (got '{LLM_PROVIDER}')")
+    if RETRIEVER not in ("keyword", "vector", "hybrid"):
+        raise RuntimeError(f"RETRIEVER must be keyword, vector or hybrid (got '{RETRIEVER}')")
+
+    if LLM_PROVIDER == "gemini":
+        provider = GeminiProvider(genai.Client(api_key=GEMINI_API_KEY), LLM_MODEL)
+    else:
+        provider = LocalProvider(LOCAL_LLM_LATENCY, LOCAL_LLM_JITTER, LOCAL_LLM_ERROR_RATE, LOCAL_LLM_SLOW_RATE)
+        logger.warning("🧪 LLM_PROVIDER=local: answers come from the offline stand-in, not Gemini")
+    llm_limiter   = ConcurrencyLimiter(LLM_MAX_CONCURRENCY, LLM_QUEUE_TIMEOUT, LLM_MAX_WAITING)
+    llm           = ResilientLLM(provider, llm_limiter, LLM_TIMEOUT, LLM_ATTEMPT_TIMEOUT, LLM_RETRIES, LLM_RETRY_BACKOFF,
+                                 LLM_HEDGE, LLM_HEDGE_MIN_DELAY, CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET))
+    if query_log:
+        query_log.start()
+        logger.info(f"🗒️ Logging chat requests to {query_log.path}")
+    sessions      = make_session_store(SESSION_BACKEND, SESSION_DB, int(SESSION_MAX_MB * 1024 * 1024), SESSION_TTL, SESSION_MAX_MESSAGES)
 
-    gemini_client = genai.Client(api_key=GEMINI_API_KEY)
+    embedder  = make_embedder(EMBEDDER, EMBED_DIM) if RETRIEVER != "keyword" else None
+    knowledge = KnowledgeStore(RETRIEVER, embedder, PASSAGE_CHARS, PASSAGE_OVERLAP, HYBRID_ALPHA)
+    if SEMANTIC_CACHE_ENTRIES > 0:
+        semantic_cache = SemanticCache(embedder or make_embedder(EMBEDDER, EMBED_DIM), SEMANTIC_CACHE_ENTRIES,
+                                       int(SEMANTIC_CACHE_MB * 1024 * 1024), ANSWER_CACHE_TTL,
+                                       SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MIN_OVERLAP)
 
-    from knowledge_base import SUSTAINABILITY_DOCS
-    knowledge_docs = SUSTAINABILITY_DOCS
-    logger.info(f"✅ Loaded {len(knowledge_docs)} docs. Model: {LLM_MODEL}")
+    manifest = {}
+    if INDEX_PATH and os.path.exists(os.path.join(INDEX_PATH, "manifest.json")):
+        manifest = load_index(INDEX_PATH, knowledge, EMBEDDER, INDEX_VERIFY)
+        logger.info(f"💾 Mapped index {INDEX_PATH} (built {manifest['created']})")
+    else:
+        if INDEX_PATH:
+            logger.warning(f"⚠️ No index at {INDEX_PATH}, building from knowledge_base.py (run build_index.py)")
+        from knowledge_base import SUSTAINABILITY_DOCS
+        knowledge.upsert(SUSTAINABILITY_DOCS)
+
+    sync_task = None
+    if KNOWLEDGE_JOURNAL:
+        journal = KnowledgeJournal(KNOWLEDGE_JOURNAL)
+        folded  = manifest.get("journal") or {}
+        start   = folded.get("seq", 0) if folded.get("id") == journal.id else 0
+        knowledge_sync = JournalFollower(journal, knowledge, start, lambda n, ids: knowledge_changed("Synced", n, ids),
+                                         KNOWLEDGE_SYNC_INTERVAL)
+        await knowledge_sync.catch_up()
+        sync_task = asyncio.create_task(knowledge_sync.run())
+        logger.info(f"🔗 Following knowledge journal {KNOWLEDGE_JOURNAL} at revision {knowledge_sync.applied}")
+    snap = knowledge.snapshot
+    logger.info(f"✅ Loaded {snap.doc_count} docs as {snap.n_passages} passages (retriever: {RETRIEVER}). Model: {LLM_MODEL}")
 
     yield
+    if sync_task:
+        sync_task.cancel()
+        knowledge_sync.journal.close()
+    sessions.close()
+    if query_log:
+        query_log.close()
     logger.info("🌿 EcoSage shutting down.")
 
 
 app = FastAPI(title="EcoSage API — Gemini Edition", version="5.0.0", lifespan=lifespan)
 
+def admission_rejected(e, priority: str):
+    REJECTED.labels(e.kind, priority).inc()
+    annotate(rejected=e.kind, priority=priority)
+    logger.warning(f"🚦 Rejected {priority} request: {e}")
+
+
+app.add_middleware(
+    AdmissionMiddleware,
+    buckets=rate_limits,
+    queue=admission,
+    paths=("/chat",),
+    batch_paths=("/chat/batch",),
+    api_keys=ADMISSION_API_KEYS,
+    batch_keys=ADMISSION_BATCH_KEYS,
+    trust_proxy=TRUST_PROXY,
+    on_reject=admission_rejected,
+)
+if query_log:
+    app.add_middleware(QueryLogMiddleware, log=query_log, paths=("/chat",))  # inside metrics, outside admission
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Cache", "X-Prompt-Tokens", "Retry-After", "ETag"],
 )
+app.add_middleware(MetricsMiddleware, server_timing=SERVER_TIMING)
 
 
 @app.get("/")
 async def root():
-    return {"name": "EcoSage API", "version": "5.0.0", "model": LLM_MODEL, "documents": len(knowledge_docs), "status": "ready"}
+    return {"name": "EcoSage API", "version": "5.0.0", "model": LLM_MODEL, "documents": knowledge.snapshot.doc_count, "status": "ready"}
 
 @app.get("/health")
 async def health():
-    return {"status": "ok", "model": LLM_MODEL, "documents_indexed": len(knowledge_docs)}
+    return {
+        "status": "ok",
+        "model": LLM_MODEL,
+        "documents_indexed": knowledge.snapshot.doc_count,
+        "knowledge_version": knowledge.snapshot.version,
+        "knowledge_journal": knowledge_sync.stats() if knowledge_sync else None,
+        "llm": {**llm_limiter.stats(), **llm.stats()} if llm else None,
+        "answer_cache": answer_cache.stats(),
+        "semantic_cache": semantic_cache.stats() if semantic_cache else None,
+        "single_flight": inflight.stats(),
+        "admission": admission.stats(),
+        "sessions": sessions.stats() if sessions else None,
+    }
 
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    if not gemini_client:
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+
+def prepare_question(request: ChatRequest) -> str:
+    if not llm:
         raise HTTPException(status_code=503, detail="Gemini client not initialised")
 
     question = request.message.strip()
@@ -109,49 +383,642 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=400, detail="Message cannot be empty")
 
     logger.info(f"🔍 Query: {question[:80]}")
+    return question
+
+
+async def session_io(fn, *args):
+    return await asyncio.to_thread(fn, *args) if sessions.blocking else fn(*args)
+
+
+async def load_session(request: ChatRequest) -> tuple[str, list[Turn]]:
+    """(session id, history) for a chat turn. Unknown or expired ids start a fresh session,
+    seeded from `request.history` so clients that still send it keep their context."""
+    if request.session_id:
+        turns = await session_io(sessions.get, request.session_id)
+        if turns is not None:
+            return request.session_id, turns
+        logger.info("🗂 Session expired or unknown, starting a new one")
+    turns = [Turn(m.role, m.content) for m in request.history]
+    return await session_io(sessions.create, turns), turns
+
+
+async def remember(session_id: str, question: str, answer: str):
+    await session_io(sessions.append, session_id, [Turn("user", question), Turn("assistant", answer)])
+
+
+def with_session(body: bytes, session_id: str) -> bytes:
+    """Splice the session id into a serialized ChatResponse (cached bodies are shared across sessions)."""
+    return body[:-1] + b',"session_id":' + json.dumps(session_id).encode() + b"}"
+
+
+def build_contents(prompt: Prompt) -> list[types.Content]:
+    contents = [
+        types.Content(role="user" if turn.role == "user" else "model", parts=[types.Part(text=turn.content)])
+        for turn in prompt.history
+    ]
+    for part, tokens in prompt.tokens.items():
+        PROMPT_TOKENS.labels(part).observe(tokens)
+    return contents + [types.Content(role="user", parts=[types.Part(text=prompt.user_text)])]
+
+
+def build_sources(question: str, retrieved: list[Hit]) -> list[dict]:
+    sources = []
+    for hit in retrieved:
+        passage = hit.passages[0][0]
+        snippet, highlights = make_snippet(hit.doc, passage, question)
+        sources.append({
+            "id": hit.doc["id"],
+            "title": hit.doc["title"],
+            "category": hit.doc["category"],
+            "score": round(hit.score, 3),
+            "passage_id": passage.id,
+            "snippet": snippet,
+            "highlights": highlights,
+        })
+    return sources
+
+
+def generation_config() -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(system_instruction=SYSTEM_PROMPT, **GENERATION_PARAMS)
+
+
+def answer_key(question: str, retrieved: list[Hit], prompt: Prompt, version: int) -> str:
+    return make_key(
+        normalize_question(question),
+        [p.id for hit in retrieved for p, _ in hit.passages],
+        prompt.cache_parts,
+        LLM_MODEL,
+        SYSTEM_PROMPT,
+        GENERATION_PARAMS,
+        version,
+    )
+
+
+def cache_mode(http_request: Request) -> tuple[bool, bool]:
+    """(read, write) from the request's Cache-Control: no-cache skips lookup, no-store skips both."""
+    directives = http_request.headers.get("cache-control", "").lower()
+    no_store   = "no-store" in directives
+    return not (no_store or "no-cache" in directives), not no_store
+
+
+def semantic_lookup(question: str, retrieved: list[Hit], history: list, read: bool, write: bool):
+    """(embedding, cached answer) for a question without history; the embedding is None when
+    the semantic cache is off or not applicable, so the answer is not stored either."""
+    if semantic_cache is None or history or not retrieved or not (read or write):
+        return None, None
+    vec = semantic_cache.embed(question)
+    hit = semantic_cache.get(vec, [hit.doc["id"] for hit in retrieved]) if read else None
+    if hit is None:
+        return vec, None
+    annotate(semantic_similarity=round(hit[1], 4))
+    return vec, hit[0]
+
+
+def semantic_store(vec, retrieved: list[Hit], answer: str):
+    if vec is not None and answer:
+        semantic_cache.put(vec, [hit.doc["id"] for hit in retrieved], answer, 2 * len(answer) + 4 * len(vec) + 64)
+
+
+class CacheLookup(NamedTuple):
+    key: str                               # answer cache key, also the single-flight key
+    read: bool
+    write: bool
+    cached: Optional[tuple[str, bytes]]    # exact hit: (answer, serialized ChatResponse)
+    similar: Optional[str]                 # semantic hit
+    vec: Optional[object]                  # question embedding for the semantic cache
+
+    @property
+    def status(self) -> str:
+        """X-Cache value: HIT, SEMANTIC, MISS, or BYPASS when Cache-Control skipped the lookup."""
+        if self.cached is not None:
+            return "HIT"
+        if self.similar is not None:
+            return "SEMANTIC"
+        return "MISS" if self.read else "BYPASS"
+
+
+def lookup_answer(http_request: Request, question: str, retrieved: list[Hit], prompt: Prompt,
+                  history: list, version: int) -> CacheLookup:
+    """Exact answer cache first, then the semantic cache, as the request's Cache-Control allows."""
+    key = answer_key(question, retrieved, prompt, version)
+    read, write = cache_mode(http_request)
+    cached = answer_cache.get(key) if read else None
+    vec, similar = semantic_lookup(question, retrieved, history, read, write) if cached is None else (None, None)
+    return CacheLookup(key, read, write, cached, similar, vec)
+
+
+def response_body(answer: str, sources: list[dict], model: str = LLM_MODEL, **fields) -> bytes:
+    """Serialized ChatResponse, as sent by /chat and kept in the answer cache."""
+    return ChatResponse(answer=answer, retrieved_docs=sources, model=model, **fields).model_dump_json(exclude_none=True).encode()
 
-    retrieved = retrieve_docs(question)
 
-    context = ""
-    if retrieved:
-        context = "\n\n".join(
-            f"[{doc['title']}]\n{doc['content'].strip()}" for doc in retrieved
-        )
-        context = f"Relevant knowledge base context:\n{context}\n\n"
+def store_answer(lookup: CacheLookup, retrieved: list[Hit], sources: list[dict], answer: str,
+                 body: Optional[bytes] = None):
+    """Cache a freshly generated answer (and its serialized response) under both caches."""
+    if lookup.write and answer:
+        answer_cache.put(lookup.key, (answer, body or response_body(answer, sources)), answer_size(answer, sources))
+        semantic_store(lookup.vec, retrieved, answer)
 
-    # Build history for Gemini
-    history = []
-    for msg in request.history[-6:]:
-        role = "user" if msg.role == "user" else "model"
-        history.append(types.Content(role=role, parts=[types.Part(text=msg.content)]))
 
-    user_content = f"{context}User question: {question}"
+def answer_size(answer: str, sources: list[dict]) -> int:
+    """Rough footprint of a cached (answer, serialized response) pair."""
+    return 2 * len(answer) + sum(len(src["title"]) + len(src["snippet"]) + 64 for src in sources)
 
+
+def overloaded_error(e: Overloaded) -> HTTPException:
+    logger.warning(f"⏳ Generation rejected: {e}")
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+
+
+def generation_error(e: Exception) -> HTTPException:
+    if isinstance(e, Overloaded):
+        return overloaded_error(e)
+    if isinstance(e, Rejected):  # a batch item turned away by the admission queue
+        return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))})
+    if isinstance(e, asyncio.TimeoutError):
+        logger.error(f"⌛ Gemini timed out after {LLM_TIMEOUT}s")
+        return HTTPException(status_code=504, detail=f"Gemini did not answer within {LLM_TIMEOUT}s")
+    logger.error(f"❌ Gemini API error: {e}")
+    return HTTPException(status_code=502, detail=f"Gemini API error: {str(e)}")
+
+
+def count_upstream_error(e: BaseException):
+    if isinstance(e, CircuitOpen):
+        kind = "circuit_open"
+    elif isinstance(e, Overloaded):
+        kind = "overloaded"
+    else:
+        kind = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+    UPSTREAM_ERRORS.labels(kind).inc()
+    annotate(upstream_error=kind)
+
+
+async def generate_answer(contents: list[types.Content]) -> str:
     try:
-        response = gemini_client.models.generate_content(
-            model=LLM_MODEL,
-            contents=history + [types.Content(role="user", parts=[types.Part(text=user_content)])],
-            config=types.GenerateContentConfig(
-                system_instruction=SYSTEM_PROMPT,
-                max_output_tokens=512,
-                temperature=0.7,
-            ),
-        )
-        answer = response.text
+        with stage("upstream"):
+            answer = await llm.generate(contents, generation_config())
     except Exception as e:
-        logger.error(f"❌ Gemini API error: {e}")
-        raise HTTPException(status_code=502, detail=f"Gemini API error: {str(e)}")
+        count_upstream_error(e)
+        raise
+    ANSWER_CHARS.observe(len(answer))
+    return answer
 
-    logger.info(f"✅ Answered. Sources: {[d['title'] for d in retrieved]}")
 
-    sources = [
-        {"id": doc["id"], "title": doc["title"], "category": doc["category"], "score": None, "snippet": doc["content"][:200] + "..."}
-        for doc in retrieved
-    ]
+def answer_deadline(request: ChatRequest, retrieved: list[Hit]) -> Optional[float]:
+    """Seconds allowed for generation before degrading, or None when degraded answers are off
+    (or impossible: nothing was retrieved to extract from)."""
+    deadline = ANSWER_DEADLINE if request.deadline is None else request.deadline
+    return min(deadline, LLM_TIMEOUT) if deadline > 0 and retrieved else None
+
+
+def degraded_reason(e: BaseException) -> str:
+    if isinstance(e, CircuitOpen):
+        return "circuit_open"
+    if isinstance(e, (Overloaded, Rejected)):
+        return "overloaded"
+    return "timeout" if isinstance(e, asyncio.TimeoutError) else "upstream_error"
+
+
+async def generate_within(run: Callable[[], Awaitable[str]], timeout: Optional[float],
+                          on_late: Optional[Callable[[str], None]] = None) -> tuple[Optional[str], Optional[str]]:
+    """(answer, None), or (None, reason) when generation failed or missed `timeout` and degraded
+    answers are allowed. Generation that misses the deadline keeps running and hands its answer to `on_late`."""
+    task = asyncio.ensure_future(run())
+    if timeout is None:
+        return await task, None
+    try:
+        done, _ = await asyncio.wait({task}, timeout=max(timeout, 0.0))
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    if not done:
+        def finished(t: asyncio.Task):
+            if not t.cancelled() and t.exception() is None and on_late:
+                on_late(t.result())
+        task.add_done_callback(finished)
+        return None, "deadline"
+    if task.exception() is not None:
+        generation_error(task.exception())  # logs it
+        return None, degraded_reason(task.exception())
+    return task.result(), None
+
+
+def degrade(question: str, retrieved: list[Hit], reason: str) -> str:
+    DEGRADED.labels(reason).inc()
+    annotate(degraded=reason)
+    logger.warning(f"🩹 Serving extractive answer ({reason})")
+    with stage("extract"):
+        return extractive_answer(question, retrieved)
+
+
+@app.get("/retrieve")
+async def retrieve(q: str, k: int = TOP_K_DOCS, prefix: bool = True, category: Optional[str] = None):
+    """Ranked documents for a partial or misspelled query, without generation: cheap enough to
+    call on every keystroke. `prefix` completes the last word ("insul" -> "insulation")."""
+    if not knowledge:
+        raise HTTPException(status_code=503, detail="Knowledge base not loaded")
+    query    = q.strip()[:RETRIEVE_MAX_CHARS]
+    k        = max(1, min(k, RETRIEVE_MAX_K))
+    snapshot = knowledge.snapshot
+    category = resolve_category(category, snapshot)
+    with stage("retrieve"):
+        terms = snapshot.keyword.index.expand(query, prefix)
+        hits  = snapshot.retrieve([query], k, k * PASSAGE_DEPTH, prefix, category, [terms])[0] if query else []
+    return {
+        "query": query,
+        "terms": {t: round(w, 3) for t, w in terms.items()},
+        "version": snapshot.version,
+        "results": [
+            {"id": h.doc["id"], "title": h.doc["title"], "category": h.doc["category"], "score": round(h.score, 4)}
+            for h in hits
+        ],
+    }
+
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest, http_request: Request):
+    started   = time.monotonic()
+    question  = prepare_question(request)
+    with stage("session"):
+        session_id, history = await load_session(request)
+    snapshot  = knowledge.snapshot
+    category  = resolve_category(request.category, snapshot)
+    retrieved = retrieve_docs(question, snapshot=snapshot, category=category)
+    log_query(question, category, retrieved, session_id)
+
+    with stage("prompt"):
+        prompt = prompt_builder.build(question, retrieved, history)
+    with stage("cache"):
+        lookup = lookup_answer(http_request, question, retrieved, prompt, history, snapshot.version)
+    annotate(cache=lookup.status, prompt_tokens=prompt.tokens["total"])
+    if lookup.cached is not None:
+        await remember(session_id, question, lookup.cached[0])
+        return Response(content=with_session(lookup.cached[1], session_id), media_type="application/json", headers={"X-Cache": "HIT"})
+
+    with stage("sources"):
+        sources = build_sources(question, retrieved)
+    if lookup.similar is not None:
+        await remember(session_id, question, lookup.similar)
+        body = response_body(lookup.similar, sources)
+        return Response(content=with_session(body, session_id), media_type="application/json", headers={"X-Cache": "SEMANTIC"})
+
+    contents = build_contents(prompt)
+    deadline = answer_deadline(request, retrieved)
+    try:
+        with stage("generate"):
+            answer, reason = await generate_within(
+                lambda: inflight.do(lookup.key, lambda: generate_answer(contents)),
+                deadline - (time.monotonic() - started) if deadline is not None else None,
+                # the next identical question gets the full answer
+                on_late=lambda answer: store_answer(lookup, retrieved, sources, answer),
+            )
+    except Exception as e:
+        raise generation_error(e)
+
+    headers = {"X-Cache": lookup.status, "X-Prompt-Tokens": str(prompt.tokens["total"])}
+    if reason is not None:
+        answer = degrade(question, retrieved, reason)
+        await remember(session_id, question, answer)
+        body = response_body(answer, sources, model=EXTRACTIVE_MODEL, degraded=True, degraded_reason=reason)
+        return Response(content=with_session(body, session_id), media_type="application/json", headers=headers)
+
+    logger.info(f"✅ Answered. Sources: {[hit.doc['title'] for hit in retrieved]}")
+    await remember(session_id, question, answer)
+    with stage("serialize"):
+        body = response_body(answer, sources)
+    store_answer(lookup, retrieved, sources, answer, body)
+    return Response(content=with_session(body, session_id), media_type="application/json", headers=headers)
+
+
+@app.post("/chat/batch")
+async def chat_batch(request: ChatBatchRequest, http_request: Request):
+    """Many questions in one round trip: a single retrieval pass for the whole batch, then up to
+    BATCH_CONCURRENCY generations at a time. Each generation waits for its own admission slot as
+    batch traffic, so a large batch gets one client's share of capacity rather than crowding out
+    interactive chats. Failures are reported per item, never for the batch."""
+    if not llm:
+        raise HTTPException(status_code=503, detail="Gemini client not initialised")
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Batch cannot be empty")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch has {len(request.items)} items; the limit is {BATCH_MAX_ITEMS}")
+
+    started   = time.monotonic()
+    questions = [item.message.strip() for item in request.items]
+    snapshot  = knowledge.snapshot
+    invalid: dict[int, str] = {}
+    groups: dict[Optional[str], list[int]] = {}  # one retrieval pass per category filter
+    for i, (question, item) in enumerate(zip(questions, request.items)):
+        try:
+            if not question:
+                raise HTTPException(status_code=400, detail="Message cannot be empty")
+            groups.setdefault(resolve_category(item.category, snapshot), []).append(i)
+        except HTTPException as e:
+            invalid[i] = e.detail
+    retrieved: dict[int, list[Hit]] = {}
+    for category, indices in groups.items():
+        retrieved.update(zip(indices, retrieve_docs_batch([questions[i] for i in indices], snapshot=snapshot, category=category)))
+    gate   = asyncio.Semaphore(BATCH_CONCURRENCY)
+    client = http_request.state.admission_client
+    logger.info(f"📦 Batch of {len(questions)} questions ({len(invalid)} invalid)")
+    annotate(items=len(questions), questions=questions, invalid=len(invalid))
+
+    async def answer_item(i: int) -> dict:
+        if i in invalid:
+            return {"index": i, "error": {"status": 400, "detail": invalid[i]}}
+        question, docs, history = questions[i], retrieved[i], request.items[i].history
+        prompt  = prompt_builder.build(question, docs, history)
+        lookup  = lookup_answer(http_request, question, docs, prompt, history, snapshot.version)
+        sources = build_sources(question, docs)
+        result  = {"index": i, "retrieved_docs": sources, "cached": lookup.status in ("HIT", "SEMANTIC"),
+                   "prompt_tokens": prompt.tokens["total"]}
+        if lookup.cached is not None:
+            return {**result, "answer": lookup.cached[0]}
+        if lookup.similar is not None:
+            return {**result, "answer": lookup.similar, "semantic": True}
+
+        async def gated() -> str:
+            async with gate:
+                try:
+                    async with admission.slot(client, "batch"):
+                        return await inflight.do(lookup.key, lambda: generate_answer(contents))
+                except Rejected as e:
+                    admission_rejected(e, "batch")
+                    raise
+
+        contents = build_contents(prompt)
+        deadline = answer_deadline(request.items[i], docs)
+        try:
+            answer, reason = await generate_within(
+                gated, deadline - (time.monotonic() - started) if deadline is not None else None,
+                on_late=lambda answer: store_answer(lookup, docs, sources, answer),
+            )
+        except Exception as e:
+            err   = generation_error(e)
+            error = {"status": err.status_code, "detail": err.detail}
+            if isinstance(e, (Overloaded, Rejected)):
+                error["retry_after"] = e.retry_after
+            return {"index": i, "error": error}
+        if reason is not None:
+            return {**result, "answer": degrade(question, docs, reason), "degraded": True, "degraded_reason": reason}
+        store_answer(lookup, docs, sources, answer)
+        return {**result, "answer": answer}
+
+    if not request.stream:
+        results = await asyncio.gather(*(answer_item(i) for i in range(len(questions))))
+        failed  = sum(1 for r in results if "error" in r)
+        annotate(failed=failed, degraded=sum(1 for r in results if r.get("degraded")))
+        logger.info(f"✅ Batch answered: {len(results) - failed} ok, {failed} failed")
+        return {"model": LLM_MODEL, "count": len(results), "failed": failed, "results": results}
+
+    async def lines():
+        tasks = [asyncio.ensure_future(answer_item(i)) for i in range(len(questions))]
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield json.dumps({**await done, "model": LLM_MODEL}) + "\n"
+        finally:
+            for task in tasks:  # client went away: stop the remaining generations
+                task.cancel()
 
-    return ChatResponse(answer=answer, retrieved_docs=sources, model=LLM_MODEL)
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """Server-sent events: `sources` first, then `delta` chunks, then `done` (or `error`).
+    With a deadline, a stream that has produced no text by then gets an extractive answer instead."""
+    received  = time.monotonic()
+    question  = prepare_question(request)
+    with stage("session"):
+        session_id, history = await load_session(request)
+    snapshot  = knowledge.snapshot
+    category  = resolve_category(request.category, snapshot)
+    retrieved = retrieve_docs(question, snapshot=snapshot, category=category)
+    log_query(question, category, retrieved, session_id)
+    with stage("sources"):
+        sources = build_sources(question, retrieved)
+
+    with stage("prompt"):
+        prompt = prompt_builder.build(question, retrieved, history)
+    with stage("cache"):
+        lookup = lookup_answer(http_request, question, retrieved, prompt, history, snapshot.version)
+    annotate(cache=lookup.status, prompt_tokens=prompt.tokens["total"])
+    cached   = lookup.cached[0] if lookup.cached is not None else lookup.similar
+    contents = build_contents(prompt) if cached is None else None
+    degrade_after = answer_deadline(request, retrieved)
+
+    async def events():
+        yield sse_event("sources", {"retrieved_docs": sources, "model": LLM_MODEL, "session_id": session_id,
+                                    "prompt_tokens": prompt.tokens["total"]})
+        if cached is not None:
+            await remember(session_id, question, cached)
+            yield sse_event("delta", {"text": cached})
+            yield sse_event("done", {"cached": True, "semantic": True} if lookup.similar is not None else {"cached": True})
+            return
+        parts    = []
+        started  = time.monotonic()
+        deadline = started + LLM_TIMEOUT
+        degrade_at = received + degrade_after if degrade_after is not None else None
+        stream   = llm.stream(contents, generation_config(), deadline)
+        try:
+            while True:
+                limit = degrade_at if degrade_at is not None and not parts else deadline
+                try:
+                    text = await asyncio.wait_for(stream.__anext__(), timeout=limit - time.monotonic())
+                except StopAsyncIteration:
+                    break
+                if await http_request.is_disconnected():
+                    logger.info("🔌 Client disconnected, stopping generation")
+                    return
+                if not parts:
+                    STAGE_SECONDS.labels("first_token").observe(time.monotonic() - started)
+                    annotate(first_token_ms=round((time.monotonic() - received) * 1000, 2))
+                parts.append(text)
+                yield sse_event("delta", {"text": text})
+        except Exception as e:
+            degrading = degrade_at is not None and not parts
+            missed    = degrading and isinstance(e, asyncio.TimeoutError) and time.monotonic() >= degrade_at
+            if not missed:
+                count_upstream_error(e)
+                err = generation_error(e)  # logs it
+            if degrading:
+                reason = "deadline" if missed else degraded_reason(e)
+                answer = degrade(question, retrieved, reason)
+                await remember(session_id, question, answer)
+                yield sse_event("delta", {"text": answer})
+                yield sse_event("done", {"cached": False, "degraded": True, "degraded_reason": reason, "model": EXTRACTIVE_MODEL})
+                return
+            data = {"status": err.status_code, "detail": err.detail}
+            if isinstance(e, Overloaded):
+                data["retry_after"] = e.retry_after
+            yield sse_event("error", data)
+            return
+        finally:
+            await stream.aclose()
+
+        logger.info(f"✅ Streamed. Sources: {[hit.doc['title'] for hit in retrieved]}")
+        STAGE_SECONDS.labels("stream").observe(time.monotonic() - started)
+        answer = "".join(parts)
+        ANSWER_CHARS.observe(len(answer))
+        await remember(session_id, question, answer)
+        store_answer(lookup, retrieved, sources, answer)
+        yield sse_event("done", {"cached": False})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    turns = await session_io(sessions.get, session_id)
+    if turns is None:
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found or expired")
+    return {"session_id": session_id, "messages": [t._asdict() for t in turns]}
+
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not await session_io(sessions.delete, session_id):
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found or expired")
+    return {"session_id": session_id, "status": "deleted"}
 
 
 @app.get("/documents")
-async def list_documents():
-    return {"count": len(knowledge_docs), "documents": [{"id": d["id"], "title": d["title"], "category": d["category"]} for d in knowledge_docs]}
\ No newline at end of file
+async def list_documents(request: Request, offset: int = 0, limit: int = DOCUMENTS_PAGE_SIZE, category: Optional[str] = None):
+    """One page of the knowledge base, optionally one category. The ETag changes with every
+    knowledge base write, so clients can revalidate with If-None-Match and get a 304."""
+    snapshot = knowledge.snapshot
+    category = resolve_category(category, snapshot)  # a bad request is a 400 even with a current ETag
+    offset   = max(0, offset)
+    limit    = max(1, min(limit, DOCUMENTS_MAX_PAGE))
+    etag     = knowledge_etag(snapshot)
+    headers  = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in {t.strip() for t in request.headers.get("if-none-match", "").split(",")}:
+        return Response(status_code=304, headers=headers)
+
+    page     = itertools.islice(snapshot.iter_docs(category), offset, offset + limit)
+    body = {
+        "count": snapshot.categories.get(category, 0) if category else snapshot.doc_count,
+        "offset": offset,
+        "limit": limit,
+        "categories": snapshot.categories,
+        "documents": [{"id": d["id"], "title": d["title"], "category": d["category"], "snippet": d.snippet} for d in page],
+    }
+    return Response(content=json.dumps(body), media_type="application/json", headers=headers)
+
+
+def knowledge_etag(snapshot: Snapshot) -> str:
+    if knowledge_sync:  # the journal revision is the same on every worker that has caught up
+        return f'W/"{knowledge_sync.journal.id}-{knowledge_sync.applied}"'
+    return f'W/"{INSTANCE_ID}-{snapshot.version}"'
+
+
+def to_doc(item: DocumentIn, doc_id: Optional[str] = None) -> dict:
+    title, content = item.title.strip(), item.content.strip()
+    if not title or not content:
+        raise ValueError("title and content cannot be empty")
+    category = item.category.strip().lower() or "general"
+    if not category.isprintable():
+        raise ValueError("category cannot contain control characters")
+    return {
+        "id": doc_id or item.id or f"{category}-{uuid.uuid4().hex[:8]}",
+        "title": title,
+        "content": content,
+        "category": category,
+    }
+
+
+async def mutate(op: str, payload):
+    """Apply a document write (see journal.apply_mutation). With a knowledge journal it goes
+    through the journal instead, so every worker applies it, in the same order."""
+    if knowledge_sync:
+        return await knowledge_sync.submit(op, payload)
+    return await asyncio.to_thread(apply_mutation, knowledge, op, payload)
+
+
+def knowledge_changed(action: str, count: int, doc_ids: Iterable[str] = ()):
+    answer_cache.clear()
+    if semantic_cache:
+        semantic_cache.invalidate(doc_ids)
+    snapshot = knowledge.snapshot
+    logger.info(f"📚 {action} {count} doc(s). Now {snapshot.doc_count} docs, version {snapshot.version}")
+
+
+@app.post("/documents/add")
+async def add_document(item: DocumentIn):
+    try:
+        doc = to_doc(item)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    added, _ = await mutate("upsert", [doc])
+    knowledge_changed("Added" if added else "Updated", 1, [doc["id"]])
+    return {"id": doc["id"], "status": "added" if added else "updated", "documents": knowledge.snapshot.doc_count}
+
+
+@app.post("/documents/bulk")
+async def bulk_add_documents(http_request: Request):
+    """JSONL body, one DocumentIn per line. Applied in batches so chat traffic keeps flowing."""
+    added = updated = 0
+    errors: list[dict] = []
+    batch: list[dict] = []
+    written: list[str] = []
+    line_no = 0
+    buffer  = b""
+
+    async def flush():
+        nonlocal added, updated
+        if batch:
+            a, u = await mutate("upsert", list(batch))
+            added, updated = added + a, updated + u
+            written.extend(doc["id"] for doc in batch)
+            batch.clear()
+
+    async def parse(line: bytes):
+        if not line.strip():
+            return
+        try:
+            batch.append(to_doc(DocumentIn.model_validate_json(line)))
+        except ValueError as e:
+            errors.append({"line": line_no, "error": str(e)[:200]})
+        if len(batch) >= BULK_BATCH_DOCS:
+            await flush()
+
+    async for chunk in http_request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            await parse(line)
+    line_no += 1
+    await parse(buffer)
+    await flush()
+
+    knowledge_changed("Bulk loaded", added + updated, written)
+    return {"added": added, "updated": updated, "errors": errors[:100], "error_count": len(errors), "documents": knowledge.snapshot.doc_count}
+
+
+@app.put("/documents/{doc_id}")
+async def update_document(doc_id: str, item: DocumentIn):
+    try:
+        doc = to_doc(item, doc_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not await mutate("update", doc):
+        raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found")
+    knowledge_changed("Updated", 1, [doc_id])
+    return {"id": doc_id, "status": "updated", "documents": knowledge.snapshot.doc_count}
+
+
+@app.delete("/documents/{doc_id}")
+async def delete_document(doc_id: str):
+    if not await mutate("delete", doc_id):
+        raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found")
+    knowledge_changed("Deleted", 1, [doc_id])
+    return {"id": doc_id, "status": "deleted", "documents": knowledge.snapshot.doc_count}
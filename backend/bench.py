@@ -0,0 +1,324 @@
+"""
+EcoSage benchmark suite — index build time, memory, retrieval latency, prompt assembly,
+response serialisation and end-to-end /chat throughput (local stand-in model) over synthetic
+corpora shaped like knowledge_base.py, compared against a stored baseline.
+
+    python bench.py                                  # 15, 1k, 10k and 100k docs vs bench_baseline.json
+    python bench.py --sizes 15,1000 --threshold 0.5  # quicker, more tolerant
+    python bench.py --threshold retrieve_p99_ms=1.0  # per-metric tolerance
+    python bench.py --save-baseline                  # record this machine's numbers as the baseline
+
+Each size is measured --repeat times (default 3) and every metric is the median of those runs.
+Exits with status 1 when a metric is worse than the baseline by more than its threshold (a
+fraction: 0.25 = 25% slower or bigger, or 25% less throughput). Baselines are only comparable
+on the same machine and configuration, so record one wherever the comparison runs.
+"""
+
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.update(LLM_PROVIDER="local", LOCAL_LLM_LATENCY="0", LOCAL_LLM_JITTER="0", QUERY_LOG="", ADMISSION_RATE="0")
+
+import app as server
+from knowledge import KnowledgeStore
+from knowledge_base import SUSTAINABILITY_DOCS
+from retrieval import tokenize
+from vectors import make_embedder
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+SIZES    = (15, 1000, 10000, 100000)
+
+# name -> (higher is better, smallest change that counts as a regression). Timing floors are a
+# millisecond or more: identical runs already differ by tenths of a millisecond.
+METRICS = {
+    "build_s":          (False, 0.05),
+    "memory_mb":        (False, 2.0),
+    "retrieve_p50_ms":  (False, 1.0),
+    "retrieve_p95_ms":  (False, 1.0),
+    "retrieve_p99_ms":  (False, 2.0),
+    "prompt_p50_ms":    (False, 1.0),
+    "serialize_p50_ms": (False, 1.0),
+    "chat_rps":         (True, 5.0),
+    "chat_p50_ms":      (False, 2.0),
+    "chat_p99_ms":      (False, 5.0),
+}
+
+SYLLABLES = ["ba", "co", "di", "fe", "ga", "hu", "ki", "lo", "ma", "ne", "po", "ru", "sa", "te", "vi", "zo",
+             "ar", "en", "is", "on", "ul", "ex", "ch", "st", "tr", "gr", "pl", "br"]
+
+
+class CorpusGenerator:
+    """Recombines the built-in documents' lines, swapping some words for synthetic terms drawn
+    from a Zipf-distributed pool that grows with the corpus (so vocabulary grows as in real text)."""
+
+    def __init__(self, n_docs: int, seed: int = 7):
+        self.rng = random.Random(seed)
+        self.docs = SUSTAINABILITY_DOCS
+        self.intros, self.headings, self.bullets, self.closings = [], [], [], []
+        for doc in self.docs:
+            lines = [line.strip() for line in doc["content"].splitlines() if line.strip()]
+            for i, line in enumerate(lines):
+                if line.startswith("-"):
+                    self.bullets.append(line)
+                elif line.endswith(":"):
+                    self.headings.append(line)
+                elif i == 0:
+                    self.intros.append(line)
+                else:
+                    self.closings.append(line)
+        pool = max(50, int(40 * n_docs ** 0.6))  # Heaps' law-ish vocabulary growth
+        self.words = [self._word() for _ in range(pool)]
+        self.cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(pool)))
+
+    def _word(self) -> str:
+        return "".join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(2, 4)))
+
+    def _mutate(self, line: str, rate: float = 0.2) -> str:
+        words = line.split(" ")
+        picks = self.rng.choices(self.words, cum_weights=self.cum_weights, k=len(words))
+        return " ".join(p if self.rng.random() < rate and w.isalpha() else w for w, p in zip(words, picks))
+
+    def doc(self, i: int) -> dict:
+        base  = self.docs[i % len(self.docs)]
+        lines = [self._mutate(self.rng.choice(self.intros)), self.rng.choice(self.headings)]
+        lines += [self._mutate(b) for b in self.rng.sample(self.bullets, self.rng.randint(6, 10))]
+        lines.append(self._mutate(self.rng.choice(self.closings)))
+        return {
+            "id": f"{base['category']}-{i:06d}",
+            "title": self._mutate(base["title"], 0.3),
+            "content": "\n".join(lines),
+            "category": base["category"],
+        }
+
+    def queries(self, docs: list[dict], n: int) -> list[str]:
+        """Questions built from words of random documents, with a typo in one in ten."""
+        out = []
+        for _ in range(n):
+            terms = tokenize(self.rng.choice(docs)["content"])
+            query = self.rng.sample(terms, min(len(terms), self.rng.randint(2, 5)))
+            if self.rng.random() < 0.1 and len(query[0]) > 4:
+                w = query[0]
+                j = self.rng.randrange(1, len(w) - 1)
+                query[0] = w[:j] + w[j + 1:]
+            out.append("How can I " + " ".join(query) + "?")
+        return out
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:  # not Linux: peak RSS is the best available
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def quantiles(samples: list[float], *qs: float) -> list[float]:
+    ordered = sorted(samples)
+    return [ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in qs]
+
+
+def timed(fn, n: int) -> list[float]:
+    samples = []
+    for i in range(n):
+        started = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+async def chat_load(store: KnowledgeStore, questions: list[str], concurrency: int) -> tuple[float, list[float]]:
+    import httpx
+
+    async with server.lifespan(server.app):
+        server.knowledge = store
+        client  = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bench")
+        gate    = asyncio.Semaphore(concurrency)
+        latency = []
+
+        async def one(q: str):
+            async with gate:
+                started = time.perf_counter()
+                r = await client.post("/chat", json={"message": q}, headers={"Cache-Control": "no-store"})
+                r.raise_for_status()
+                latency.append((time.perf_counter() - started) * 1000)
+
+        await one(questions[0])  # warm-up
+        latency.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(one(q) for q in questions))
+        return len(questions) / (time.perf_counter() - started), latency
+
+
+def bench_size(n_docs: int, args) -> dict:
+    gen = CorpusGenerator(n_docs, args.seed)
+    gc.collect()
+    before = rss_mb()
+
+    # documents are generated a batch at a time and dropped once stored, so memory_mb is what
+    # the store itself retains rather than the store plus every source dict
+    embedder = make_embedder(server.EMBEDDER, server.EMBED_DIM) if server.RETRIEVER != "keyword" else None
+    store    = KnowledgeStore(server.RETRIEVER, embedder, server.PASSAGE_CHARS, server.PASSAGE_OVERLAP, server.HYBRID_ALPHA)
+    build_s  = 0.0
+    for i in range(0, n_docs, server.BULK_BATCH_DOCS):
+        batch   = [gen.doc(j) for j in range(i, min(i + server.BULK_BATCH_DOCS, n_docs))]
+        started = time.perf_counter()
+        store.upsert(batch)
+        build_s += time.perf_counter() - started
+    del batch
+    gc.collect()
+    memory = rss_mb() - before
+
+    snapshot  = store.snapshot
+    questions = gen.queries(list(snapshot.iter_docs()), args.queries)
+    top_k     = server.TOP_K_DOCS
+    retrieve  = lambda i: snapshot.retrieve([questions[i]], top_k, top_k * server.PASSAGE_DEPTH)
+    timed(retrieve, min(20, args.queries))
+    r50, r95, r99 = quantiles(timed(retrieve, args.queries), 0.5, 0.95, 0.99)
+
+    hits = [retrieve(i)[0] for i in range(min(100, args.queries))]
+    build_prompt = lambda i: server.prompt_builder.build(questions[i], hits[i], [])
+    serialize    = lambda i: server.ChatResponse(
+        answer=ANSWER, retrieved_docs=server.build_sources(questions[i], hits[i]), model=server.LLM_MODEL
+    ).model_dump_json(exclude_none=True)
+    prompt_p50,    = quantiles(timed(build_prompt, len(hits)), 0.5)
+    serialize_p50, = quantiles(timed(serialize, len(hits)), 0.5)
+
+    rps, latency = asyncio.run(chat_load(store, questions[:args.requests], args.concurrency))
+    c50, c99 = quantiles(latency, 0.5, 0.99)
+    result = {
+        "passages": snapshot.n_passages,
+        "build_s": build_s,
+        "memory_mb": memory,
+        "retrieve_p50_ms": r50,
+        "retrieve_p95_ms": r95,
+        "retrieve_p99_ms": r99,
+        "prompt_p50_ms": prompt_p50,
+        "serialize_p50_ms": serialize_p50,
+        "chat_rps": rps,
+        "chat_p50_ms": c50,
+        "chat_p99_ms": c99,
+    }
+    return {k: round(v, 3) if isinstance(v, float) else v for k, v in result.items()}
+
+
+def run_isolated(size: int, args) -> dict:
+    """bench_size in a fresh interpreter, so memory and allocator state do not carry over between runs."""
+    cmd = [sys.executable, os.path.abspath(__file__), "--run-size", str(size), "--queries", str(args.queries),
+           "--requests", str(args.requests), "--concurrency", str(args.concurrency), "--seed", str(args.seed)]
+    out = subprocess.run(cmd, capture_output=True, text=True)
+    if out.returncode != 0:
+        sys.exit(f"❌ Benchmark of {size} docs failed:\n{out.stderr}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+ANSWER = ("Great question! Start with the changes that fit your routine: " * 12).strip()
+
+
+def parse_thresholds(values: list[str]) -> tuple[float, dict[str, float]]:
+    default, per_metric = 0.25, {}
+    for value in values:
+        name, _, fraction = value.rpartition("=")
+        if name and name not in METRICS:
+            sys.exit(f"❌ Unknown metric '{name}' (known: {', '.join(METRICS)})")
+        if name:
+            per_metric[name] = float(fraction)
+        else:
+            default = float(fraction)
+    return default, per_metric
+
+
+def compare(results: dict, baseline: dict, default: float, per_metric: dict[str, float]) -> list[str]:
+    """Print each metric against the baseline; returns the regressions."""
+    regressions = []
+    for size, metrics in results.items():
+        base = baseline.get(size)
+        if base is None:
+            print(f"   {size:>7} docs: no baseline")
+            continue
+        for name, (higher_better, min_delta) in METRICS.items():
+            if name not in base:
+                continue
+            old, new = base[name], metrics[name]
+            limit  = per_metric.get(name, default)
+            worse  = old - new if higher_better else new - old
+            change = worse / old if old else 0.0
+            failed = worse > min_delta and change > limit
+            mark   = "❌" if failed else "✅"
+            delta  = (new - old) / old if old else 0.0
+            print(f"   {mark} {size:>7} docs  {name:<17} {old:>10.3f} → {new:>10.3f}  ({delta:+.0%})")
+            if failed:
+                regressions.append(f"{name} at {size} docs: {old} → {new} (limit {limit:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark EcoSage retrieval and /chat against a stored baseline.")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma-separated corpus sizes")
+    parser.add_argument("--queries", type=int, default=500, help="retrieval queries per size")
+    parser.add_argument("--requests", type=int, default=300, help="/chat requests per size")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent /chat requests")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per size; each metric is the median (default 3)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON (default: bench_baseline.json)")
+    parser.add_argument("--threshold", action="append", default=[], metavar="[METRIC=]FRACTION",
+                        help="allowed regression, default 0.25; may be repeated per metric")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--json", metavar="PATH", help="also write the results to this file")
+    parser.add_argument("--run-size", type=int, help=argparse.SUPPRESS)  # one measurement, in a child process
+    args = parser.parse_args()
+    default, per_metric = parse_thresholds(args.threshold)
+    logging.getLogger("ecosage").setLevel(logging.ERROR)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.run_size is not None:
+        print(json.dumps(bench_size(args.run_size, args)))
+        return
+
+    config  = {"retriever": server.RETRIEVER, "embedder": server.EMBEDDER, "passage_chars": server.PASSAGE_CHARS,
+               "top_k": server.TOP_K_DOCS, "python": platform.python_version(), "machine": platform.machine()}
+    results = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(f"⏱️  {size} docs ...", flush=True)
+        runs = [run_isolated(size, args) for _ in range(max(1, args.repeat))]
+        results[str(size)] = {k: round(statistics.median(run[k] for run in runs), 3) for k in runs[0]}
+        print("   " + "  ".join(f"{k} {v}" for k, v in results[str(size)].items()), flush=True)
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "config": config, "results": results}
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"💾 Baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        sys.exit(f"❌ No baseline at {args.baseline}; run with --save-baseline first")
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != config:
+        print(f"⚠️  Baseline was recorded with {baseline.get('config')}; numbers may not be comparable")
+    print(f"📊 Against the baseline of {baseline.get('created')}:")
+    regressions = compare(results, baseline["results"], default, per_metric)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s):\n   " + "\n   ".join(regressions))
+        sys.exit(1)
+    print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Build an EcoSage index artifact offline, for the server to memory-map at startup.
+
+    python build_index.py                                 # knowledge_base.py -> $INDEX_PATH (or ./index)
+    python build_index.py --jsonl extra.jsonl --out idx   # plus documents from JSONL files
+    python build_index.py --verify idx                    # check an existing artifact's checksums
+
+Passage size, embedder and embedding dimension come from the same environment
+variables the server reads, so an artifact built here matches its config.
+"""
+
+import argparse
+import sys
+import time
+
+import app as server
+from index_file import IndexFormatError, read_manifest, save_index, verify_index
+from knowledge import KnowledgeStore
+from vectors import make_embedder
+
+
+def read_jsonl(path: str) -> list[dict]:
+    docs = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                docs.append(server.to_doc(server.DocumentIn.model_validate_json(line)))
+            except ValueError as e:
+                print(f"⚠️  {path}:{line_no}: skipped ({str(e).splitlines()[0]})", file=sys.stderr)
+    return docs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an EcoSage on-disk index.")
+    parser.add_argument("--out", default=server.INDEX_PATH or "index", help="artifact directory (default: $INDEX_PATH or ./index)")
+    parser.add_argument("--jsonl", action="append", default=[], help="JSONL file of documents; may be repeated")
+    parser.add_argument("--no-builtin", action="store_true", help="skip the documents in knowledge_base.py")
+    parser.add_argument("--embeddings", action=argparse.BooleanOptionalAction, default=server.RETRIEVER != "keyword",
+                        help="include the embedding matrix (default: on unless RETRIEVER=keyword)")
+    parser.add_argument("--verify", metavar="PATH", help="verify an existing artifact instead of building")
+    args = parser.parse_args()
+
+    if args.verify:
+        try:
+            manifest = read_manifest(args.verify)
+            verify_index(args.verify, manifest, checksums=True)
+        except IndexFormatError as e:
+            sys.exit(f"❌ {e}")
+        print(f"✅ {args.verify} OK: {manifest['counts']}")
+        return
+
+    started  = time.perf_counter()
+    embedder = make_embedder(server.EMBEDDER, server.EMBED_DIM) if args.embeddings else None
+    store = KnowledgeStore("hybrid" if embedder else "keyword", embedder,
+                           server.PASSAGE_CHARS, server.PASSAGE_OVERLAP, server.HYBRID_ALPHA)
+
+    docs: list[dict] = []
+    if not args.no_builtin:
+        from knowledge_base import SUSTAINABILITY_DOCS
+        docs.extend(SUSTAINABILITY_DOCS)
+    for path in args.jsonl:
+        docs.extend(read_jsonl(path))
+    for i in range(0, len(docs), server.BULK_BATCH_DOCS):
+        store.upsert(docs[i:i + server.BULK_BATCH_DOCS])
+
+    manifest = save_index(store, args.out, server.EMBEDDER if embedder else None)
+    size = sum(f["bytes"] for f in manifest["files"].values())
+    print(f"✅ Wrote {args.out}: {manifest['counts']}, {size / 1e6:.1f} MB in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
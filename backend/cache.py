@@ -0,0 +1,248 @@
+"""
+EcoSage answer caching — bounded LRU/TTL cache, a semantic cache for paraphrased questions,
+and single-flight coalescing in front of generation.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+import numpy as np
+
+from retrieval import tokenize
+from vectors import Embedder
+
+
+def normalize_question(question: str) -> str:
+    """'How can I compost?' and 'how do I compost' both normalise to 'compost'."""
+    return " ".join(tokenize(question))
+
+
+def make_key(*parts: Any) -> str:
+    raw = json.dumps(parts, separators=(",", ":"), sort_keys=True, default=str)
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+class AnswerCache:
+    """LRU cache bounded by entry count and approximate bytes, with a per-entry TTL."""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes   = max_bytes
+        self.ttl         = ttl
+        self.bytes       = 0
+        self.hits        = 0
+        self.misses      = 0
+        self.evictions   = 0
+        self._entries: OrderedDict[str, tuple[float, int, Any]] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires, _, value = entry
+        if expires < time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any, size: int):
+        if not self.enabled or size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class _SemanticEntry:
+    __slots__ = ("doc_ids", "value", "size", "expires", "hits", "used")
+
+    def __init__(self, doc_ids: frozenset, value: Any, size: int, expires: float):
+        self.doc_ids = doc_ids
+        self.value   = value
+        self.size    = size
+        self.expires = expires
+        self.hits    = 0
+        self.used    = time.monotonic()
+
+
+class SemanticCache:
+    """Answers to past questions, found by embedding similarity instead of an exact key.
+
+    Question embeddings are rows of one preallocated float32 matrix, so a lookup is a single
+    matrix-vector product. A hit needs cosine similarity >= `threshold` *and* a Jaccard
+    overlap >= `min_overlap` between the documents retrieved for the new question and those
+    the cached answer was grounded in. When full, the entry with the fewest hits is evicted
+    (least recently used first). Writes to a document drop the answers that cite it.
+    """
+
+    CANDIDATES = 8  # most similar rows checked for document overlap
+
+    def __init__(self, embedder: Embedder, max_entries: int, max_bytes: int, ttl: float,
+                 threshold: float, min_overlap: float):
+        self.embedder    = embedder
+        self.max_entries = max_entries
+        self.max_bytes   = max_bytes
+        self.ttl         = ttl
+        self.threshold   = threshold
+        self.min_overlap = min_overlap
+        self.bytes         = 0
+        self.hits          = 0
+        self.misses        = 0
+        self.evictions     = 0
+        self.invalidations = 0
+        self._matrix  = np.zeros((max(max_entries, 0), embedder.dim), dtype=np.float32)
+        self._entries: list[Optional[_SemanticEntry]] = [None] * max(max_entries, 0)
+        self._free    = list(range(max_entries - 1, -1, -1))
+        self._by_doc: dict[str, set[int]] = {}  # doc id -> rows whose answer cites it
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def embed(self, question: str) -> np.ndarray:
+        return self.embedder.embed([question])[0]
+
+    def get(self, vec: np.ndarray, doc_ids: Iterable[str]) -> Optional[tuple[Any, float]]:
+        """(value, similarity) of the closest cached answer grounded in the same documents."""
+        if len(self._free) == self.max_entries:
+            self.misses += 1
+            return None
+        scores = self._matrix @ vec  # empty rows are zero, so they never clear a positive threshold
+        n      = min(self.CANDIDATES, len(scores))
+        best   = np.argpartition(scores, len(scores) - n)[len(scores) - n:]
+        docs   = frozenset(doc_ids)
+        now    = time.monotonic()
+        for row in best[np.argsort(-scores[best])]:
+            if scores[row] < self.threshold:
+                break
+            entry = self._entries[row]
+            if entry is None:
+                continue
+            if entry.expires < now:
+                self._remove(int(row))
+                continue
+            union = len(entry.doc_ids | docs)
+            if union and len(entry.doc_ids & docs) / union >= self.min_overlap:
+                entry.hits += 1
+                entry.used  = now
+                self.hits  += 1
+                return entry.value, float(scores[row])
+        self.misses += 1
+        return None
+
+    def put(self, vec: np.ndarray, doc_ids: Iterable[str], value: Any, size: int):
+        if not self.enabled or size > self.max_bytes:
+            return
+        while not self._free or self.bytes + size > self.max_bytes:
+            self._evict()
+        row = self._free.pop()
+        entry = self._entries[row] = _SemanticEntry(frozenset(doc_ids), value, size, time.monotonic() + self.ttl)
+        self._matrix[row] = vec
+        self.bytes += size
+        for doc_id in entry.doc_ids:
+            self._by_doc.setdefault(doc_id, set()).add(row)
+
+    def invalidate(self, doc_ids: Iterable[str]):
+        """Drop every answer grounded in any of `doc_ids`."""
+        for doc_id in doc_ids:
+            for row in list(self._by_doc.get(doc_id, ())):
+                self._remove(row)
+                self.invalidations += 1
+
+    def clear(self):
+        for row, entry in enumerate(self._entries):
+            if entry is not None:
+                self._remove(row)
+
+    def _evict(self):
+        live = [(e.hits, e.used, row) for row, e in enumerate(self._entries) if e is not None]
+        self._remove(min(live)[2])
+        self.evictions += 1
+
+    def _remove(self, row: int):
+        entry = self._entries[row]
+        self._entries[row] = None
+        self._matrix[row]  = 0.0
+        self._free.append(row)
+        self.bytes -= entry.size
+        for doc_id in entry.doc_ids:
+            rows = self._by_doc.get(doc_id)
+            rows.discard(row)
+            if not rows:
+                del self._by_doc[doc_id]
+
+    def stats(self) -> dict:
+        return {
+            "entries": self.max_entries - len(self._free),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one in-flight task and its result or error.
+
+    The task runs independently of whichever request started it, so a caller that
+    is cancelled (e.g. a disconnected leader) does not cancel the others.
+    """
+
+    def __init__(self):
+        self.leaders   = 0
+        self.coalesced = 0
+        self._calls: dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every waiter went away
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._calls), "leaders": self.leaders, "coalesced": self.coalesced}
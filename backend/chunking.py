@@ -0,0 +1,153 @@
+"""
+EcoSage ingestion — split documents into overlapping passages and build query-aware snippets.
+"""
+
+import re
+from typing import Mapping, NamedTuple, Optional
+
+import numpy as np
+
+from docstore import DocRecord, DocumentColumns, GrowableArray
+from retrieval import TOKEN_RE, index_terms, stem
+
+LINE_RE     = re.compile(r"[^\n]+")
+SENTENCE_RE = re.compile(r"[^.!?]+[.!?]*\s*")
+
+
+class Passage(NamedTuple):
+    id: str      # "<doc id>#<n>", stable for a given content and chunking config
+    doc: int     # ordinal of the parent document
+    start: int   # character offsets into the parent's content
+    end: int
+
+
+class PassageColumns:
+    """Append-only passage table: parent ordinal and character span per passage, plus where
+    each document's (contiguous) passages start. Rows are read back as `Passage` tuples."""
+
+    ARRAYS = ("passage_docs", "passage_starts", "passage_ends", "doc_passage_offsets")
+
+    def __init__(self, docs: DocumentColumns, arrays: Optional[dict[str, np.ndarray]] = None):
+        arrays = arrays or {}
+        self.docs    = docs
+        self._doc    = GrowableArray(np.int32, arrays.get("passage_docs"))
+        self._start  = GrowableArray(np.int64, arrays.get("passage_starts"))
+        self._end    = GrowableArray(np.int64, arrays.get("passage_ends"))
+        self._first  = GrowableArray(np.int64, arrays.get("doc_passage_offsets"))
+        if "doc_passage_offsets" not in arrays:
+            self._first.append(0)
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        return {name: col.values for name, col in zip(self.ARRAYS, (self._doc, self._start, self._end, self._first))}
+
+    def __len__(self) -> int:
+        return len(self._end)
+
+    def __getitem__(self, ordinal: int) -> Passage:
+        doc = int(self._doc.data[ordinal])
+        return Passage(f"{self.docs.id(doc)}#{ordinal - int(self._first.data[doc])}", doc,
+                       int(self._start.data[ordinal]), int(self._end.data[ordinal]))
+
+    @property
+    def doc_ordinals(self) -> np.ndarray:
+        return self._doc.values
+
+    def of(self, doc: int) -> range:
+        """Ordinals of `doc`'s passages."""
+        start, end = self._first.data[doc:doc + 2]
+        return range(int(start), int(end))
+
+    def add(self, doc: int, passages: list[Passage]) -> range:
+        """Append the passages of the next document, `doc`."""
+        self._doc.extend([doc] * len(passages))
+        self._start.extend([p.start for p in passages])
+        self._end.extend([p.end for p in passages])
+        self._first.append(len(self._end))
+        return self.of(doc)
+
+
+class Hit(NamedTuple):
+    doc: DocRecord
+    score: float
+    passages: list[tuple[Passage, float]]  # best first
+
+
+def _units(content: str, size: int) -> list[tuple[int, int]]:
+    """Lines, split further into sentences (then hard-wrapped) when longer than `size`."""
+    units = []
+    for line in LINE_RE.finditer(content):
+        if not line.group().strip():
+            continue
+        if line.end() - line.start() <= size:
+            units.append(line.span())
+            continue
+        for sent in SENTENCE_RE.finditer(content, line.start(), line.end()):
+            for s in range(sent.start(), sent.end(), size):
+                units.append((s, min(s + size, sent.end())))
+    return units
+
+
+def split_passages(doc: Mapping, ordinal: int, size: int, overlap: int) -> list[Passage]:
+    content = doc["content"]
+    units   = _units(content, size)
+    if not units:
+        return [Passage(f"{doc['id']}#0", ordinal, 0, len(content))]
+
+    passages = []
+    i = 0
+    while i < len(units):
+        start = units[i][0]
+        j = i + 1
+        while j < len(units) and units[j][1] - start <= size:
+            j += 1
+        end = units[j - 1][1]
+        passages.append(Passage(f"{doc['id']}#{len(passages)}", ordinal, start, end))
+        if j == len(units):
+            break
+        # Step back over trailing units that fit in the overlap window, but always advance.
+        k = j
+        while k - 1 > i and end - units[k - 1][0] <= overlap:
+            k -= 1
+        i = k
+    return passages
+
+
+def passage_text(doc: DocRecord, passage: Passage) -> str:
+    return doc.text(passage.start, passage.end).strip()
+
+
+def make_snippet(doc: DocRecord, passage: Passage, query: str, width: int = 200) -> tuple[str, list[list[int]]]:
+    """A `width`-char window of the passage around the first query-term match.
+
+    Returns the snippet and [start, end) ranges of matched terms within it. Only the
+    passage is decoded, so positions are relative to it.
+    """
+    text    = doc.text(passage.start, passage.end)
+    wanted  = set(index_terms(query))
+    matches = [m.span() for m in TOKEN_RE.finditer(text.lower()) if stem(m.group()) in wanted]
+
+    lo = 0
+    if matches:
+        lo = max(0, min(matches[0][0] - width // 4, len(text) - width))
+    hi = min(len(text), lo + width)
+    while lo < hi and text[lo].isspace():
+        lo += 1
+    while hi > lo and text[hi - 1].isspace():
+        hi -= 1
+
+    prefix = "..." if passage.start + lo > 0 else ""
+    suffix = "..." if hi < len(text.rstrip()) or _continues(doc, passage.end) else ""
+    shift  = len(prefix) - lo
+    highlights = [[s + shift, e + shift] for s, e in matches if s >= lo and e <= hi]
+    return f"{prefix}{text[lo:hi]}{suffix}", highlights
+
+
+def _continues(doc: DocRecord, pos: int, window: int = 64) -> bool:
+    """Whether any non-whitespace follows `pos`, reading the content a small window at a time."""
+    while True:
+        tail = doc.text(pos, pos + window)
+        if tail.strip():
+            return True
+        if len(tail) < window:
+            return False
+        pos += window
@@ -0,0 +1,216 @@
+"""
+EcoSage document store — knowledge base documents as append-only columns instead of dicts.
+
+Ids, titles and contents live in contiguous UTF-8 buffers addressed by offset arrays, categories
+are small integer codes into one interned name table, and the lead snippet of every document
+is a precomputed byte length into its content. A document is a short-lived `DocRecord` view
+(an ordinal plus a reference to the columns) that reads like the dict it replaces.
+
+Every column is a numpy array, so an index artifact stores them as-is and a loaded store
+serves them straight from read-only memory maps (see index_file.py).
+"""
+
+from collections.abc import Mapping
+from typing import Iterator, Optional
+
+import numpy as np
+
+SNIPPET_CHARS = 200  # lead snippet listed by /documents, cut back to a word boundary
+
+FIELDS = ("id", "title", "content", "category")
+
+ASCII     = 1  # flag: character offsets equal byte offsets
+TRUNCATED = 2  # flag: the lead snippet is shorter than the content
+
+
+class GrowableArray:
+    """Append-only 1-D numpy array. Growth reallocates instead of resizing in place, so
+    slices a reader already holds stay valid; a read-only (memory-mapped) array is copied
+    into a private one on the first append, like VectorIndex.wrap."""
+
+    __slots__ = ("data", "n")
+
+    def __init__(self, dtype, data: Optional[np.ndarray] = None):
+        self.data = data if data is not None else np.zeros(256, dtype=dtype)
+        self.n    = len(data) if data is not None else 0
+
+    def __len__(self) -> int:
+        return self.n
+
+    @property
+    def values(self) -> np.ndarray:
+        return self.data[:self.n]
+
+    def extend(self, values):
+        end = self.n + len(values)
+        if end > len(self.data) or not self.data.flags.writeable:
+            grown = np.zeros(max(end, 2 * len(self.data), 256), dtype=self.data.dtype)
+            grown[:self.n] = self.data[:self.n]
+            self.data = grown
+        self.data[self.n:end] = values
+        self.n = end
+
+    def append(self, value):
+        self.extend((value,))
+
+
+class DocRecord(Mapping):
+    """Read-only view of one stored document; `record["content"]` decodes on access."""
+
+    __slots__ = ("columns", "ordinal")
+
+    def __init__(self, columns: "DocumentColumns", ordinal: int):
+        self.columns = columns
+        self.ordinal = ordinal
+
+    @property
+    def id(self) -> str:
+        return self.columns.id(self.ordinal)
+
+    @property
+    def title(self) -> str:
+        return self.columns.title(self.ordinal)
+
+    @property
+    def content(self) -> str:
+        return self.columns.content(self.ordinal)
+
+    @property
+    def category(self) -> str:
+        return self.columns.category(self.ordinal)
+
+    @property
+    def snippet(self) -> str:
+        return self.columns.snippet(self.ordinal)
+
+    def text(self, start: int, end: int) -> str:
+        """content[start:end] (character offsets), decoding only that span when possible."""
+        return self.columns.text(self.ordinal, start, end)
+
+    def __getitem__(self, key: str):
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def __repr__(self) -> str:
+        return f"DocRecord({self.id!r}, {self.title!r}, {self.category!r})"
+
+
+def _text(buffer: GrowableArray, offsets: GrowableArray, ordinal: int) -> str:
+    start, end = offsets.data[ordinal:ordinal + 2].tolist()  # Python ints: numpy scalars make slicing slow
+    return str(buffer.data[start:end], "utf-8")
+
+
+class DocumentColumns:
+    """Append-only document columns. Like the other store structures, rows are never
+    rewritten in place, so snapshots share one instance and bound their reads by the
+    document count they captured; compaction builds a fresh instance."""
+
+    ARRAYS = ("doc_ids", "doc_id_offsets", "doc_titles", "doc_title_offsets", "doc_content",
+              "doc_content_offsets", "doc_categories", "doc_snippets", "doc_flags")
+
+    def __init__(self, arrays: Optional[dict[str, np.ndarray]] = None, category_names: tuple[str, ...] = ()):
+        arrays = arrays or {}
+
+        def column(name: str, dtype, empty=()) -> GrowableArray:
+            if name in arrays:
+                return GrowableArray(dtype, arrays[name])
+            col = GrowableArray(dtype)
+            col.extend(empty)
+            return col
+
+        self._ids             = column("doc_ids", np.uint8)
+        self._id_offsets      = column("doc_id_offsets", np.int64, (0,))
+        self._titles          = column("doc_titles", np.uint8)
+        self._title_offsets   = column("doc_title_offsets", np.int64, (0,))
+        self._content         = column("doc_content", np.uint8)
+        self._content_offsets = column("doc_content_offsets", np.int64, (0,))
+        self._categories      = column("doc_categories", np.uint32)
+        self._snippets        = column("doc_snippets", np.uint32)  # UTF-8 length of each lead snippet
+        self._flags           = column("doc_flags", np.uint8)      # ASCII | TRUNCATED
+        self.category_names: list[str] = list(category_names)
+        self._category_codes = {name: code for code, name in enumerate(self.category_names)}
+        self.n = len(self._categories)
+
+    @classmethod
+    def wrap(cls, arrays: dict[str, np.ndarray], category_names: list[str]) -> "DocumentColumns":
+        """Serve existing (possibly read-only memmapped) arrays without copying them."""
+        return cls(arrays, tuple(category_names))
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        """The columns trimmed to their length, named as in ARRAYS."""
+        cols = (self._ids, self._id_offsets, self._titles, self._title_offsets, self._content,
+                self._content_offsets, self._categories, self._snippets, self._flags)
+        return {name: col.values for name, col in zip(self.ARRAYS, cols)}
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, ordinal: int) -> DocRecord:
+        if not 0 <= ordinal < self.n:
+            raise IndexError(ordinal)
+        return DocRecord(self, ordinal)
+
+    def __iter__(self) -> Iterator[DocRecord]:
+        return (DocRecord(self, i) for i in range(self.n))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self.arrays().values())
+
+    @property
+    def category_codes(self) -> np.ndarray:
+        return self._categories.values
+
+    def append(self, doc: Mapping) -> int:
+        content = doc["content"]
+        encoded = content.encode()
+        body    = content.rstrip()
+        lead    = body[:SNIPPET_CHARS]
+        if len(body) > SNIPPET_CHARS and " " in lead:
+            lead = lead.rsplit(None, 1)[0]
+        lead = lead.rstrip()
+        code = self._category_codes.get(doc["category"])
+        if code is None:
+            code = self._category_codes[doc["category"]] = len(self.category_names)
+            self.category_names.append(doc["category"])
+
+        for buffer, offsets, data in ((self._ids, self._id_offsets, doc["id"].encode()),
+                                      (self._titles, self._title_offsets, doc["title"].encode()),
+                                      (self._content, self._content_offsets, encoded)):
+            buffer.extend(np.frombuffer(data, dtype=np.uint8))
+            offsets.append(len(buffer))
+        self._snippets.append(len(lead.encode()))
+        self._flags.append((ASCII if len(encoded) == len(content) else 0) | (TRUNCATED if len(lead) < len(body) else 0))
+        self._categories.append(code)
+        self.n += 1  # rows become visible here, once every column has them
+        return self.n - 1
+
+    def id(self, ordinal: int) -> str:
+        return _text(self._ids, self._id_offsets, ordinal)
+
+    def title(self, ordinal: int) -> str:
+        return _text(self._titles, self._title_offsets, ordinal)
+
+    def content(self, ordinal: int) -> str:
+        return _text(self._content, self._content_offsets, ordinal)
+
+    def category(self, ordinal: int) -> str:
+        return self.category_names[self._categories.data[ordinal]]
+
+    def text(self, ordinal: int, start: int, end: int) -> str:
+        if not self._flags.data[ordinal] & ASCII:
+            return self.content(ordinal)[start:end]
+        base, stop = self._content_offsets.data[ordinal:ordinal + 2].tolist()
+        return str(self._content.data[base + start:min(base + end, stop)], "utf-8")
+
+    def snippet(self, ordinal: int) -> str:
+        base = int(self._content_offsets.data[ordinal])
+        text = str(self._content.data[base:base + int(self._snippets.data[ordinal])], "utf-8").lstrip()
+        return text + "..." if self._flags.data[ordinal] & TRUNCATED else text
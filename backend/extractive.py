@@ -0,0 +1,89 @@
+"""
+EcoSage extractive answers — ranks the sentences and bullet points of retrieved passages against
+the question, so there is still a useful answer when generation is too slow or unavailable.
+"""
+
+import math
+import re
+
+from chunking import LINE_RE, SENTENCE_RE, Hit
+from docstore import DocRecord
+from retrieval import index_terms
+
+BULLET_RE    = re.compile(r"^\s*(?:[-•*]|\d+[.)])\s+")
+BULLET_BOOST = 1.3   # list items in the knowledge base are concrete, actionable advice
+IDEAL_WORDS  = 30    # longer units are penalised, and so are fragments under six words
+
+
+def _stems(text: str) -> set[str]:
+    """The same stemmed terms retrieval matches on, so "composting" meets "compost"."""
+    return set(index_terms(text))
+
+
+def _units(hit: Hit) -> list[tuple[int, str, bool]]:
+    """(offset, text, is_bullet) for every line or sentence covered by the hit's passages."""
+    seen, units = set(), []
+    for passage, _ in hit.passages:
+        for line in LINE_RE.finditer(hit.doc.text(passage.start, passage.end)):
+            start = passage.start + line.start()
+            text  = line.group().strip()
+            if not text or start in seen:
+                continue
+            seen.add(start)
+            bullet = BULLET_RE.match(text)
+            if bullet:
+                units.append((start, text[bullet.end():].strip(), True))
+                continue
+            for sent in SENTENCE_RE.finditer(text):
+                if sent.group().strip().endswith(":"):
+                    continue  # list headings carry no answer on their own
+                units.append((start + sent.start(), sent.group().strip(), False))
+    return units
+
+
+def extract_points(question: str, retrieved: list[Hit], max_points: int = 4) -> list[tuple[DocRecord, str]]:
+    """Best (document, sentence or bullet) pairs for the question, best first."""
+    terms = _stems(question)
+    if not retrieved:
+        return []
+    top = retrieved[0].score or 1.0
+
+    candidates = []
+    for rank, hit in enumerate(retrieved):
+        doc_weight = hit.score / top if top > 0 else 1.0
+        for offset, text, bullet in _units(hit):
+            candidates.append((hit.doc, offset, text, bullet, _stems(text), doc_weight, rank))
+
+    df: dict[str, int] = {}
+    for *_, toks, _, _ in candidates:
+        for t in toks & terms:
+            df[t] = df.get(t, 0) + 1
+    n = len(candidates)
+
+    scored = []
+    for doc, offset, text, bullet, toks, doc_weight, rank in candidates:
+        overlap = sum(math.log(1 + n / df[t]) for t in toks & terms)
+        words   = max(1, len(text.split()))
+        length  = min(1.0, words / 6) ** 0.5 / max(1.0, words / IDEAL_WORDS) ** 0.5
+        score   = (overlap + 0.1) * length * doc_weight * (BULLET_BOOST if bullet else 1.0)
+        scored.append((-score, rank, offset, doc, text))
+    scored.sort(key=lambda x: x[:3])
+
+    points, used = [], set()
+    for _, _, _, doc, text in scored:
+        if text.lower() in used:
+            continue
+        used.add(text.lower())
+        points.append((doc, text))
+        if len(points) == max_points:
+            break
+    return points
+
+
+def extractive_answer(question: str, retrieved: list[Hit], max_points: int = 4) -> str:
+    points = extract_points(question, retrieved, max_points)
+    if not points:
+        return ""
+    lines = ["Here are the most relevant points from the EcoSage knowledge base:", ""]
+    lines += [f"• {text} ({doc['title']})" for doc, text in points]
+    return "\n".join(lines)
@@ -0,0 +1,164 @@
+"""
+EcoSage index artifact — versioned, checksummed on-disk snapshot of a KnowledgeStore.
+
+Layout of an index directory:
+    manifest.json      format version, build config, counts, sha256 + size per file,
+                       category names (indexed by doc_categories), and the knowledge
+                       journal position it contains (serve.py)
+    doc_*.npy          document columns (docstore.DocumentColumns): UTF-8 id, title and
+                       content buffers with int64 offsets, uint32 category codes and
+                       snippet lengths, uint8 flags
+    passage_*.npy      passage columns (chunking.PassageColumns): int32 parent ordinal,
+                       int64 start and end; doc_passage_offsets.npy = first passage per doc
+    terms.txt          newline-separated vocabulary, sorted
+    term_offsets.npy   int64 CSR offsets into the postings arrays
+    post_doc_ids.npy   int32 passage ordinals
+    post_tfs.npy       int32 term frequencies
+    doc_lens.npy       int32 tokens per passage
+    vectors.npy        float32 (n, dim) embeddings, only when built with an embedder
+
+Arrays are opened with numpy.memmap and served in place (documents and passages included),
+so loading takes milliseconds and every worker on a host shares the same page-cache pages
+instead of holding a private copy.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Optional
+
+import numpy as np
+
+from chunking import PassageColumns
+from docstore import DocumentColumns
+from knowledge import KnowledgeStore
+from retrieval import FrozenPostings, InvertedIndex
+from vectors import VectorIndex
+
+FORMAT         = "ecosage-index"
+FORMAT_VERSION = 5
+
+
+class IndexFormatError(RuntimeError):
+    pass
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def save_index(store: KnowledgeStore, path: str, embedder_spec: Optional[str] = None,
+               journal: Optional[dict] = None) -> dict:
+    """Write the store to `path`, replacing any previous artifact there. Returns the manifest.
+    `journal` ({"id", "seq"}) records the knowledge journal entries already folded in."""
+    columns, categories, frozen, lens, vectors = store.export()
+    tmp = f"{path.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    with open(os.path.join(tmp, "terms.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(frozen.terms))
+
+    arrays = {
+        **columns,
+        "term_offsets": np.asarray(frozen.offsets, dtype=np.int64),
+        "post_doc_ids": np.asarray(frozen.doc_ids, dtype=np.int32),
+        "post_tfs": np.asarray(frozen.tfs, dtype=np.int32),
+        "doc_lens": np.asarray(lens, dtype=np.int32),
+    }
+    if vectors is not None:
+        arrays["vectors"] = np.ascontiguousarray(vectors, dtype=np.float32)
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), arr)
+
+    files = {}
+    for name in sorted(os.listdir(tmp)):
+        full = os.path.join(tmp, name)
+        files[name] = {"sha256": _sha256(full), "bytes": os.path.getsize(full)}
+    manifest = {
+        "format": FORMAT,
+        "format_version": FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            "passage_chars": store.passage_chars,
+            "passage_overlap": store.passage_overlap,
+            "embedder": embedder_spec if vectors is not None else None,
+            "dim": int(vectors.shape[1]) if vectors is not None else None,
+        },
+        "counts": {"docs": len(columns["doc_categories"]), "passages": len(columns["passage_docs"]),
+                   "categories": len(categories), "terms": len(frozen.terms), "postings": int(len(frozen.doc_ids))},
+        "categories": categories,  # JSON, not a text file: names are free-form, newlines included
+        "files": files,
+    }
+    if journal is not None:
+        manifest["journal"] = journal
+    with open(os.path.join(tmp, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Workers that still have the old files mapped keep their inodes alive.
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return manifest
+
+
+def read_manifest(path: str) -> dict:
+    try:
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise IndexFormatError(f"Cannot read index manifest in '{path}': {e}") from e
+    if manifest.get("format") != FORMAT or manifest.get("format_version") != FORMAT_VERSION:
+        raise IndexFormatError(
+            f"'{path}' is not an {FORMAT} v{FORMAT_VERSION} artifact "
+            f"(found {manifest.get('format')} v{manifest.get('format_version')}); rebuild it with build_index.py"
+        )
+    return manifest
+
+
+def verify_index(path: str, manifest: dict, checksums: bool):
+    """Sizes are always checked; full sha256 verification reads every byte, so it is opt-in."""
+    for name, meta in manifest["files"].items():
+        full = os.path.join(path, name)
+        if not os.path.exists(full) or os.path.getsize(full) != meta["bytes"]:
+            raise IndexFormatError(f"Index file '{name}' is missing or truncated")
+        if checksums and _sha256(full) != meta["sha256"]:
+            raise IndexFormatError(f"Index file '{name}' failed its checksum")
+
+
+def load_index(path: str, store: KnowledgeStore, embedder_spec: Optional[str] = None, checksums: bool = False) -> dict:
+    """Memory-map the artifact at `path` into `store`. Returns the manifest."""
+    manifest = read_manifest(path)
+    verify_index(path, manifest, checksums)
+
+    config = manifest["config"]
+    if (config["passage_chars"], config["passage_overlap"]) != (store.passage_chars, store.passage_overlap):
+        raise IndexFormatError(
+            f"Index was built with PASSAGE_CHARS={config['passage_chars']}, PASSAGE_OVERLAP={config['passage_overlap']}; "
+            f"server is configured with {store.passage_chars}, {store.passage_overlap}"
+        )
+    if store.retriever != "keyword" and (config["embedder"], config["dim"]) != (embedder_spec, store.embedder.dim):
+        raise IndexFormatError(
+            f"RETRIEVER={store.retriever} needs embeddings from {embedder_spec} (dim {store.embedder.dim}); "
+            f"index has {config['embedder']} (dim {config['dim']})"
+        )
+
+    def mapped(name: str) -> np.ndarray:
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+    categories = manifest["categories"]
+    with open(os.path.join(path, "terms.txt"), encoding="utf-8") as f:
+        terms = f.read().split("\n") if manifest["counts"]["terms"] else []
+
+    docs     = DocumentColumns.wrap({name: mapped(name) for name in DocumentColumns.ARRAYS}, categories)
+    passages = PassageColumns(docs, {name: mapped(name) for name in PassageColumns.ARRAYS})
+    frozen   = FrozenPostings(terms, mapped("term_offsets"), mapped("post_doc_ids"), mapped("post_tfs"))
+    keyword  = InvertedIndex(base=frozen, base_lens=mapped("doc_lens"))
+    vector   = VectorIndex.wrap(mapped("vectors")) if store.retriever != "keyword" else None
+    store.restore(docs, passages, keyword, vector)
+    return manifest
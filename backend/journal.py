@@ -0,0 +1,178 @@
+"""
+EcoSage knowledge journal — document mutations shared by every worker on a host.
+
+Write endpoints append their mutation to a local SQLite file (WAL mode) and get back a
+sequence number. Every worker, including the one that took the request, applies the
+journal strictly in sequence order, so all of them walk through the same knowledge
+revisions and converge on the same documents. A worker starts from the revision its
+index artifact was built at (see serve.py) and polls for entries added since.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from knowledge import KnowledgeStore
+
+logger = logging.getLogger("ecosage")
+
+OPS = ("upsert", "update", "delete")
+
+
+def apply_mutation(store: KnowledgeStore, op: str, payload):
+    """upsert(list of docs) -> (added, updated); update(doc) / delete(doc id) -> found."""
+    if op == "upsert":
+        return store.upsert(payload)
+    if op == "update":
+        return store.update(payload)
+    if op == "delete":
+        return store.delete(payload)
+    raise ValueError(f"Unknown journal op '{op}'")
+
+
+def mutation_doc_ids(op: str, payload) -> list[str]:
+    """Ids of the documents a mutation writes."""
+    if op == "upsert":
+        return [doc["id"] for doc in payload]
+    return [payload["id"] if op == "update" else payload]
+
+
+class KnowledgeJournal:
+    """Append-only mutation log, and the durable record of documents written at runtime. `id`
+    names the journal so an index artifact can record which journal (and how far into it)
+    it already contains."""
+
+    READ_BATCH = 256  # entries per read while catching up
+
+    def __init__(self, path: str):
+        self.path  = path
+        self._lock = threading.Lock()
+        self._db   = sqlite3.connect(path, timeout=10.0, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS mutations (
+                seq     INTEGER PRIMARY KEY AUTOINCREMENT,
+                op      TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key   TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        with self._lock, self._db:
+            self._db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('id', ?)", (uuid.uuid4().hex[:12],))
+            self.id = self._db.execute("SELECT value FROM meta WHERE key = 'id'").fetchone()[0]
+
+    def append(self, op: str, payload) -> int:
+        if op not in OPS:
+            raise ValueError(f"Unknown journal op '{op}'")
+        data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        with self._lock, self._db:
+            return self._db.execute(
+                "INSERT INTO mutations (op, payload, created) VALUES (?, ?, ?)", (op, data, time.time())
+            ).lastrowid
+
+    def since(self, seq: int, limit: int = READ_BATCH) -> list[tuple[int, str, object]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, op, payload FROM mutations WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit)
+            ).fetchall()
+        return [(s, op, json.loads(payload)) for s, op, payload in rows]
+
+    def head(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM mutations").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class JournalFollower:
+    """Keeps one worker's KnowledgeStore at the journal head. Local writes go through `submit`,
+    which appends and then catches up under the same lock the poller uses, so a worker never
+    applies entries out of order and gets its own mutation's result back."""
+
+    def __init__(self, journal: KnowledgeJournal, store: KnowledgeStore, applied: int,
+                 on_sync: Callable[[int, set[str]], None], interval: float):
+        self.journal  = journal
+        self.store    = store
+        self.applied  = applied  # revision: last journal sequence reflected in the store
+        self.on_sync  = on_sync  # called with the number of other workers' entries just applied and the doc ids they touched
+        self.interval = interval
+        self.synced   = 0        # entries from other workers applied so far
+        self.errors   = 0
+        self._lock = asyncio.Lock()
+        self._last_sync = time.monotonic()
+
+    async def submit(self, op: str, payload):
+        async with self._lock:
+            seq = await asyncio.to_thread(self.journal.append, op, payload)
+            return await self._catch_up(want=seq)
+
+    async def catch_up(self):
+        async with self._lock:
+            await self._catch_up()
+
+    async def _catch_up(self, want: Optional[int] = None):
+        result, remote, touched = None, 0, set()
+        while True:
+            entries = await asyncio.to_thread(self.journal.since, self.applied)
+            if not entries:
+                break
+            outcome, others = await asyncio.to_thread(self._apply, entries, want, touched)
+            if outcome is not None:
+                result = outcome
+            remote += others
+        self._last_sync = time.monotonic()
+        if remote:
+            self.synced += remote
+            self.on_sync(remote, touched)
+        if result is None:
+            return None
+        value, error = result
+        if error is not None:
+            raise error
+        return value
+
+    def _apply(self, entries: list[tuple[int, str, object]], want: Optional[int], touched: set[str]):
+        """Apply entries in order; adds the doc ids other workers' entries wrote to `touched`
+        (a failed entry wrote nothing, and its payload may not even name a document)."""
+        outcome, others = None, 0
+        for seq, op, payload in entries:
+            value = error = None
+            try:
+                value = apply_mutation(self.store, op, payload)
+            except Exception as e:  # deterministic, so every worker skips the same entry
+                self.errors += 1
+                error = e
+                logger.error(f"❌ Journal entry {seq} ({op}) failed to apply: {e}")
+            self.applied = seq
+            if seq == want:
+                outcome = (value, error)
+            else:
+                others += 1
+                if error is None:
+                    touched.update(mutation_doc_ids(op, payload))
+        return outcome, others
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.catch_up()
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.warning(f"⚠️ Knowledge journal poll failed: {e}")
+
+    def stats(self) -> dict:
+        return {"journal": self.journal.id, "revision": self.applied, "synced": self.synced,
+                "errors": self.errors, "last_sync_s": round(time.monotonic() - self._last_sync, 3)}
@@ -0,0 +1,283 @@
+"""
+EcoSage knowledge store — incremental ingestion behind immutable, atomically swapped snapshots.
+
+Writers (serialised by a lock, usually running in a worker thread) append documents,
+passages and index entries, tombstone replaced or deleted ones, then publish a new
+`Snapshot` with a single reference assignment. Readers grab `store.snapshot` once and
+use it for the whole request: they never lock and never see a half-applied batch.
+"""
+
+import bisect
+import threading
+from typing import Iterator, Optional
+
+import numpy as np
+
+from chunking import Hit, Passage, PassageColumns, passage_text, split_passages
+from docstore import DocRecord, DocumentColumns
+from retrieval import FrozenPostings, InvertedIndex, fuse
+from vectors import Embedder, VectorIndex
+
+HYBRID_DEPTH    = 4     # candidates per retriever = depth * HYBRID_DEPTH
+COMPACT_RATIO   = 0.25  # rebuild once this fraction of passages are tombstones
+MERGE_MIN_DOCS  = 4096  # fold in-memory postings into the frozen segment past max(this, frozen size)
+
+
+class CategoryFacets:
+    """Per-category passage bitsets and sorted document ordinals, written as documents are
+    appended. Bits are only ever set past what existing snapshots can see (deletes are
+    tombstones), so snapshots share the arrays; growing one swaps in a copy."""
+
+    def __init__(self):
+        self.bits: dict[str, np.ndarray] = {}
+        self.docs: dict[str, list[int]]  = {}
+        self.live: dict[str, int]        = {}
+
+    @classmethod
+    def build(cls, docs: DocumentColumns, passages: PassageColumns) -> "CategoryFacets":
+        """Facets of a whole store at once, vectorised over the category codes."""
+        facets = cls()
+        codes  = docs.category_codes
+        passage_codes = codes[passages.doc_ordinals]
+        for code, category in enumerate(docs.category_names):
+            ordinals = np.flatnonzero(codes == code)
+            if len(ordinals):
+                facets.bits[category] = passage_codes == code
+                facets.docs[category] = ordinals.tolist()
+                facets.live[category] = len(ordinals)
+        return facets
+
+    def add(self, category: str, doc: int, passages: range):
+        bits = self.bits.get(category)
+        if bits is None or passages.stop > len(bits):
+            grown = np.zeros(max(passages.stop, 2 * len(bits) if bits is not None else 1024), dtype=bool)
+            if bits is not None:
+                grown[:len(bits)] = bits
+            self.bits[category] = bits = grown
+        bits[passages.start:passages.stop] = True
+        self.docs.setdefault(category, []).append(doc)
+        self.live[category] = self.live.get(category, 0) + 1
+
+    def remove(self, category: str):
+        self.live[category] -= 1
+
+
+class Snapshot:
+    """Point-in-time read view. The lists it shares with the store are append-only
+    and every read is bounded by the lengths captured here."""
+
+    __slots__ = ("version", "docs", "n_docs", "deleted_docs", "passages", "n_passages",
+                 "keyword", "vector", "embedder", "retriever", "hybrid_alpha",
+                 "category_bits", "category_docs", "categories", "_masks")
+
+    def __init__(self, store: "KnowledgeStore"):
+        self.version      = store.version
+        self.docs         = store._docs
+        self.n_docs       = len(store._docs)
+        self.deleted_docs = frozenset(store._deleted_docs)
+        self.passages     = store._passages
+        self.n_passages   = len(store._passages)
+        self.keyword      = store._keyword.view()
+        self.vector       = store._vector.view() if store._vector is not None else None
+        self.embedder     = store.embedder
+        self.retriever    = store.retriever
+        self.hybrid_alpha = store.hybrid_alpha
+        facets = store._facets
+        self.category_bits = dict(facets.bits)
+        self.category_docs = dict(facets.docs)
+        self.categories    = {c: n for c, n in sorted(facets.live.items()) if n}  # live documents per category
+        self._masks: dict[str, np.ndarray] = {}
+
+    @property
+    def doc_count(self) -> int:
+        return self.n_docs - len(self.deleted_docs)
+
+    def iter_docs(self, category: Optional[str] = None) -> Iterator[DocRecord]:
+        if category is None:
+            ordinals = range(self.n_docs)
+        else:
+            ordinals = self.category_docs.get(category, [])
+            ordinals = ordinals[:bisect.bisect_left(ordinals, self.n_docs)]
+        for i in ordinals:
+            if i not in self.deleted_docs:
+                yield self.docs[i]
+
+    def mask(self, category: str) -> np.ndarray:
+        """Boolean mask over this snapshot's passages that belong to `category`."""
+        mask = self._masks.get(category)
+        if mask is None:
+            bits = self.category_bits.get(category)
+            mask = np.zeros(self.n_passages, dtype=bool)
+            if bits is not None:
+                end = min(len(bits), self.n_passages)
+                mask[:end] = bits[:end]
+            self._masks[category] = mask
+        return mask
+
+    def rank(self, queries: list[str], depth: int, prefix: bool = False, category: Optional[str] = None,
+             terms: Optional[list[dict[str, float]]] = None) -> list[list[tuple[int, float]]]:
+        """(passage ordinal, score) hits per query; dense scoring of the batch is one matrix product.
+        `prefix` treats each query's last word as incomplete (search-as-you-type); `category`
+        restricts hits to that category's passages. `terms` passes each query's keyword expansion
+        (`InvertedIndex.expand`) when the caller already has it."""
+        allowed = self.mask(category) if category is not None else None
+        if terms is None and self.retriever != "vector":
+            terms = [self.keyword.index.expand(q, prefix) for q in queries]
+        if self.retriever == "keyword":
+            return [self.keyword.search_terms(t, depth, allowed) for t in terms]
+        wide  = depth if self.retriever == "vector" else depth * HYBRID_DEPTH
+        dense = self.vector.search_batch(self.embedder.embed(queries), wide, allowed)
+        if self.retriever == "vector":
+            return dense
+        return [fuse(self.keyword.search_terms(t, wide, allowed), hits, self.hybrid_alpha, depth)
+                for t, hits in zip(terms, dense)]
+
+    def group(self, hits: list[tuple[int, float]], top_k: int) -> list[Hit]:
+        """Collapse ranked passages into their documents, ordered by each document's best passage."""
+        by_doc: dict[int, list[tuple[Passage, float]]] = {}
+        for ordinal, score in hits:
+            passage = self.passages[ordinal]
+            by_doc.setdefault(passage.doc, []).append((passage, score))
+        return [Hit(self.docs[d], ps[0][1], ps) for d, ps in list(by_doc.items())[:top_k]]
+
+    def retrieve(self, queries: list[str], top_k: int, depth: int, prefix: bool = False,
+                 category: Optional[str] = None, terms: Optional[list[dict[str, float]]] = None) -> list[list[Hit]]:
+        return [self.group(hits, top_k) for hits in self.rank(queries, depth, prefix, category, terms)]
+
+
+class KnowledgeStore:
+    def __init__(self, retriever: str, embedder: Optional[Embedder], passage_chars: int,
+                 passage_overlap: int, hybrid_alpha: float):
+        self.retriever       = retriever
+        self.embedder        = embedder
+        self.passage_chars   = passage_chars
+        self.passage_overlap = passage_overlap
+        self.hybrid_alpha    = hybrid_alpha
+        self.version         = 0
+        self._lock = threading.Lock()
+        self._id_map: Optional[dict[str, int]] = None
+        self._reset()
+        self.snapshot = Snapshot(self)
+
+    @property
+    def _ids(self) -> dict[str, int]:
+        """Live document ordinal by id; built on the first write after a restore, so
+        loading an artifact does not decode every id up front."""
+        if self._id_map is None:
+            self._id_map = {self._docs.id(i): i for i in range(len(self._docs)) if i not in self._deleted_docs}
+        return self._id_map
+
+    def _reset(self):
+        self._docs     = DocumentColumns()
+        self._id_map   = {}
+        self._deleted_docs: set[int] = set()
+        self._passages = PassageColumns(self._docs)
+        self._facets  = CategoryFacets()
+        self._keyword = InvertedIndex()
+        self._vector  = VectorIndex(self.embedder.dim) if self.retriever != "keyword" else None
+
+    # ── Writers ─────────────────────────────────────────────────────────────
+    def upsert(self, docs: list[dict]) -> tuple[int, int]:
+        """Add or replace documents by id; returns (added, updated)."""
+        batch = {d["id"]: d for d in docs}  # last one wins within a batch
+        with self._lock:
+            updated = sum(1 for doc_id in batch if doc_id in self._ids)
+            for doc_id in batch:
+                if doc_id in self._ids:
+                    self._remove(self._ids.pop(doc_id))
+            self._append(list(batch.values()))
+            self._publish()
+        return len(batch) - updated, updated
+
+    def update(self, doc: dict) -> bool:
+        with self._lock:
+            if doc["id"] not in self._ids:
+                return False
+            self._remove(self._ids.pop(doc["id"]))
+            self._append([doc])
+            self._publish()
+        return True
+
+    def delete(self, doc_id: str) -> bool:
+        with self._lock:
+            if doc_id not in self._ids:
+                return False
+            self._remove(self._ids.pop(doc_id))
+            self._publish()
+        return True
+
+    def _append(self, docs: list[dict], vectors: Optional[np.ndarray] = None):
+        new_passages: list[Passage] = []
+        for doc in docs:
+            ordinal  = self._docs.append(doc)
+            passages = split_passages(doc, ordinal, self.passage_chars, self.passage_overlap)
+            new_passages.extend(passages)
+            self._ids[doc["id"]] = ordinal
+            self._facets.add(doc["category"], ordinal, self._passages.add(ordinal, passages))
+
+        texts = [f"{self._docs.title(p.doc)} {passage_text(self._docs[p.doc], p)}" for p in new_passages]
+        if self._vector is not None:
+            self._vector.add(vectors if vectors is not None else self.embedder.embed(texts))
+        for text in texts:
+            self._keyword.add(text)
+
+    def restore(self, docs: DocumentColumns, passages: PassageColumns, keyword: InvertedIndex,
+                vector: Optional[VectorIndex]):
+        """Adopt prebuilt structures (e.g. memory-mapped from an index artifact) wholesale."""
+        with self._lock:
+            self._reset()
+            self._docs     = docs
+            self._id_map   = None
+            self._passages = passages
+            self._keyword  = keyword
+            self._vector   = vector if self.retriever != "keyword" else None
+            self._facets   = CategoryFacets.build(docs, passages)
+            self._publish()
+
+    def export(self) -> tuple[dict[str, np.ndarray], list[str], FrozenPostings, np.ndarray, Optional[np.ndarray]]:
+        """Tombstone-free state for writing to disk: the document and passage columns, the
+        category names their codes refer to, postings, passage lengths and embeddings."""
+        with self._lock:
+            if self._deleted_docs:
+                self._compact()
+                self._publish()
+            frozen, lens = self._keyword.freeze()
+            vectors = self._vector.matrix if self._vector is not None else None
+            columns = {**self._docs.arrays(), **self._passages.arrays()}
+            return columns, list(self._docs.category_names), frozen, lens, vectors
+
+    def _remove(self, ordinal: int):
+        self._deleted_docs.add(ordinal)
+        self._facets.remove(self._docs.category(ordinal))
+        for p in self._passages.of(ordinal):
+            self._keyword.delete(p)
+            if self._vector is not None:
+                self._vector.delete(p)
+
+    def _publish(self):
+        if len(self._keyword.deleted) > COMPACT_RATIO * max(len(self._passages), 1):
+            self._compact()
+        elif len(self._keyword) - self._keyword.base_n > max(MERGE_MIN_DOCS, self._keyword.base_n):
+            self._merge()
+        self.version += 1
+        self.snapshot = Snapshot(self)
+
+    def _compact(self):
+        """Rebuild into fresh structures (old snapshots keep the old ones), reusing embeddings."""
+        live = [i for i in range(len(self._docs)) if i not in self._deleted_docs]
+        docs = [self._docs[i] for i in live]
+        vectors = None
+        if self._vector is not None:
+            rows    = [p for i in live for p in self._passages.of(i)]
+            vectors = self._vector.matrix[np.asarray(rows, dtype=np.int64)]
+        self._reset()
+        self._append(docs, vectors)
+        self._merge()
+
+    def _merge(self):
+        """Fold in-memory postings into a new frozen CSR segment (geometric, so amortised O(1) per doc)."""
+        old = self._keyword
+        frozen, lens  = old.freeze()
+        self._keyword = InvertedIndex(base=frozen, base_lens=lens, vocab=old.vocab)
+        for ordinal in old.deleted:
+            self._keyword.delete(ordinal)
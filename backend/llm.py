@@ -0,0 +1,353 @@
+"""
+EcoSage LLM access — bounded concurrency, deadlines, retries, hedging and a circuit breaker
+in front of pluggable generation providers (Gemini, or a local stand-in for offline testing).
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Protocol
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+HEDGE_MIN_SAMPLES = 20  # successful calls observed before the p95 is trusted for hedging
+
+
+class Overloaded(Exception):
+    """Raised when a caller cannot get a generation slot in time."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class CircuitOpen(Overloaded):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+class UpstreamError(Exception):
+    def __init__(self, message: str, retryable: bool):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class ConcurrencyLimiter:
+    """Caps in-flight upstream calls; waiters give up after `queue_timeout` seconds, or
+    sooner when the caller's own deadline (`max_wait`) comes first."""
+
+    def __init__(self, limit: int, queue_timeout: float, max_waiting: int):
+        self.limit         = limit
+        self.queue_timeout = queue_timeout
+        self.max_waiting   = max_waiting
+        self.in_flight     = 0
+        self.waiting       = 0
+        self.rejected      = 0
+        self._sem = asyncio.Semaphore(limit)
+
+    @asynccontextmanager
+    async def slot(self, max_wait: Optional[float] = None):
+        if self._sem.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise Overloaded("generation queue is full", self.queue_timeout)
+        self.waiting += 1
+        try:
+            wait = self.queue_timeout if max_wait is None else max(0.0, min(self.queue_timeout, max_wait))
+            await asyncio.wait_for(self._sem.acquire(), wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded("timed out waiting for a generation slot", self.queue_timeout)
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._sem.release()
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "in_flight": self.in_flight, "waiting": self.waiting, "rejected": self.rejected}
+
+
+# ── Providers ─────────────────────────────────────────────────────────────
+class Provider(Protocol):
+    name: str
+
+    async def generate(self, contents: list, config) -> str:
+        ...
+
+    def stream(self, contents: list, config) -> AsyncIterator[str]:
+        """Async generator of text chunks."""
+        ...
+
+    def retryable(self, error: Exception) -> bool:
+        ...
+
+
+class GeminiProvider:
+    name = "gemini"
+
+    def __init__(self, client, model: str):
+        self.client = client
+        self.model  = model
+
+    async def generate(self, contents: list, config) -> str:
+        result = await self.client.aio.models.generate_content(model=self.model, contents=contents, config=config)
+        return result.text or ""
+
+    async def stream(self, contents: list, config) -> AsyncIterator[str]:
+        stream = await self.client.aio.models.generate_content_stream(model=self.model, contents=contents, config=config)
+        try:
+            async for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            await stream.aclose()
+
+    def retryable(self, error: Exception) -> bool:
+        from google.genai import errors
+        if isinstance(error, errors.APIError):
+            return error.code in RETRYABLE_STATUS
+        import httpx  # what google-genai raises for network faults and client-side timeouts
+        return isinstance(error, (httpx.TransportError, OSError))
+
+
+class LocalProvider:
+    """Offline stand-in for Gemini: answers after a normally distributed delay, with an
+    injectable rate of slow (tail) calls and of retryable failures."""
+
+    name = "local"
+
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1, error_rate: float = 0.0,
+                 slow_rate: float = 0.0, slow_factor: float = 10.0, seed: Optional[int] = None):
+        self.latency     = latency
+        self.jitter      = jitter
+        self.error_rate  = error_rate
+        self.slow_rate   = slow_rate
+        self.slow_factor = slow_factor
+        self.calls       = 0
+        self._rng = random.Random(seed)
+
+    async def _wait(self):
+        self.calls += 1
+        delay = max(0.0, self._rng.gauss(self.latency, self.jitter))
+        if self._rng.random() < self.slow_rate:
+            delay *= self.slow_factor
+        await asyncio.sleep(delay)
+        if self._rng.random() < self.error_rate:
+            raise UpstreamError("injected upstream failure", retryable=True)
+
+    @staticmethod
+    def _reply(contents: list) -> str:
+        prompt   = contents[-1].parts[0].text if contents else ""
+        question = prompt.rsplit("User question:", 1)[-1].strip()
+        titles   = [line[1:-1] for line in prompt.splitlines() if line.startswith("[") and line.endswith("]")]
+        sources  = f" See: {', '.join(titles)}." if titles else ""
+        return f"(local model) You asked: {question[:200]}.{sources} Today, pick one small change and try it."
+
+    async def generate(self, contents: list, config) -> str:
+        await self._wait()
+        return self._reply(contents)
+
+    async def stream(self, contents: list, config) -> AsyncIterator[str]:
+        await self._wait()
+        for word in self._reply(contents).split(" "):
+            yield word + " "
+            await asyncio.sleep(0)
+
+    def retryable(self, error: Exception) -> bool:
+        return isinstance(error, UpstreamError) and error.retryable
+
+
+# ── Resilience ────────────────────────────────────────────────────────────
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive upstream failures and fails fast for
+    `reset_timeout` seconds; then lets a single probe through (half-open) to decide."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout     = reset_timeout
+        self.clock             = clock
+        self.state      = "closed"
+        self.failures   = 0
+        self.opened     = 0
+        self.open_until = 0.0
+
+    def check(self):
+        if self.state == "closed":
+            return
+        now = self.clock()
+        if now < self.open_until:
+            raise CircuitOpen("upstream circuit is open", self.open_until - now)
+        self.state      = "half_open"
+        self.open_until = now + self.reset_timeout  # everyone but this probe keeps failing fast
+
+    def success(self):
+        self.failures = 0
+        self.state    = "closed"
+
+    def failure(self):
+        self.failures += 1
+        if self.failure_threshold > 0 and (self.state == "half_open" or self.failures >= self.failure_threshold):
+            if self.state != "open":
+                self.opened += 1
+            self.state      = "open"
+            self.open_until = self.clock() + self.reset_timeout
+
+
+class LatencyTracker:
+    """Recent successful call latencies, for the hedging delay."""
+
+    def __init__(self, size: int = 512):
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientLLM:
+    """Generation with a total deadline and per-attempt deadlines, jittered exponential
+    retries of retryable errors, optional hedged second requests once an attempt runs past
+    the recent p95, and a circuit breaker. Every upstream call holds a limiter slot."""
+
+    def __init__(self, provider: Provider, limiter: ConcurrencyLimiter, timeout: float, attempt_timeout: float,
+                 retries: int, backoff: float, hedge: bool, hedge_min_delay: float, breaker: CircuitBreaker):
+        self.provider        = provider
+        self.limiter         = limiter
+        self.timeout         = timeout
+        self.attempt_timeout = attempt_timeout
+        self.retries         = retries
+        self.backoff         = backoff
+        self.hedge           = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker         = breaker
+        self.latency         = LatencyTracker()
+        self.attempts   = 0
+        self.retried    = 0
+        self.hedged     = 0
+        self.hedge_wins = 0
+
+    def _retry_delay(self, error: Exception, attempt: int, deadline: float) -> Optional[float]:
+        """Backoff before the next attempt, or None to give up and raise `error`."""
+        if isinstance(error, Overloaded) or not (isinstance(error, asyncio.TimeoutError) or self.provider.retryable(error)):
+            return None
+        self.breaker.failure()
+        delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+        if attempt >= self.retries or time.monotonic() + delay >= deadline:
+            return None
+        self.retried += 1
+        return delay
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge:
+            return None
+        p95 = self.latency.quantile(0.95)
+        return max(self.hedge_min_delay, p95) if p95 is not None else None
+
+    async def _call(self, contents: list, config, timeout: float) -> str:
+        """One upstream call; the wait for a limiter slot counts against `timeout`."""
+        deadline = time.monotonic() + timeout
+        async with self.limiter.slot(timeout):
+            self.attempts += 1
+            return await asyncio.wait_for(self.provider.generate(contents, config), deadline - time.monotonic())
+
+    async def _attempt(self, contents: list, config, timeout: float) -> str:
+        started = time.monotonic()
+        primary = asyncio.ensure_future(self._call(contents, config, timeout))
+        pending = {primary}
+        try:
+            delay = self.hedge_delay()
+            if delay is not None and delay < timeout:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done:
+                    self.hedged += 1
+                    pending.add(asyncio.ensure_future(self._call(contents, config, timeout - delay)))
+            errors = {}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.hedge_wins += task is not primary
+                        self.latency.record(time.monotonic() - started)
+                        return task.result()
+                    errors[task is primary] = task.exception()
+            raise errors.get(True) or errors[False]
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def generate(self, contents: list, config) -> str:
+        deadline = time.monotonic() + self.timeout
+        attempt  = 0
+        while True:
+            self.breaker.check()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            try:
+                text = await self._attempt(contents, config, min(self.attempt_timeout, remaining))
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.success()
+            return text
+
+    async def stream(self, contents: list, config, deadline: float) -> AsyncIterator[str]:
+        """Text chunks. Retries (never hedging) only happen before the first chunk: once text
+        has reached the client, a failure ends the stream. `deadline` is on the monotonic clock."""
+        attempt = 0
+        async with self.limiter.slot(deadline - time.monotonic()):
+            while True:
+                self.breaker.check()
+                self.attempts += 1
+                chunks = self.provider.stream(contents, config)
+                try:
+                    remaining = min(self.attempt_timeout, deadline - time.monotonic())
+                    first = await asyncio.wait_for(chunks.__anext__(), max(remaining, 0.0))
+                    break
+                except StopAsyncIteration:
+                    first = None
+                    break
+                except Exception as e:
+                    await chunks.aclose()
+                    delay = self._retry_delay(e, attempt, deadline)
+                    if delay is None:
+                        raise
+                    attempt += 1
+                    await asyncio.sleep(delay)
+
+            try:
+                if first is not None:
+                    yield first
+                    async for text in chunks:
+                        yield text
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError) or self.provider.retryable(e):
+                    self.breaker.failure()
+                raise
+            finally:
+                await chunks.aclose()
+            self.breaker.success()
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.provider.name,
+            "attempts": self.attempts,
+            "retries": self.retried,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+            "p95_seconds": self.latency.quantile(0.95),
+        }
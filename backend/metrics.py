@@ -0,0 +1,213 @@
+"""
+EcoSage metrics — dependency-free counters, gauges and histograms in Prometheus text format,
+plus per-request stage timings for the Server-Timing header.
+"""
+
+import bisect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS    = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+COUNT_BUCKETS   = (0, 1, 2, 3, 4, 5, 6, 8, 10, 20)
+
+_metrics: list["Metric"] = []
+
+
+def _fmt_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name       = name
+        self.help       = help
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], object] = {}
+        _metrics.append(self)
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values, child) -> list[str]:
+        return [f"{self.name}{_fmt_labels(self.labelnames, values)} {child.value}"]
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+
+class CallbackGauge(Metric):
+    """Gauge read at scrape time from `fn`, which returns {label values: value}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...], fn: Callable[[], dict]):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in sorted(self.fn().items()):
+            lines.append(f"{self.name}{_fmt_labels(self.labelnames, values)} {value}")
+        return lines
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum    = 0.0
+        self.count  = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum   += value
+        self.count += 1
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _render_child(self, values, child) -> list[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip(list(child.bounds) + ["+Inf"], child.counts):
+            cumulative += count
+            le = 'le="%s"' % bound
+            lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, values, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, values)} {child.sum}")
+        lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, values)} {child.count}")
+        return lines
+
+
+def render() -> str:
+    return "\n".join(line for metric in _metrics for line in metric.render()) + "\n"
+
+
+# ── Request timings ───────────────────────────────────────────────────────
+STAGE_SECONDS = Histogram("ecosage_stage_seconds", "Time spent per request stage.", ("stage",))
+
+_timings: ContextVar[Optional[list[tuple[str, float]]]] = ContextVar("ecosage_timings", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block into ecosage_stage_seconds and the current request's Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def current_timings() -> Optional[list[tuple[str, float]]]:
+    """(stage, seconds) recorded so far for the current request, if MetricsMiddleware is timing it."""
+    return _timings.get()
+
+
+REQUEST_SECONDS = Histogram("ecosage_request_seconds", "HTTP request latency until the response completes.", ("route", "method", "status"))
+IN_FLIGHT       = Gauge("ecosage_http_in_flight", "HTTP requests currently being served.")
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: request latency, in-flight gauge and optional Server-Timing."""
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = []
+        token   = _timings.set(timings)
+        status  = "500"
+        started = time.perf_counter()
+        gauge   = IN_FLIGHT.labels()
+        gauge.inc()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                if self.server_timing and timings:
+                    totals: dict[str, float] = {}  # batches repeat stages; report each once, summed
+                    for name, secs in timings:
+                        totals[name] = totals.get(name, 0.0) + secs
+                    value = ", ".join(f"{name};dur={secs * 1000:.2f}" for name, secs in totals.items())
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            gauge.dec()
+            _timings.reset(token)
+            route = scope.get("route")
+            path  = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.labels(path, scope["method"], status).observe(time.perf_counter() - started)
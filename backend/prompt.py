@@ -0,0 +1,182 @@
+"""
+EcoSage prompt assembly — fits the system prompt, question, retrieved context and conversation
+history into an input-token budget, compacting older turns into a rolling summary.
+"""
+
+import math
+import re
+from collections import OrderedDict
+from typing import NamedTuple
+
+from cache import make_key
+from chunking import Hit, Passage
+from docstore import DocRecord
+
+CHARS_PER_TOKEN    = 4.0   # Gemini's rule of thumb for English text
+FRAME_TOKENS       = 16    # section headings and separators around the user turn
+SUMMARY_SHARE      = 0.4   # of the history budget, reserved for the summary once turns overflow
+SUMMARY_LINE_WORDS = 24
+
+FIRST_SENTENCE_RE = re.compile(r"\S[^.!?\n]*[.!?]?")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut  = int(max_tokens * CHARS_PER_TOKEN)
+    head = text[:cut]
+    return (head.rsplit(None, 1)[0] if " " in head else head) + " …"
+
+
+class Prompt(NamedTuple):
+    history: list           # turns sent verbatim, oldest first (anything with .role and .content)
+    user_text: str          # summary, context and question: the final user turn
+    cache_parts: list       # the history as it shaped this prompt, for answer cache keys
+    tokens: dict[str, int]  # estimated input tokens per part, plus "total"
+
+
+def build_context(retrieved: list[Hit], budget: int) -> str:
+    """Best passages across all hits, up to `budget` tokens, grouped under their document titles."""
+    ranked = sorted(((score, p, hit.doc) for hit in retrieved for p, score in hit.passages), key=lambda x: -x[0])
+    chosen: dict[str, tuple[DocRecord, list[Passage]]] = {}
+    used = 0
+    for _, passage, doc in ranked:
+        size = math.ceil((passage.end - passage.start) / CHARS_PER_TOKEN)
+        if chosen and used + size > budget:
+            continue
+        chosen.setdefault(doc["id"], (doc, []))[1].append(passage)
+        used += size
+
+    blocks = []
+    for doc, passages in chosen.values():
+        spans: list[list[int]] = []
+        for p in sorted(passages, key=lambda p: p.start):
+            if spans and p.start <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], p.end)
+            else:
+                spans.append([p.start, p.end])
+        text = "\n...\n".join(doc.text(s, e).strip() for s, e in spans)
+        blocks.append(f"[{doc['title']}]\n{text}")
+    return "\n\n".join(blocks)
+
+
+class HistorySummarizer:
+    """Extractive running summary of turns that no longer fit verbatim, one short line per turn.
+
+    Summaries are cached by the turns they cover, so each new exchange extends the previous
+    summary by two lines instead of re-reading the whole conversation.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_lines: int = 256):
+        self.max_entries = max_entries
+        self.max_lines   = max_lines  # newest lines kept per entry; older ones never fit a prompt
+        self.hits    = 0
+        self.extends = 0
+        self.misses  = 0
+        self._cache: OrderedDict[str, list[str]] = OrderedDict()
+
+    @staticmethod
+    def line(turn) -> str:
+        match = FIRST_SENTENCE_RE.search(turn.content)
+        words = (match.group() if match else "").split()
+        text  = " ".join(words[:SUMMARY_LINE_WORDS]) + (" …" if len(words) > SUMMARY_LINE_WORDS else "")
+        return f"{'User' if turn.role == 'user' else 'EcoSage'}: {text}"
+
+    def summarize(self, turns: list, budget: int) -> str:
+        """The newest summary lines of `turns` that fit in `budget` tokens."""
+        if not turns or budget <= 0:
+            return ""
+        lines = self._lines(turns)
+        start = 0
+        while len(lines) - start > 1 and estimate_tokens("\n".join(lines[start:])) > budget:
+            start += 1
+        return "\n".join(lines[start:])
+
+    def _lines(self, turns: list) -> list[str]:
+        """Summary lines of `turns`, cached by the turns alone: the budget differs from one
+        request to the next (it is whatever the verbatim turns leave), so it is applied after."""
+        key   = make_key([(t.role, t.content) for t in turns])
+        lines = self._cache.get(key)
+        if lines is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return lines
+
+        for cut in (len(turns) - 2, len(turns) - 1):
+            previous = self._cache.get(make_key([(t.role, t.content) for t in turns[:cut]])) if cut > 0 else None
+            if previous is not None:
+                self.extends += 1
+                lines = previous + [self.line(t) for t in turns[cut:]]
+                break
+        else:
+            self.misses += 1
+            lines = [self.line(t) for t in turns]
+
+        lines = lines[-self.max_lines:]
+        self._cache[key] = lines
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return lines
+
+    def stats(self) -> dict:
+        return {"entries": len(self._cache), "hits": self.hits, "extends": self.extends, "misses": self.misses}
+
+
+class PromptBuilder:
+    """Splits `budget` input tokens: the system prompt and (capped) question first, then up to
+    `history_share` of the rest for history, and everything left over for retrieved context."""
+
+    def __init__(self, system_prompt: str, budget: int, history_share: float, max_turns: int,
+                 question_max_tokens: int, summarizer: HistorySummarizer):
+        self.system_prompt       = system_prompt
+        self.budget              = budget
+        self.history_share       = history_share
+        self.max_turns           = max_turns
+        self.question_max_tokens = question_max_tokens
+        self.summarizer          = summarizer
+        self.system_tokens       = estimate_tokens(system_prompt)
+
+    def _verbatim(self, history: list, budget: int) -> tuple[list, int]:
+        """Newest turns that fit in `budget`, oldest first."""
+        kept, used = [], 0
+        for turn in reversed(history[-self.max_turns:]):
+            size = estimate_tokens(turn.content)
+            if used + size > budget:
+                break
+            kept.append(turn)
+            used += size
+        kept.reverse()
+        return kept, used
+
+    def build(self, question: str, retrieved: list[Hit], history: list) -> Prompt:
+        question  = truncate_tokens(question, self.question_max_tokens)
+        available = max(0, self.budget - self.system_tokens - estimate_tokens(question) - FRAME_TOKENS)
+
+        history_budget = int(available * self.history_share)
+        kept, used = self._verbatim(history, history_budget)
+        if len(kept) < len(history):
+            kept, used = self._verbatim(history, int(history_budget * (1 - SUMMARY_SHARE)))
+        summary = self.summarizer.summarize(history[:len(history) - len(kept)], history_budget - used)
+
+        context = build_context(retrieved, available - used - estimate_tokens(summary)) if retrieved else ""
+        parts = []
+        if summary:
+            parts.append(f"Earlier in this conversation:\n{summary}")
+        if context:
+            parts.append(f"Relevant knowledge base context:\n{context}")
+        parts.append(f"User question: {question}")
+
+        tokens = {
+            "system": self.system_tokens,
+            "history": used,
+            "summary": estimate_tokens(summary),
+            "context": estimate_tokens(context),
+            "question": estimate_tokens(question),
+        }
+        tokens["total"] = self.system_tokens + used + estimate_tokens("\n\n".join(parts))
+        cache_parts = [(t.role, t.content) for t in kept] + ([("summary", summary)] if summary else [])
+        return Prompt(kept, "\n\n".join(parts), cache_parts, tokens)
@@ -0,0 +1,155 @@
+"""
+EcoSage query log — one structured JSON line per chat request (question, retrieved ids and
+scores, per-stage timings, status), written off the hot path by a batching background thread
+with size-based rotation. `replay.py` turns these logs back into load.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Optional
+
+from metrics import current_timings
+
+logger = logging.getLogger("ecosage")
+
+_entry: ContextVar[Optional[dict]] = ContextVar("ecosage_query_log_entry", default=None)
+
+
+def annotate(**fields):
+    """Add fields to the current request's log entry (a no-op when the request is not logged)."""
+    entry = _entry.get()
+    if entry is not None:
+        entry.update(fields)
+
+
+class QueryLog:
+    """JSON-lines writer. `record` only appends to an in-memory queue (dropping entries once
+    `max_pending` are waiting); a daemon thread serialises and writes them in batches, and
+    rotates `path` to `path.1` ... `path.<backups>` once it would exceed `max_bytes`."""
+
+    def __init__(self, path: str, max_bytes: int, backups: int, batch_size: int = 512,
+                 flush_interval: float = 1.0, max_pending: int = 50000):
+        self.path           = path.format(pid=os.getpid())
+        self.max_bytes      = max_bytes
+        self.backups        = backups
+        self.batch_size     = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending    = max_pending
+        self.written   = 0
+        self.dropped   = 0
+        self.rotations = 0
+        self.errors    = 0
+        self._queue: deque[dict] = deque()
+        self._wake    = threading.Event()
+        self._closing = False
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._size = 0
+
+    def start(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._file = open(self.path, "ab")
+        self._size = self._file.tell()
+        self._thread = threading.Thread(target=self._run, name="ecosage-query-log", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout: float = 5.0):
+        """Flush what is queued and stop the writer."""
+        self._closing = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._file is not None:
+            self._file.close()
+
+    def record(self, entry: dict):
+        if len(self._queue) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._queue.append(entry)
+        if len(self._queue) == self.batch_size:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._drain()
+            if self._closing:
+                self._drain()
+                return
+
+    def _drain(self):
+        while self._queue:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            data  = "".join(json.dumps(e, separators=(",", ":"), ensure_ascii=False, default=str) + "\n"
+                            for e in batch).encode()
+            try:
+                if self._size and self._size + len(data) > self.max_bytes:
+                    self._rotate()
+                self._file.write(data)
+                self._file.flush()
+            except OSError as e:
+                self.errors  += 1
+                self.dropped += len(batch)
+                logger.warning(f"⚠️ Query log write failed ({e}); dropped {len(batch)} entries")
+                continue
+            self._size   += len(data)
+            self.written += len(batch)
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "ab")
+        self._size = 0
+        self.rotations += 1
+
+    def stats(self) -> dict:
+        return {"pending": len(self._queue), "written": self.written, "dropped": self.dropped,
+                "rotations": self.rotations, "errors": self.errors}
+
+
+class QueryLogMiddleware:
+    """Pure ASGI middleware: opens a log entry for requests to `paths`, lets handlers `annotate`
+    it, and records it with status, duration and stage timings once the response completes.
+    Install it inside MetricsMiddleware, which collects the stage timings."""
+
+    def __init__(self, app, log: QueryLog, paths: tuple[str, ...]):
+        self.app   = app
+        self.log   = log
+        self.paths = paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            return await self.app(scope, receive, send)
+
+        entry   = {"ts": round(time.time(), 3), "path": scope["path"], "status": 500}
+        token   = _entry.set(entry)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                entry["status"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _entry.reset(token)
+            entry["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            stages: dict[str, float] = {}
+            for name, secs in current_timings() or ():
+                stages[name] = stages.get(name, 0.0) + secs * 1000
+            entry["stages_ms"] = {name: round(ms, 2) for name, ms in stages.items()}
+            self.log.record(entry)
@@ -0,0 +1,257 @@
+"""
+Replay a query log (see QUERY_LOG) against the real app, in-process with the local stand-in
+model by default, and report throughput and latency percentiles.
+
+    python replay.py queries.jsonl                            # closed loop, 16 concurrent clients
+    python replay.py queries.jsonl* --rate 50 --duration 60   # open loop: 50 req/s for a minute
+    python replay.py queries.jsonl --speed 2                  # original arrival times, twice as fast
+    python replay.py queries.jsonl --stream --url http://localhost:8000   # a running server instead
+
+In-process runs read the usual environment (retriever, cache, admission...), except that the
+model is LLM_PROVIDER=local with --llm-latency/--llm-jitter, query logging is off, and, unless
+--clients spreads the traffic over several API keys, per-client rate limiting is off too.
+Open-loop latencies are measured from each request's scheduled start, so time spent queued
+behind --concurrency counts.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+
+def load_log(paths: list[str]) -> list[dict]:
+    """Replayable requests, oldest first: one per logged chat question (batches are split up)."""
+    requests = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    print(f"⚠️  {path}:{line_no}: skipped (not JSON)", file=sys.stderr)
+                    continue
+                base = {"ts": entry.get("ts", 0.0), "category": entry.get("category"), "session": entry.get("session")}
+                if entry.get("question"):
+                    requests.append({**base, "message": entry["question"]})
+                for question in entry.get("questions") or ():
+                    if question:
+                        requests.append({**base, "message": question, "session": None})
+    requests.sort(key=lambda r: r["ts"])
+    return requests
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"p50": pick(0.5), "p90": pick(0.9), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1]}
+
+
+class Replayer:
+    def __init__(self, client, args):
+        self.client   = client
+        self.args     = args
+        self.sessions: dict[str, str] = {}  # logged session id -> session id on the replay target
+        self.results: list[dict] = []
+
+    def body(self, req: dict) -> dict:
+        body = {"message": req["message"]}
+        if req.get("category"):
+            body["category"] = req["category"]
+        if req.get("session") in self.sessions:
+            body["session_id"] = self.sessions[req["session"]]
+        return body
+
+    def headers(self, i: int) -> dict:
+        headers = {}
+        if self.args.clients:
+            headers["X-API-Key"] = f"replay-{i % self.args.clients}"
+        if self.args.no_cache:
+            headers["Cache-Control"] = "no-store"
+        return headers
+
+    async def send(self, i: int, req: dict, scheduled: float):
+        result = {"status": 0, "cache": None, "degraded": False, "first_token": None}
+        try:
+            if self.args.stream:
+                await self._stream(i, req, scheduled, result)
+            else:
+                r = await self.client.post("/chat", json=self.body(req), headers=self.headers(i))
+                result["status"] = r.status_code
+                result["cache"]  = r.headers.get("x-cache")
+                if r.status_code == 200:
+                    data = r.json()
+                    result["degraded"] = data.get("degraded", False)
+                    self._remember(req, data.get("session_id"))
+        except Exception as e:
+            result["error"] = type(e).__name__
+        result["latency"] = time.perf_counter() - scheduled
+        self.results.append(result)
+
+    async def _stream(self, i: int, req: dict, scheduled: float, result: dict):
+        async with self.client.stream("POST", "/chat/stream", json=self.body(req), headers=self.headers(i)) as r:
+            result["status"] = r.status_code
+            event = None
+            async for line in r.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: "):
+                    data = json.loads(line[6:])
+                    if event == "sources":
+                        self._remember(req, data.get("session_id"))
+                    elif event == "delta" and result["first_token"] is None:
+                        result["first_token"] = time.perf_counter() - scheduled
+                    elif event == "done":
+                        result["cache"]    = "HIT" if data.get("cached") else "MISS"
+                        result["degraded"] = data.get("degraded", False)
+                    elif event == "error":
+                        result["status"] = data.get("status", 502)
+
+    def _remember(self, req: dict, session_id):
+        if req.get("session") and session_id:
+            self.sessions.setdefault(req["session"], session_id)
+
+    async def run(self, requests: list[dict]) -> float:
+        args = self.args
+        if args.duration and not args.speed:
+            requests = itertools.cycle(requests)
+        if args.limit:
+            requests = itertools.islice(requests, args.limit)
+        gate    = asyncio.Semaphore(args.concurrency)
+        tasks   = set()
+        started = time.perf_counter()
+        first_ts = None
+
+        async def issue(i, req, scheduled, holding: bool):
+            if not holding:
+                await gate.acquire()
+            try:
+                await self.send(i, req, scheduled)
+            finally:
+                gate.release()
+
+        for i, req in enumerate(requests):
+            if args.speed:
+                first_ts = req["ts"] if first_ts is None else first_ts
+                offset = (req["ts"] - first_ts) / args.speed
+            else:
+                offset = i / args.rate if args.rate else None
+            if offset is not None:
+                if args.duration and offset >= args.duration:
+                    break
+                delay = started + offset - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                scheduled = started + offset
+            else:
+                if args.duration and time.perf_counter() - started >= args.duration:
+                    break
+                await gate.acquire()  # closed loop: only issue when a client is free
+                scheduled = time.perf_counter()
+            task = asyncio.ensure_future(issue(i, req, scheduled, holding=offset is None))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        return time.perf_counter() - started
+
+
+def report(results: list[dict], elapsed: float, args) -> dict:
+    ok = [r for r in results if r["status"] == 200]
+    statuses: dict[str, int] = {}
+    for r in results:
+        key = str(r["status"]) if r["status"] else r.get("error", "failed")
+        statuses[key] = statuses.get(key, 0) + 1
+    ms = lambda p: {k: round(v * 1000, 2) for k, v in p.items()}
+    return {
+        "requests": len(results),
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "ok_throughput": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "status": statuses,
+        "cache_hits": sum(1 for r in ok if r["cache"] in ("HIT", "SEMANTIC")),
+        "degraded": sum(1 for r in ok if r["degraded"]),
+        "latency_ms": ms(percentiles([r["latency"] for r in ok])),
+        "first_token_ms": ms(percentiles([r["first_token"] for r in ok if r["first_token"] is not None])),
+        "mode": {"endpoint": "/chat/stream" if args.stream else "/chat", "concurrency": args.concurrency,
+                 "rate": args.rate, "speed": args.speed, "target": args.url or "in-process"},
+    }
+
+
+def print_report(summary: dict):
+    mode = summary["mode"]
+    pace = f"{mode['rate']} req/s" if mode["rate"] else f"{mode['speed']}x original timing" if mode["speed"] else "closed loop"
+    print(f"🔁 {summary['requests']} requests to {mode['endpoint']} ({mode['target']}, {pace}, "
+          f"concurrency {mode['concurrency']}) in {summary['seconds']}s")
+    print(f"   throughput  {summary['throughput']} req/s ({summary['ok_throughput']} ok)")
+    print(f"   status      {', '.join(f'{k}: {v}' for k, v in sorted(summary['status'].items()))}")
+    print(f"   cache hits  {summary['cache_hits']}   degraded  {summary['degraded']}")
+    for name in ("latency_ms", "first_token_ms"):
+        if summary[name]:
+            print(f"   {name:<11} " + "  ".join(f"{k} {v}" for k, v in summary[name].items()))
+
+
+async def replay(args, requests: list[dict]) -> dict:
+    import httpx
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout,
+                                   limits=httpx.Limits(max_connections=args.concurrency))
+        serving = nullcontext()
+    else:
+        import app as server
+        client  = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://replay",
+                                    timeout=args.timeout)
+        serving = server.lifespan(server.app)
+    async with serving, client:
+        replayer = Replayer(client, args)
+        elapsed  = await replayer.run(requests)
+    return report(replayer.results, elapsed, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay an EcoSage query log and measure throughput and latency.")
+    parser.add_argument("logs", nargs="+", help="query log files (rotated files may be listed together)")
+    parser.add_argument("--url", help="replay against a running server instead of in-process")
+    parser.add_argument("--stream", action="store_true", help="use /chat/stream and report time to first token")
+    parser.add_argument("--concurrency", type=int, default=16, help="max requests in flight (default 16)")
+    parser.add_argument("--rate", type=float, default=0.0, help="open loop at this many requests/s (default: closed loop)")
+    parser.add_argument("--speed", type=float, default=0.0, help="open loop at the logged arrival times, sped up by this factor")
+    parser.add_argument("--duration", type=float, default=0.0, help="stop issuing requests after this many seconds (loops the log)")
+    parser.add_argument("--limit", type=int, default=0, help="replay at most this many requests")
+    parser.add_argument("--clients", type=int, default=0, help="spread requests over this many API keys (keeps rate limits on)")
+    parser.add_argument("--no-cache", action="store_true", help="send Cache-Control: no-store")
+    parser.add_argument("--llm-latency", type=float, help="stand-in model latency in seconds (in-process only)")
+    parser.add_argument("--llm-jitter", type=float, help="stand-in model latency jitter in seconds (in-process only)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout per request")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+
+    requests = load_log(args.logs)
+    if not requests:
+        sys.exit("❌ No replayable requests in the log")
+    if not args.url:
+        os.environ["LLM_PROVIDER"] = "local"
+        os.environ["QUERY_LOG"] = ""
+        if not args.clients:
+            os.environ["ADMISSION_RATE"] = "0"
+        if args.llm_latency is not None:
+            os.environ["LOCAL_LLM_LATENCY"] = str(args.llm_latency)
+        if args.llm_jitter is not None:
+            os.environ["LOCAL_LLM_JITTER"] = str(args.llm_jitter)
+
+    summary = asyncio.run(replay(args, requests))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_report(summary)
+
+
+if __name__ == "__main__":
+    main()
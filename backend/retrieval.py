@@ -0,0 +1,388 @@
+"""
+EcoSage keyword retrieval — tokenized inverted index with BM25 ranking, plus a character
+trigram index over its vocabulary for typo-tolerant and prefix query expansion.
+"""
+
+import bisect
+import heapq
+import math
+import re
+from functools import lru_cache
+from typing import Iterable, Optional
+
+import numpy as np
+
+TOKEN_RE   = re.compile(r"[a-z0-9]+")
+VOWEL_RE   = re.compile(r"[aeiouy]")
+STEM_EXCEPTIONS = frozenset({"news", "series", "species"})  # look inflected, are not
+STOP_WORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "how",
+    "i", "in", "is", "it", "me", "my", "of", "on", "or", "the", "to", "what", "with",
+})
+
+
+FUZZY_MIN_LEN    = 4    # shorter unknown tokens are not corrected
+FUZZY_CANDIDATES = 24   # terms sharing the most trigrams, checked by edit distance
+FUZZY_EXPANSIONS = 3
+PREFIX_MIN_LEN   = 2
+PREFIX_EXPANSIONS = 4
+PREFIX_WEIGHT    = 0.8
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+
+@lru_cache(maxsize=1 << 16)  # the same few thousand words recur across passages and queries
+def stem(token: str) -> str:
+    """Light suffix stripping so inflections share one index term: "composting", "composted"
+    and "composts" become "compost", "save", "saves", "saving" and "savings" become "sav",
+    "batteries" becomes "battery" and "buses" "bus". A final "e" is always dropped, so verbs
+    that lose it before -ing/-ed still meet their base form. Deliberately conservative (no
+    derivational suffixes), so unrelated words are not conflated."""
+    if len(token) <= 2 or not token.isalpha() or token in STEM_EXCEPTIONS:
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        token = token[:-3] + "y"
+    elif token.endswith("es") and token[:-2].endswith(("s", "x", "z", "ch", "sh")) and len(token) > 4:
+        token = token[:-2]  # "buses" -> "bus", "boxes" -> "box"
+    elif token.endswith("s") and len(token) > 3 and not token.endswith(("ss", "us", "is")):
+        token = token[:-1]
+    for suffix in ("ing", "ed"):
+        base = token[:-len(suffix)]
+        if token.endswith(suffix) and not token.endswith("eed") and len(base) >= 2 and VOWEL_RE.search(base):
+            token = base
+            if len(base) > 3 and base[-1] == base[-2] and base[-1] not in "aeioulsz":
+                token = base[:-1]  # "shopping" -> "shop"
+            break
+    if token.endswith("e") and len(token) > 2:
+        token = token[:-1]  # "save" and "saving" -> "sav", "use" and "using" -> "us"
+    return token
+
+
+def index_terms(text: str) -> list[str]:
+    """Index terms of `text`: stemmed tokens. Documents and queries both go through this."""
+    return [stem(t) for t in tokenize(text)]
+
+
+def _grams(term: str, anchor_end: bool = True) -> list[str]:
+    padded = f"${term}$" if anchor_end else f"${term}"
+    return list(dict.fromkeys(padded[i:i + 3] for i in range(len(padded) - 2)))
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (adjacent swaps count once), or limit + 1 once exceeded."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class NgramVocabulary:
+    """Append-only vocabulary with a trigram -> term-id index, for "compsting" -> "composting"
+    and "insul" -> "insulation" style expansions. Terms are padded with "$" so that word starts
+    and ends are grams of their own."""
+
+    def __init__(self, terms: Iterable[str] = ()):
+        self.terms: list[str] = []
+        self.ids: dict[str, int] = {}
+        self._grams: dict[str, list[int]] = {}
+        self._arrays: dict[str, np.ndarray] = {}  # cached array form of _grams, refreshed when they grow
+        for term in terms:
+            self.add(term)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.ids
+
+    def add(self, term: str):
+        if term in self.ids:
+            return
+        tid = len(self.terms)
+        self.ids[term] = tid
+        self.terms.append(term)
+        for gram in _grams(term):
+            self._grams.setdefault(gram, []).append(tid)
+
+    def _postings(self, gram: str) -> Optional[np.ndarray]:
+        ids = self._grams.get(gram)
+        if not ids:
+            return None
+        arr = self._arrays.get(gram)
+        if arr is None or len(arr) != len(ids):
+            arr = self._arrays[gram] = np.array(ids, dtype=np.int32)
+        return arr
+
+    def _shared(self, grams: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """(term ids, number of `grams` each contains)."""
+        lists = [p for p in (self._postings(g) for g in grams) if p is not None]
+        if not lists:
+            return _EMPTY, _EMPTY
+        counts = np.bincount(np.concatenate(lists), minlength=len(self.terms))
+        ids    = np.flatnonzero(counts)
+        return ids, counts[ids]
+
+    def similar(self, term: str) -> list[tuple[str, float]]:
+        """Vocabulary terms within 1 (short terms) or 2 edits of `term`, closest first, weighted by closeness."""
+        if len(term) < FUZZY_MIN_LEN:
+            return []
+        limit = 1 if len(term) < 7 else 2
+        grams = _grams(term)
+        ids, counts = self._shared(grams)
+        keep = counts >= len(grams) - 3 * limit  # each edit breaks at most three trigrams
+        ids, counts = ids[keep], counts[keep]
+        if len(ids) > FUZZY_CANDIDATES:
+            top = np.argpartition(counts, len(ids) - FUZZY_CANDIDATES)[len(ids) - FUZZY_CANDIDATES:]
+            ids, counts = ids[top], counts[top]
+        found = []
+        for tid in ids[np.argsort(-counts, kind="stable")]:
+            cand = self.terms[tid]
+            dist = edit_distance(term, cand, limit)
+            if dist <= limit:
+                found.append((dist, cand))
+        found.sort()
+        return [(cand, 1.0 - dist / (len(term) + 1)) for dist, cand in found[:FUZZY_EXPANSIONS]]
+
+    def complete(self, prefix: str, df) -> list[str]:
+        """Most frequent terms (by `df(term)`) that start with `prefix`."""
+        if len(prefix) < PREFIX_MIN_LEN:
+            return []
+        grams = _grams(prefix, anchor_end=False)
+        ids, counts = self._shared(grams)
+        cands = [self.terms[t] for t in ids[counts == len(grams)] if self.terms[t].startswith(prefix)]
+        return sorted(cands, key=lambda t: (-df(t), t))[:PREFIX_EXPANSIONS]
+
+
+class FrozenPostings:
+    """Immutable CSR postings: the postings of terms[i] are doc_ids/tfs[offsets[i]:offsets[i + 1]].
+
+    The arrays may be numpy memmaps over an on-disk index, so lookups only page in
+    the postings they touch.
+    """
+
+    def __init__(self, terms: list[str], offsets: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray):
+        self.terms   = terms
+        self.slots   = {t: i for i, t in enumerate(terms)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs     = tfs
+
+    def get(self, term: str) -> Optional[tuple[np.ndarray, np.ndarray]]:
+        i = self.slots.get(term)
+        if i is None:
+            return None
+        s, e = self.offsets[i], self.offsets[i + 1]
+        return self.doc_ids[s:e], self.tfs[s:e]
+
+
+class InvertedIndex:
+    """Term -> postings of (doc ordinal, term frequency), scored with Okapi BM25.
+
+    Append-only: ordinals only grow and postings stay sorted, so a `view()` taken at
+    any point keeps answering for exactly the documents it saw while later `add`s
+    continue. Deletes are tombstones until the owner rebuilds the index. An optional
+    frozen `base` segment (e.g. loaded from disk) holds the first ordinals; everything
+    added afterwards goes to the in-memory `postings`.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, base: Optional[FrozenPostings] = None,
+                 base_lens: Optional[np.ndarray] = None, vocab: Optional[NgramVocabulary] = None):
+        self.k1 = k1
+        self.b  = b
+        self.base = base
+        self.vocab = vocab if vocab is not None else NgramVocabulary(base.terms if base is not None else ())
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        self.deleted: set[int] = set()
+        n = len(base_lens) if base_lens is not None else 0
+        # a (memory-mapped) base is used in place until the first `add` copies it
+        self._lens = base_lens if n else np.zeros(1024, dtype=np.int32)
+        self.n = self.base_n = n
+        self.live_len = int(self._lens[:n].sum())
+
+    @classmethod
+    def build(cls, texts: Iterable[str], **kwargs) -> "InvertedIndex":
+        index = cls(**kwargs)
+        for text in texts:
+            index.add(text)
+        return index
+
+    def __len__(self) -> int:
+        return self.n
+
+    @property
+    def doc_lens(self) -> np.ndarray:
+        return self._lens[:self.n]
+
+    def add(self, text: str) -> int:
+        tokens = index_terms(text)
+        ordinal = self.n
+        freqs: dict[str, int] = {}
+        for tok in tokens:
+            freqs[tok] = freqs.get(tok, 0) + 1
+        for term, tf in freqs.items():
+            if term not in self.postings:
+                self.vocab.add(term)
+            self.postings.setdefault(term, []).append((ordinal, tf))
+        if ordinal == len(self._lens) or not self._lens.flags.writeable:
+            grown = np.zeros(max(2 * len(self._lens), 1024), dtype=np.int32)
+            grown[:ordinal] = self._lens
+            self._lens = grown
+        self._lens[ordinal] = len(tokens)
+        self.n += 1
+        self.live_len += len(tokens)
+        return ordinal
+
+    def delete(self, ordinal: int):
+        if ordinal not in self.deleted:
+            self.deleted.add(ordinal)
+            self.live_len -= int(self._lens[ordinal])
+
+    def df(self, term: str) -> int:
+        """Postings for `term`, tombstones included (a cheap popularity signal)."""
+        count = len(self.postings.get(term, ()))
+        if self.base is not None and (i := self.base.slots.get(term)) is not None:
+            count += int(self.base.offsets[i + 1] - self.base.offsets[i])
+        return count
+
+    def expand(self, query: str, prefix: bool = False) -> dict[str, float]:
+        """Query terms with weights: known terms as-is, unknown ones replaced by their closest
+        vocabulary terms, and (with `prefix`) the last token also completed as a word prefix."""
+        tokens = index_terms(query)
+        weights: dict[str, float] = {}
+        for i, tok in enumerate(tokens):
+            if tok in self.vocab:
+                weights[tok] = 1.0
+            else:
+                for cand, weight in self.vocab.similar(tok):
+                    weights[cand] = max(weights.get(cand, 0.0), weight)
+            if prefix and i == len(tokens) - 1:
+                for cand in self.vocab.complete(tok, self.df):
+                    weights[cand] = max(weights.get(cand, 0.0), 1.0 if cand == tok else PREFIX_WEIGHT)
+        return weights
+
+    def term_postings(self, term: str, n: int) -> tuple[np.ndarray, np.ndarray]:
+        """(ordinals, tfs) for `term` restricted to ordinals < n."""
+        parts = []
+        if self.base is not None and (frozen := self.base.get(term)) is not None:
+            parts.append(frozen)
+        delta = self.postings.get(term)
+        if delta:
+            cut = bisect.bisect_left(delta, (n,))
+            if cut:
+                arr = np.array(delta[:cut], dtype=np.int64)
+                parts.append((arr[:, 0], arr[:, 1]))
+        if not parts:
+            return _EMPTY, _EMPTY
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+
+    def freeze(self) -> tuple[FrozenPostings, np.ndarray]:
+        """Merge base and delta into one CSR segment. Tombstoned postings are kept; the
+        caller carries `deleted` over or compacts first."""
+        terms = sorted(set(self.postings) | set(self.base.terms if self.base else ()))
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        ids, tfs = [], []
+        for i, term in enumerate(terms):
+            t_ids, t_tfs = self.term_postings(term, self.n)
+            ids.append(t_ids)
+            tfs.append(t_tfs)
+            offsets[i + 1] = offsets[i] + len(t_ids)
+        doc_ids = np.concatenate(ids).astype(np.int32) if ids else _EMPTY.astype(np.int32)
+        freqs   = np.concatenate(tfs).astype(np.int32) if tfs else _EMPTY.astype(np.int32)
+        return FrozenPostings(terms, offsets, doc_ids, freqs), self.doc_lens.copy()
+
+    def view(self) -> "IndexView":
+        return IndexView(self, self.n, self.live_len, frozenset(self.deleted))
+
+    def search(self, query: str, top_k: int, prefix: bool = False) -> list[tuple[int, float]]:
+        return self.view().search(query, top_k, prefix)
+
+
+_EMPTY = np.zeros(0, dtype=np.int64)
+
+
+class IndexView:
+    """Read-only, point-in-time view of an InvertedIndex."""
+
+    __slots__ = ("index", "n", "lens", "live_len", "deleted")
+
+    def __init__(self, index: InvertedIndex, n: int, live_len: int, deleted: frozenset[int]):
+        self.index    = index
+        self.n        = n
+        self.lens     = index._lens
+        self.live_len = live_len
+        self.deleted  = deleted
+
+    def search(self, query: str, top_k: int, prefix: bool = False,
+               allowed: Optional[np.ndarray] = None) -> list[tuple[int, float]]:
+        return self.search_terms(self.index.expand(query, prefix), top_k, allowed)
+
+    def search_terms(self, terms: dict[str, float], top_k: int,
+                     allowed: Optional[np.ndarray] = None) -> list[tuple[int, float]]:
+        """Return up to `top_k` (ordinal, score) pairs for weighted terms, best first.
+
+        Work is proportional to the postings of the query terms, scored vectorised. `allowed`
+        (a boolean mask over ordinals) restricts results; idf stays corpus-wide.
+        """
+        live = self.n - len(self.deleted)
+        if live <= 0 or top_k <= 0:
+            return []
+        k1, b   = self.index.k1, self.index.b
+        avg_len = self.live_len / live or 1.0
+        ids_parts, score_parts = [], []
+        for term, weight in terms.items():
+            ids, tfs = self.index.term_postings(term, self.n)
+            df = len(ids)
+            if df == 0:
+                continue
+            idf  = math.log(1.0 + (self.n - df + 0.5) / (df + 0.5))
+            if allowed is not None:
+                keep = allowed[ids]
+                ids, tfs = ids[keep], tfs[keep]
+            tfs  = tfs.astype(np.float64)
+            norm = k1 * (1.0 - b + b * self.lens[ids] / avg_len)
+            ids_parts.append(ids)
+            score_parts.append(weight * idf * tfs * (k1 + 1.0) / (tfs + norm))
+        if not ids_parts:
+            return []
+
+        ids    = np.concatenate(ids_parts) if len(ids_parts) > 1 else ids_parts[0]
+        scores = np.concatenate(score_parts) if len(score_parts) > 1 else score_parts[0]
+        if len(ids_parts) > 1:
+            ids, inverse = np.unique(ids, return_inverse=True)
+            scores = np.bincount(inverse, weights=scores)
+        if self.deleted:
+            keep   = ~np.isin(ids, np.fromiter(self.deleted, dtype=np.int64, count=len(self.deleted)))
+            ids, scores = ids[keep], scores[keep]
+
+        k = min(top_k, len(ids))
+        if k == 0:
+            return []
+        top = np.argpartition(scores, len(scores) - k)[len(scores) - k:] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+
+def fuse(keyword_hits: list[tuple[int, float]], dense_hits: list[tuple[int, float]], alpha: float, top_k: int) -> list[tuple[int, float]]:
+    """Hybrid ranking: alpha * cosine + (1 - alpha) * BM25 scaled to the query's best match."""
+    scores: dict[int, float] = {}
+    if keyword_hits:
+        best = keyword_hits[0][1] or 1.0
+        for ordinal, score in keyword_hits:
+            scores[ordinal] = (1.0 - alpha) * score / best
+    for ordinal, score in dense_hits:
+        scores[ordinal] = scores.get(ordinal, 0.0) + alpha * score
+    return heapq.nlargest(top_k, scores.items(), key=lambda x: x[1])
@@ -0,0 +1,106 @@
+"""
+Serve EcoSage from several worker processes that share one index and one knowledge journal.
+
+    python serve.py                                  # one worker per core, port 8000
+    python serve.py --workers 4 --port 8080
+    python serve.py --rebuild                        # rebuild the index from knowledge_base.py first
+
+Before starting the workers, the index artifact at $INDEX_PATH (or ./index) is brought up to
+date once: built from knowledge_base.py when missing or built with other settings, and with
+any documents written at runtime since (the knowledge journal, $KNOWLEDGE_JOURNAL or
+./knowledge.db) folded in. Workers memory-map the artifact, so the postings and
+embeddings sit in the page cache once however many workers run, and follow the journal for
+writes made while serving: a document added through any worker reaches every worker within
+KNOWLEDGE_SYNC_INTERVAL, in the same order everywhere.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import app as server
+from index_file import IndexFormatError, load_index, save_index
+from journal import KnowledgeJournal, apply_mutation
+from knowledge import KnowledgeStore
+from vectors import make_embedder
+
+logger = logging.getLogger("ecosage")
+
+
+def prepare_index(path: str, journal_path: str, rebuild: bool) -> dict:
+    """Make the artifact at `path` contain everything in the journal. Returns its manifest."""
+    started  = time.perf_counter()
+    journal  = KnowledgeJournal(journal_path)
+    embedder = make_embedder(server.EMBEDDER, server.EMBED_DIM) if server.RETRIEVER != "keyword" else None
+    store = KnowledgeStore("hybrid" if embedder else "keyword", embedder,
+                           server.PASSAGE_CHARS, server.PASSAGE_OVERLAP, server.HYBRID_ALPHA)
+    spec  = server.EMBEDDER if embedder else None
+
+    manifest = None
+    if not rebuild and os.path.exists(os.path.join(path, "manifest.json")):
+        try:
+            manifest = load_index(path, store, spec)
+        except IndexFormatError as e:
+            logger.warning(f"⚠️ {e}; rebuilding {path} from knowledge_base.py")
+    if manifest is None:
+        from knowledge_base import SUSTAINABILITY_DOCS
+        for i in range(0, len(SUSTAINABILITY_DOCS), server.BULK_BATCH_DOCS):
+            store.upsert(SUSTAINABILITY_DOCS[i:i + server.BULK_BATCH_DOCS])
+
+    folded = (manifest or {}).get("journal") or {}
+    seq    = folded.get("seq", 0) if folded.get("id") == journal.id else 0
+    applied = 0
+    while entries := journal.since(seq):
+        for seq, op, payload in entries:
+            apply_mutation(store, op, payload)
+        applied += len(entries)
+    if manifest is not None and not applied:
+        logger.info(f"💾 {path} is up to date with the knowledge journal")
+        journal.close()
+        return manifest
+
+    manifest = save_index(store, path, spec, journal={"id": journal.id, "seq": seq})
+    journal.close()
+    logger.info(f"💾 Wrote {path}: {manifest['counts']}, {applied} journal entries folded in, "
+                f"{time.perf_counter() - started:.1f}s")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve EcoSage from several workers sharing one index.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: one per core)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--index", default=server.INDEX_PATH or "index", help="index artifact directory (default: $INDEX_PATH or ./index)")
+    parser.add_argument("--journal", default=server.KNOWLEDGE_JOURNAL or "knowledge.db",
+                        help="knowledge journal file (default: $KNOWLEDGE_JOURNAL or ./knowledge.db)")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index from knowledge_base.py and the whole journal")
+    args = parser.parse_args()
+
+    # In a short-lived process, so the supervisor does not hold on to the build's memory.
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        try:
+            pool.submit(prepare_index, args.index, args.journal, args.rebuild).result()
+        except IndexFormatError as e:
+            sys.exit(f"❌ {e}")
+
+    os.environ["INDEX_PATH"]        = os.path.abspath(args.index)
+    os.environ["KNOWLEDGE_JOURNAL"] = os.path.abspath(args.journal)
+    if args.workers > 1:
+        if server.SESSION_BACKEND == "memory":
+            os.environ["SESSION_BACKEND"] = "sqlite"
+            logger.info(f"💬 SESSION_BACKEND=sqlite ({server.SESSION_DB}) so conversations work across workers")
+        if server.QUERY_LOG and "{pid}" not in server.QUERY_LOG:
+            logger.warning("⚠️ QUERY_LOG has no {pid}: workers will rotate the same file; add {pid} to the path")
+
+    import uvicorn
+    logger.info(f"🚀 Starting {args.workers} worker(s) on {args.host}:{args.port}")
+    uvicorn.run("app:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+EcoSage conversation sessions — server-side chat history so clients only send the new message.
+
+Two interchangeable stores:
+    MemorySessionStore   per-process LRU bounded by total bytes, with an idle TTL
+    SqliteSessionStore   local SQLite file; survives restarts and is shared by workers on a host
+"""
+
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+MESSAGE_OVERHEAD = 64  # rough per-message bookkeeping cost, in bytes
+
+
+class Turn(NamedTuple):
+    role: str     # "user" | "assistant"
+    content: str
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def turn_size(turn: Turn) -> int:
+    return len(turn.content.encode("utf-8")) + MESSAGE_OVERHEAD
+
+
+class MemorySessionStore:
+    """Sessions in least-recently-used order, so idle expiry and byte-bound eviction
+    both pop from the front."""
+
+    blocking = False  # cheap enough to call from the event loop
+
+    def __init__(self, max_bytes: int, ttl: float, max_messages: int):
+        self.max_bytes    = max_bytes
+        self.ttl          = ttl
+        self.max_messages = max_messages
+        self.bytes        = 0
+        self.evictions    = 0
+        self.expirations  = 0
+        self._sessions: OrderedDict[str, tuple[float, int, list[Turn]]] = OrderedDict()
+
+    def create(self, turns: list[Turn] = ()) -> str:
+        session_id = new_session_id()
+        self._store(session_id, list(turns))
+        return session_id
+
+    def get(self, session_id: str) -> Optional[list[Turn]]:
+        self._expire()
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        self._sessions.move_to_end(session_id)
+        self._sessions[session_id] = (time.monotonic(), entry[1], entry[2])
+        return list(entry[2])
+
+    def append(self, session_id: str, turns: list[Turn]):
+        entry = self._sessions.get(session_id)
+        self._store(session_id, (entry[2] if entry else []) + list(turns))
+
+    def delete(self, session_id: str) -> bool:
+        if session_id not in self._sessions:
+            return False
+        self._remove(session_id)
+        return True
+
+    def _store(self, session_id: str, turns: list[Turn]):
+        turns = turns[-self.max_messages:]
+        if session_id in self._sessions:
+            self._remove(session_id)
+        size = sum(turn_size(t) for t in turns)
+        self._sessions[session_id] = (time.monotonic(), size, turns)
+        self.bytes += size
+        self._expire()
+        while self.bytes > self.max_bytes and len(self._sessions) > 1:
+            self._remove(next(iter(self._sessions)))
+            self.evictions += 1
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        while self._sessions:
+            session_id, (last_seen, _, _) = next(iter(self._sessions.items()))
+            if last_seen >= cutoff:
+                break
+            self._remove(session_id)
+            self.expirations += 1
+
+    def _remove(self, session_id: str):
+        _, size, _ = self._sessions.pop(session_id)
+        self.bytes -= size
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "bytes": self.bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def close(self):
+        self._sessions.clear()
+        self.bytes = 0
+
+
+class SqliteSessionStore:
+    """Sessions in a local SQLite file (WAL mode). Calls block on disk, so the app runs them in a thread.
+
+    `stats()` is read from the event loop (health checks, the metrics gauge), so it reports a running
+    count instead of querying: this process adjusts it on create/delete and recounts on every sweep,
+    which also picks up sessions other workers created.
+    """
+
+    blocking = True
+    PURGE_EVERY = 256  # writes between sweeps of idle sessions
+
+    def __init__(self, path: str, ttl: float, max_messages: int):
+        self.path         = path
+        self.ttl          = ttl
+        self.max_messages = max_messages
+        self._writes      = 0
+        self._count       = 0
+        self._lock = threading.Lock()
+        self._db   = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS sessions (
+                id        TEXT PRIMARY KEY,
+                last_seen REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen);
+            CREATE TABLE IF NOT EXISTS messages (
+                session_id TEXT    NOT NULL,
+                seq        INTEGER NOT NULL,
+                role       TEXT    NOT NULL,
+                content    TEXT    NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID;
+        """)
+        self._recount()
+
+    def create(self, turns: list[Turn] = ()) -> str:
+        session_id = new_session_id()
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO sessions (id, last_seen) VALUES (?, ?)", (session_id, time.time()))
+            self._insert(session_id, 0, list(turns)[-self.max_messages:])
+            self._count += 1
+        return session_id
+
+    def get(self, session_id: str) -> Optional[list[Turn]]:
+        now = time.time()
+        with self._lock, self._db:
+            touched = self._db.execute(
+                "UPDATE sessions SET last_seen = ? WHERE id = ? AND last_seen >= ?", (now, session_id, now - self.ttl)
+            ).rowcount
+            if not touched:
+                return None
+            rows = self._db.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        return [Turn(role, content) for role, content in rows]
+
+    def append(self, session_id: str, turns: list[Turn]):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO sessions (id, last_seen) VALUES (?, ?) ON CONFLICT (id) DO UPDATE SET last_seen = excluded.last_seen",
+                (session_id, time.time()),
+            )
+            (last,) = self._db.execute("SELECT COALESCE(MAX(seq), -1) FROM messages WHERE session_id = ?", (session_id,)).fetchone()
+            self._insert(session_id, last + 1, list(turns))
+            self._db.execute(
+                "DELETE FROM messages WHERE session_id = ? AND seq <= ?", (session_id, last + len(turns) - self.max_messages)
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._purge()
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            deleted = self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount
+            self._count -= deleted
+        return deleted > 0
+
+    def _insert(self, session_id: str, first_seq: int, turns: list[Turn]):
+        self._db.executemany(
+            "INSERT INTO messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+            [(session_id, first_seq + i, t.role, t.content) for i, t in enumerate(turns)],
+        )
+
+    def _purge(self):
+        cutoff = time.time() - self.ttl
+        self._db.execute("DELETE FROM messages WHERE session_id IN (SELECT id FROM sessions WHERE last_seen < ?)", (cutoff,))
+        self._db.execute("DELETE FROM sessions WHERE last_seen < ?", (cutoff,))
+        self._recount()
+
+    def _recount(self):
+        (self._count,) = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()
+
+    def stats(self) -> dict:
+        return {"backend": "sqlite", "sessions": self._count}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def make_session_store(backend: str, path: str, max_bytes: int, ttl: float, max_messages: int):
+    """`memory` or `sqlite` (stored at `path`)."""
+    if backend == "memory":
+        return MemorySessionStore(max_bytes, ttl, max_messages)
+    if backend == "sqlite":
+        return SqliteSessionStore(path, ttl, max_messages)
+    raise RuntimeError(f"Unknown SESSION_BACKEND '{backend}' (expected 'memory' or 'sqlite')")
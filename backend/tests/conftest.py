@@ -0,0 +1,31 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Offline, in-memory configuration; set before `app` reads its environment.
+os.environ.update({
+    "LLM_PROVIDER": "local",
+    "LOCAL_LLM_LATENCY": "0",
+    "LOCAL_LLM_JITTER": "0",
+    "RETRIEVER": "keyword",
+    "INDEX_PATH": "",
+    "KNOWLEDGE_JOURNAL": "",
+    "QUERY_LOG": "",
+    "SESSION_BACKEND": "memory",
+    "ADMISSION_RATE": "0",
+    "ANSWER_DEADLINE": "0",
+})
+
+import pytest
+
+
+@pytest.fixture
+def client():
+    """The app with its lifespan run: local model, knowledge_base.py documents, fresh caches."""
+    from fastapi.testclient import TestClient
+
+    import app as server
+    server.answer_cache.clear()
+    with TestClient(server.app) as client:
+        yield client
@@ -0,0 +1,43 @@
+from admission import AdmissionMiddleware, FairQueue, TokenBuckets
+
+
+def middleware(**kwargs) -> AdmissionMiddleware:
+    queue = FairQueue(1, 8, 8, 1.0, {"interactive": 4.0, "batch": 1.0})
+    return AdmissionMiddleware(None, TokenBuckets(1, 2), queue, ("/chat",), ("/chat/batch",), **kwargs)
+
+
+def scope(path: str = "/chat", ip: str = "10.0.0.1", **headers) -> dict:
+    return {"type": "http", "path": path, "client": (ip, 1234),
+            "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]}
+
+
+def test_unknown_api_keys_fall_back_to_the_address():
+    mw = middleware(api_keys=frozenset({"known"}))
+    assert mw.identify(scope(x_api_key="random-1")) == ("ip:10.0.0.1", "interactive")
+    assert mw.identify(scope(authorization="Bearer random-2")) == ("ip:10.0.0.1", "interactive")
+    assert mw.identify(scope(x_api_key="known")) == ("key:known", "interactive")
+
+
+def test_batch_keys_are_known_and_batch_priority():
+    mw = middleware(batch_keys=frozenset({"nightly"}))
+    assert mw.identify(scope(x_api_key="nightly")) == ("key:nightly", "batch")
+    assert mw.identify(scope(path="/chat/batch")) == ("ip:10.0.0.1", "batch")
+
+
+def test_token_bucket_limits_a_client_not_its_neighbours():
+    buckets = TokenBuckets(1, 2)
+    assert [buckets.take("ip:a") for _ in range(3)][:2] == [None, None]
+    assert buckets.take("ip:a") is not None
+    assert buckets.take("ip:b") is None
+
+
+def test_batch_items_each_take_an_admission_slot(client):
+    import app as server
+
+    before = server.admission.admitted
+    r = client.post("/chat/batch", json={"items": [{"message": q} for q in ("compost?", "solar?", "water?")]},
+                    headers={"Cache-Control": "no-store"})
+
+    assert r.status_code == 200 and r.json()["failed"] == 0
+    assert server.admission.admitted - before == 3
+    assert server.admission.active == 0
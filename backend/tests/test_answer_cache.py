@@ -0,0 +1,36 @@
+import json
+
+import app as server
+from cache import SemanticCache
+from vectors import HashingEmbedder
+
+
+def ask(client, path: str, message: str, **headers):
+    return client.post(path, json={"message": message}, headers=headers)
+
+
+def test_chat_and_stream_share_the_answer_cache(client):
+    first = ask(client, "/chat", "How do I start composting?")
+    again = ask(client, "/chat", "How do I start composting?")
+    assert first.headers["X-Cache"] == "MISS" and again.headers["X-Cache"] == "HIT"
+    assert again.json()["answer"] == first.json()["answer"]
+
+    stream = ask(client, "/chat/stream", "How do I start composting?")
+    done = [line for line in stream.text.splitlines() if line.startswith("data:")][-1]
+    assert json.loads(done[5:]) == {"cached": True}
+
+    bypass = ask(client, "/chat", "How do I start composting?", **{"Cache-Control": "no-cache"})
+    assert bypass.headers["X-Cache"] == "BYPASS"
+
+
+def test_reworded_questions_answered_from_the_semantic_cache(client, monkeypatch):
+    monkeypatch.setattr(server, "semantic_cache", SemanticCache(HashingEmbedder(256), 64, 1 << 20, 60.0, 0.9, 0.5))
+    first = ask(client, "/chat", "How do I start composting at home?")
+    assert first.headers["X-Cache"] == "MISS"
+
+    paraphrase = ask(client, "/chat", "Composting at home: how do I start?")
+    assert paraphrase.headers["X-Cache"] == "SEMANTIC"
+    assert paraphrase.json()["answer"] == first.json()["answer"]
+
+    batch = client.post("/chat/batch", json={"items": [{"message": "At home, how do I start composting?"}]}).json()
+    assert batch["results"][0]["semantic"] and batch["results"][0]["answer"] == first.json()["answer"]
@@ -0,0 +1,39 @@
+import json
+
+import app as server
+
+ITEMS = [
+    {"message": "How do I start composting?"},
+    {"message": "   "},
+    {"message": "Are solar panels worth it?", "category": "energy"},
+    {"message": "How can I save water?", "category": "nope"},
+    {"message": "How do I reduce plastic waste?"},
+]
+
+
+def test_results_keep_item_order_and_report_failures_per_item(client):
+    body = client.post("/chat/batch", json={"items": ITEMS}).json()
+
+    assert body["count"] == len(ITEMS) and body["failed"] == 2
+    assert [r["index"] for r in body["results"]] == list(range(len(ITEMS)))
+    assert body["results"][1]["error"] == {"status": 400, "detail": "Message cannot be empty"}
+    assert body["results"][3]["error"]["status"] == 400 and "nope" in body["results"][3]["error"]["detail"]
+    for i in (0, 2, 4):
+        assert body["results"][i]["answer"] and body["results"][i]["retrieved_docs"]
+    assert {d["category"] for d in body["results"][2]["retrieved_docs"]} == {"energy"}
+
+
+def test_stream_mode_sends_one_ndjson_line_per_item(client):
+    r = client.post("/chat/batch", json={"items": ITEMS, "stream": True})
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == list(range(len(ITEMS)))
+    assert all(line["model"] == server.LLM_MODEL for line in lines)
+    assert sum(1 for line in lines if "error" in line) == 2
+
+
+def test_empty_and_oversized_batches_are_rejected_whole(client, monkeypatch):
+    assert client.post("/chat/batch", json={"items": []}).status_code == 400
+    monkeypatch.setattr(server, "BATCH_MAX_ITEMS", 2)
+    assert client.post("/chat/batch", json={"items": ITEMS}).status_code == 413
@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import app as server
+from llm import CircuitBreaker, ConcurrencyLimiter, ResilientLLM
+
+
+class StallingProvider:
+    """Sends one chunk, then never another."""
+
+    name = "stalling"
+
+    async def generate(self, contents, config):
+        await asyncio.sleep(3600)
+
+    async def stream(self, contents, config):
+        yield "Compost "
+        await asyncio.sleep(3600)
+
+    def retryable(self, error):
+        return False
+
+
+def events(body: str) -> list[tuple[str, dict]]:
+    out = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        out.append((lines["event"], json.loads(lines["data"])))
+    return out
+
+
+def test_timeout_after_first_chunk_sends_error_event(client, monkeypatch):
+    monkeypatch.setattr(server, "LLM_TIMEOUT", 0.5)
+    monkeypatch.setattr(server, "llm", ResilientLLM(StallingProvider(), ConcurrencyLimiter(4, 1.0, 4), 0.5, 0.5,
+                                                    0, 0.0, False, 1.0, CircuitBreaker(5, 15.0)))
+    before = server.UPSTREAM_ERRORS.labels("timeout").value
+
+    r = client.post("/chat/stream", json={"message": "How do I start composting?", "deadline": 0.2})
+
+    kinds = [kind for kind, _ in events(r.text)]
+    assert kinds == ["sources", "delta", "error"]
+    assert events(r.text)[-1][1]["status"] == 504
+    assert server.UPSTREAM_ERRORS.labels("timeout").value == before + 1
+
+
+def test_timeout_before_first_chunk_degrades(client, monkeypatch):
+    class Silent(StallingProvider):
+        async def stream(self, contents, config):
+            await asyncio.sleep(3600)
+            yield ""
+
+    monkeypatch.setattr(server, "llm", ResilientLLM(Silent(), ConcurrencyLimiter(4, 1.0, 4), 5.0, 5.0,
+                                                    0, 0.0, False, 1.0, CircuitBreaker(5, 15.0)))
+
+    r = client.post("/chat/stream", json={"message": "How do I start composting?", "deadline": 0.2})
+
+    kind, done = events(r.text)[-1]
+    assert kind == "done" and done["degraded"] and done["degraded_reason"] == "deadline"
+
+
+def test_client_disconnect_stops_the_upstream_stream(client, monkeypatch):
+    class Endless(StallingProvider):
+        chunks = 0
+        closed = False
+
+        async def stream(self, contents, config):
+            try:
+                while True:
+                    Endless.chunks += 1
+                    yield "more "
+                    await asyncio.sleep(0.01)
+            finally:
+                Endless.closed = True
+
+    monkeypatch.setattr(server, "llm", ResilientLLM(Endless(), ConcurrencyLimiter(4, 1.0, 4), 30.0, 30.0,
+                                                    0, 0.0, False, 1.0, CircuitBreaker(5, 15.0)))
+
+    async def scenario():
+        sent = []
+        body = json.dumps({"message": "How do I start composting?", "deadline": 0}).encode()
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            while sum(1 for m in sent if m.get("body")) < 3:  # sources and a couple of deltas, then hang up
+                await asyncio.sleep(0.01)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+                 "scheme": "http", "path": "/chat/stream", "raw_path": b"/chat/stream", "query_string": b"",
+                 "root_path": "", "headers": [(b"content-type", b"application/json")],
+                 "client": ("10.0.0.1", 1234), "server": ("testserver", 80)}
+        await asyncio.wait_for(server.app(scope, receive, send), 5.0)
+
+    asyncio.run(scenario())
+    assert Endless.closed and Endless.chunks < 50
@@ -0,0 +1,41 @@
+from chunking import make_snippet, split_passages
+from docstore import DocumentColumns
+
+CONTENT = "\n".join(f"Line {i} talks about home composting and garden soil." for i in range(20))
+
+
+def record(content: str):
+    docs = DocumentColumns()
+    return docs[docs.append({"id": "d", "title": "T", "content": content, "category": "c"})]
+
+
+def test_passages_cover_the_document_with_bounded_overlap():
+    passages = split_passages({"id": "d", "content": CONTENT}, 0, 200, 60)
+
+    assert [p.id for p in passages] == [f"d#{i}" for i in range(len(passages))]
+    assert passages[0].start == 0 and passages[-1].end == len(CONTENT)
+    for prev, cur in zip(passages, passages[1:]):
+        assert prev.start < cur.start <= prev.end        # always advances, never leaves a gap
+        assert prev.end - cur.start <= 60                # overlap stays within the window
+    assert all(p.end - p.start <= 200 for p in passages)
+
+
+def test_short_document_is_one_passage():
+    assert split_passages({"id": "d", "content": "Just one line."}, 3, 200, 60) == [("d#0", 3, 0, 14)]
+
+
+def test_snippet_centres_on_the_match_and_highlights_it():
+    doc      = record(CONTENT)
+    passage  = split_passages(doc, 0, 400, 60)[1]
+    snippet, highlights = make_snippet(doc, passage, "compost", width=80)
+
+    assert snippet.startswith("...") and snippet.endswith("...")
+    assert highlights
+    for start, end in highlights:
+        assert snippet[start:end].lower() == "composting"
+
+
+def test_snippet_without_a_match_starts_the_passage():
+    doc     = record("Solar panels on the roof.\nNothing else here.")
+    passage = split_passages(doc, 0, 400, 60)[0]
+    assert make_snippet(doc, passage, "wind turbines") == ("Solar panels on the roof.\nNothing else here.", [])
@@ -0,0 +1,41 @@
+import pytest
+
+from docstore import SNIPPET_CHARS, DocumentColumns
+
+ASCII_DOC  = {"id": "a", "title": "Plain", "content": "Compost your food scraps at home.", "category": "waste"}
+UNICODE    = "Café grounds – and tea leaves – go in the compost bin 🌱. Then wait."
+LONG       = " ".join(["word"] * 100)
+
+
+@pytest.fixture
+def columns():
+    columns = DocumentColumns()
+    for doc in (ASCII_DOC, {**ASCII_DOC, "id": "é", "content": UNICODE}, {**ASCII_DOC, "id": "long", "content": LONG}):
+        columns.append(doc)
+    return columns
+
+
+def test_records_read_back_as_the_dicts_they_came_from(columns):
+    assert dict(columns[0]) == ASCII_DOC
+    assert columns[1]["id"] == "é" and columns[1]["content"] == UNICODE
+
+
+@pytest.mark.parametrize("start, end", [(0, 4), (3, 14), (50, 53), (55, 200)])
+def test_text_slices_by_character_not_byte(columns, start, end):
+    assert columns[1].text(start, end) == UNICODE[start:end]
+    assert columns[0].text(start, end) == ASCII_DOC["content"][start:end]
+
+
+def test_only_a_cut_snippet_gets_an_ellipsis(columns):
+    assert columns[0].snippet == ASCII_DOC["content"]
+    assert columns[1].snippet == UNICODE
+
+    snippet = columns[2].snippet
+    assert snippet.endswith("...") and len(snippet) <= SNIPPET_CHARS + 3
+    assert snippet[:-3].split(" ") == ["word"] * len(snippet[:-3].split(" "))  # cut at a word boundary
+
+
+def test_trailing_whitespace_does_not_count_as_truncation():
+    columns = DocumentColumns()
+    columns.append({**ASCII_DOC, "content": "x" * SNIPPET_CHARS + "\n\n  "})
+    assert columns[0].snippet == "x" * SNIPPET_CHARS
@@ -0,0 +1,35 @@
+from knowledge_base import SUSTAINABILITY_DOCS
+
+
+def test_pages_cover_every_document_once(client):
+    seen, offset = [], 0
+    while True:
+        page = client.get("/documents", params={"offset": offset, "limit": 5}).json()
+        if not page["documents"]:
+            break
+        seen += [d["id"] for d in page["documents"]]
+        offset += 5
+    assert page["count"] == len(SUSTAINABILITY_DOCS)
+    assert sorted(seen) == sorted(d["id"] for d in SUSTAINABILITY_DOCS)
+
+
+def test_category_filter_counts_and_pages_that_category(client):
+    body = client.get("/documents", params={"category": "waste", "limit": 2}).json()
+    assert body["count"] == body["categories"]["waste"] == 3
+    assert [d["category"] for d in body["documents"]] == ["waste", "waste"]
+
+
+def test_etag_revalidates_until_the_knowledge_base_changes(client):
+    etag = client.get("/documents").headers["etag"]
+    r = client.get("/documents", headers={"If-None-Match": etag})
+    assert r.status_code == 304 and r.headers["etag"] == etag
+
+    client.post("/documents/add", json={"title": "New", "content": "Fresh advice.", "category": "energy"})
+    r = client.get("/documents", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["etag"] != etag
+
+
+def test_bad_category_is_rejected_even_with_a_current_etag(client):
+    etag = client.get("/documents").headers["etag"]
+    r = client.get("/documents", params={"category": "nope"}, headers={"If-None-Match": etag})
+    assert r.status_code == 400
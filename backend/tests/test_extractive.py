@@ -0,0 +1,26 @@
+from extractive import _stems, extract_points, extractive_answer
+from knowledge import KnowledgeStore
+from knowledge_base import SUSTAINABILITY_DOCS
+
+
+def retrieve(question: str):
+    store = KnowledgeStore("keyword", None, 600, 100, 0.5)
+    store.upsert(SUSTAINABILITY_DOCS)
+    return store.snapshot.retrieve([question], 3, 12)[0]
+
+
+def test_units_match_on_the_retrieval_stems():
+    assert _stems("Saving water") == _stems("saves water") == _stems("save the water")
+
+
+def test_points_answer_the_question_from_the_best_document():
+    points = extract_points("How do I save water?", retrieve("How do I save water?"))
+    assert points and {doc["id"] for doc, _ in points} == {"water-001"}
+    assert all("sav" in text.lower() for _, text in points)
+
+
+def test_answer_lists_points_with_their_document_titles():
+    hits   = retrieve("How do I save water?")
+    answer = extractive_answer("How do I save water?", hits, max_points=2)
+    assert answer.count("\n• ") == 2 and f"({hits[0].doc['title']})" in answer
+    assert extractive_answer("How do I save water?", []) == ""
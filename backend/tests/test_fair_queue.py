@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from admission import FairQueue, Rejected
+
+WEIGHTS = {"interactive": 1.0, "batch": 0.5}
+
+
+async def run_in_order(queue: FairQueue, requests: list[tuple[str, str]]) -> list[str]:
+    """Hold the only slot, queue `requests` (client, priority) in order, then release it and
+    return the names in the order they were admitted."""
+    order = []
+
+    async def request(name: str, client: str, priority: str):
+        async with queue.slot(client, priority):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async with queue.slot("holder", "interactive"):
+        tasks = [asyncio.ensure_future(request(f"{client}{i}", client, priority))
+                 for i, (client, priority) in enumerate(requests)]
+        await asyncio.sleep(0)
+        assert queue.waiting == len(requests)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_clients_alternate_however_many_requests_one_queues():
+    queue = FairQueue(1, 16, 16, 5.0, WEIGHTS)
+    order = asyncio.run(run_in_order(queue, [("a", "interactive")] * 3 + [("b", "interactive")] * 2))
+    assert order == ["a0", "b3", "a1", "b4", "a2"]
+    assert (queue.active, queue.waiting) == (0, 0)
+
+
+def test_batch_class_gets_half_the_share_of_interactive():
+    queue = FairQueue(1, 16, 16, 5.0, WEIGHTS)
+    order = asyncio.run(run_in_order(queue, [("bulk", "batch")] * 3 + [("ui", "interactive")] * 4))
+    assert order == ["ui3", "bulk0", "ui4", "ui5", "bulk1", "ui6", "bulk2"]
+
+
+def test_waiter_times_out_and_the_slot_is_freed():
+    async def scenario(queue: FairQueue):
+        async with queue.slot("a", "interactive"):
+            with pytest.raises(Rejected) as rejected:
+                async with queue.slot("b", "interactive"):
+                    pass
+            assert rejected.value.kind == "queue_timeout"
+            assert queue.waiting == 0
+        assert queue.active == 0
+        async with queue.slot("b", "interactive"):  # admitted straight away again
+            assert queue.active == 1
+
+    queue = FairQueue(1, 16, 16, 0.05, WEIGHTS)
+    asyncio.run(scenario(queue))
+    assert queue.admitted == 2
+
+
+def test_full_queues_reject_instead_of_waiting():
+    async def scenario(queue: FairQueue):
+        async def wait(client: str):
+            async with queue.slot(client, "interactive"):
+                pass
+
+        async with queue.slot("a", "interactive"):
+            waiters = [asyncio.ensure_future(wait("a")), asyncio.ensure_future(wait("b"))]
+            await asyncio.sleep(0)
+            with pytest.raises(Rejected) as per_client:
+                await wait("a")
+            assert per_client.value.kind == "client_queue_full"
+            waiters.append(asyncio.ensure_future(wait("c")))
+            await asyncio.sleep(0)
+            with pytest.raises(Rejected) as full:
+                await wait("d")
+            assert full.value.kind == "queue_full"
+        await asyncio.gather(*waiters)
+
+    asyncio.run(scenario(FairQueue(1, 3, 1, 5.0, WEIGHTS)))
@@ -0,0 +1,72 @@
+import numpy as np
+
+from index_file import load_index, save_index
+from knowledge import KnowledgeStore
+from knowledge_base import SUSTAINABILITY_DOCS
+
+QUERIES = ["how to compost food waste", "solar panels at home", "ümlaut panels"]
+
+
+def store() -> KnowledgeStore:
+    return KnowledgeStore("keyword", None, 600, 100, 0.5)
+
+
+def ranked(snapshot) -> list:
+    return [[(h.doc["id"], round(h.score, 6), [p.id for p, _ in h.passages]) for h in hits]
+            for hits in snapshot.retrieve(QUERIES, 3, 12)]
+
+
+def test_round_trip_serves_columns_from_memory_maps(tmp_path):
+    built = store()
+    built.upsert(SUSTAINABILITY_DOCS)
+    built.upsert([{"id": "x", "title": "Ünïcode ☀", "content": "Solar ☀ panels ümlaut " * 60, "category": "energy"}])
+    built.delete(SUSTAINABILITY_DOCS[1]["id"])
+    save_index(built, str(tmp_path / "index"))
+
+    loaded = store()
+    load_index(str(tmp_path / "index"), loaded)
+    snapshot = loaded.snapshot
+
+    assert [dict(d) for d in snapshot.iter_docs()] == [dict(d) for d in built.snapshot.iter_docs()]
+    assert ranked(snapshot) == ranked(built.snapshot)
+    assert snapshot.categories == built.snapshot.categories
+    for array in loaded.export()[0].values():
+        assert isinstance(array.base if array.base is not None else array, np.memmap)
+
+
+def test_writes_after_load_copy_instead_of_touching_the_artifact(tmp_path):
+    built = store()
+    built.upsert(SUSTAINABILITY_DOCS)
+    save_index(built, str(tmp_path / "index"))
+    loaded = store()
+    load_index(str(tmp_path / "index"), loaded)
+    before = loaded.snapshot
+
+    loaded.upsert([{"id": "new", "title": "Heat pumps", "content": "Heat pumps ümlaut", "category": "heating"}])
+    loaded.update(dict(SUSTAINABILITY_DOCS[0], title="Changed"))
+    loaded.delete(SUSTAINABILITY_DOCS[2]["id"])
+
+    after = loaded.snapshot
+    assert after.doc_count == before.doc_count
+    assert after.categories["heating"] == 1 and "heating" not in before.categories
+    assert after.retrieve(["ümlaut"], 1, 12)[0][0].doc["id"] == "new"
+    assert [d["title"] for d in before.iter_docs()] == [d["title"] for d in SUSTAINABILITY_DOCS]
+
+    reloaded = store()
+    load_index(str(tmp_path / "index"), reloaded)
+    assert [d["id"] for d in reloaded.snapshot.iter_docs()] == [d["id"] for d in SUSTAINABILITY_DOCS]
+
+
+def test_category_names_round_trip_verbatim(tmp_path):
+    built = store()
+    built.upsert([{"id": "a", "title": "A", "content": "Odd category", "category": "x\ny"},
+                  {"id": "b", "title": "B", "content": "Plain category", "category": "energy"}])
+    save_index(built, str(tmp_path / "index"))
+    loaded = store()
+    load_index(str(tmp_path / "index"), loaded)
+    assert {d["id"]: d["category"] for d in loaded.snapshot.iter_docs()} == {"a": "x\ny", "b": "energy"}
+
+
+def test_api_rejects_control_characters_in_categories(client):
+    r = client.post("/documents/add", json={"title": "T", "content": "C", "category": "x\ny"})
+    assert r.status_code == 400
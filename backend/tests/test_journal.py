@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from journal import JournalFollower, KnowledgeJournal
+from knowledge import KnowledgeStore
+
+DOC = {"id": "solar-roof", "title": "Rooftop solar", "content": "Panels on the roof cut the power bill.", "category": "energy"}
+
+
+class Worker:
+    """One process's view: its own journal connection, store and follower."""
+
+    def __init__(self, path: str):
+        self.store   = KnowledgeStore("keyword", None, 600, 100, 0.5)
+        self.synced  = []
+        self.journal = KnowledgeJournal(path)
+        self.sync    = JournalFollower(self.journal, self.store, 0, lambda n, ids: self.synced.append((n, ids)), 60.0)
+
+    def ids(self) -> list[str]:
+        return sorted(d["id"] for d in self.store.snapshot.iter_docs())
+
+
+def test_workers_converge_on_each_others_writes(tmp_path):
+    path = str(tmp_path / "journal.db")
+
+    async def scenario():
+        a, b = Worker(path), Worker(path)
+        assert a.journal.id == b.journal.id
+        assert await a.sync.submit("upsert", [DOC]) == (1, 0)
+        assert await b.sync.submit("update", {**DOC, "title": "Solar on the roof"})
+        await a.sync.catch_up()
+        await b.sync.catch_up()
+        return a, b
+
+    a, b = asyncio.run(scenario())
+    assert a.ids() == b.ids() == ["solar-roof"]
+    assert [d["title"] for d in a.store.snapshot.iter_docs()] == ["Solar on the roof"]
+    assert a.sync.applied == b.sync.applied == 2
+    assert a.synced == [(1, {"solar-roof"})] and b.synced == [(1, {"solar-roof"})]  # only the other worker's entry
+
+
+def test_a_late_worker_replays_from_its_starting_revision(tmp_path):
+    path = str(tmp_path / "journal.db")
+
+    async def scenario():
+        first = Worker(path)
+        await first.sync.submit("upsert", [DOC, {**DOC, "id": "wind"}])
+        await first.sync.submit("delete", "wind")
+        late = Worker(path)
+        await late.sync.catch_up()
+        return late
+
+    late = asyncio.run(scenario())
+    assert late.ids() == ["solar-roof"] and late.sync.stats()["synced"] == 2
+
+
+def test_a_failing_entry_is_skipped_everywhere_and_reported_to_its_writer(tmp_path):
+    path = str(tmp_path / "journal.db")
+
+    async def scenario():
+        a, b = Worker(path), Worker(path)
+        with pytest.raises(KeyError):
+            await a.sync.submit("update", {"title": "no id"})
+        await a.sync.submit("upsert", [DOC])
+        await b.sync.catch_up()
+        return a, b
+
+    a, b = asyncio.run(scenario())
+    assert a.ids() == b.ids() == ["solar-roof"]
+    assert a.sync.errors == b.sync.errors == 1
+    assert b.synced == [(2, {"solar-roof"})]
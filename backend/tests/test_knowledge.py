@@ -0,0 +1,64 @@
+import knowledge
+from knowledge import KnowledgeStore
+from knowledge_base import SUSTAINABILITY_DOCS
+
+QUERIES = ["how to compost food waste", "solar panels at home", "water saving"]
+
+
+def store() -> KnowledgeStore:
+    store = KnowledgeStore("keyword", None, 600, 100, 0.5)
+    store.upsert(SUSTAINABILITY_DOCS)
+    return store
+
+
+def ranked(snapshot) -> list:
+    return [[(h.doc["id"], h.doc["title"], round(h.score, 6)) for h in hits] for hits in snapshot.retrieve(QUERIES, 3, 12)]
+
+
+def view(snapshot) -> tuple:
+    return snapshot.doc_count, snapshot.categories, [dict(d) for d in snapshot.iter_docs()], ranked(snapshot)
+
+
+def test_snapshot_ignores_later_upserts_updates_and_deletes():
+    live   = store()
+    before = live.snapshot
+    seen   = view(before)
+
+    live.upsert([{"id": "new-001", "title": "Composting at school", "content": "Compost food waste at school.",
+                  "category": "food"}])
+    live.update({**SUSTAINABILITY_DOCS[0], "title": "Renamed", "content": "Nothing to see here."})
+    live.delete(SUSTAINABILITY_DOCS[1]["id"])
+
+    assert view(before) == seen
+    after = live.snapshot
+    assert after.version == before.version + 3
+    assert after.doc_count == before.doc_count
+    assert SUSTAINABILITY_DOCS[1]["id"] not in [d["id"] for d in after.iter_docs()]
+    assert "new-001" in [h.doc["id"] for h in after.retrieve(["compost at school"], 3, 12)[0]]
+
+
+def test_snapshot_survives_compaction_and_merge(monkeypatch):
+    monkeypatch.setattr(knowledge, "MERGE_MIN_DOCS", 1)
+    live   = store()
+    before = live.snapshot
+    seen   = view(before)
+    old_index = live._keyword
+
+    for doc in SUSTAINABILITY_DOCS[:len(SUSTAINABILITY_DOCS) // 2]:  # past COMPACT_RATIO: rebuilds
+        live.delete(doc["id"])
+    live.upsert([{**doc, "id": doc["id"] + "-v2"} for doc in SUSTAINABILITY_DOCS[:4]])
+
+    assert live._keyword is not old_index and len(live._docs) < len(SUSTAINABILITY_DOCS) + 4  # tombstones dropped
+    assert view(before) == seen
+    assert live.snapshot.doc_count == len(SUSTAINABILITY_DOCS) - len(SUSTAINABILITY_DOCS) // 2 + 4
+
+
+def test_category_filter_is_bounded_by_the_snapshot():
+    live   = store()
+    before = live.snapshot
+    energy = [h.doc["id"] for h in before.retrieve(["solar panels"], 10, 40, category="energy")[0]]
+
+    live.upsert([{"id": "energy-new", "title": "Solar panels", "content": "Solar panels solar panels.",
+                  "category": "energy"}])
+    assert [h.doc["id"] for h in before.retrieve(["solar panels"], 10, 40, category="energy")[0]] == energy
+    assert live.snapshot.retrieve(["solar panels"], 1, 40, category="energy")[0][0].doc["id"] == "energy-new"
@@ -0,0 +1,155 @@
+import asyncio
+
+import httpx
+import pytest
+from google.genai import errors
+
+import llm
+from llm import CircuitBreaker, CircuitOpen, ConcurrencyLimiter, GeminiProvider, Overloaded, ResilientLLM
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(3, 10.0, clock)
+    breaker.failure()
+    breaker.failure()
+    breaker.success()  # a success resets the streak
+    breaker.failure()
+    breaker.failure()
+    assert breaker.state == "closed"
+    breaker.check()
+
+    breaker.failure()
+    assert (breaker.state, breaker.opened) == ("open", 1)
+    clock.now += 4.0
+    with pytest.raises(CircuitOpen) as rejected:
+        breaker.check()
+    assert rejected.value.retry_after == pytest.approx(6.0)
+
+
+def test_breaker_lets_one_probe_through_then_closes_on_success(clock):
+    breaker = CircuitBreaker(1, 10.0, clock)
+    breaker.failure()
+    clock.now += 10.0
+    breaker.check()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpen):
+        breaker.check()  # everyone but the probe still fails fast
+
+    breaker.success()
+    assert breaker.state == "closed"
+    breaker.check()
+
+
+def test_breaker_reopens_when_the_probe_fails(clock):
+    breaker = CircuitBreaker(5, 10.0, clock)
+    for _ in range(5):
+        breaker.failure()
+    clock.now += 10.0
+    breaker.check()
+    breaker.failure()  # one failure is enough while half-open
+    assert (breaker.state, breaker.opened) == ("open", 2)
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+
+
+def test_breaker_with_zero_threshold_never_opens():
+    breaker = CircuitBreaker(0, 10.0)
+    for _ in range(100):
+        breaker.failure()
+    assert breaker.state == "closed"
+    breaker.check()
+
+
+class ScriptedProvider:
+    """Call i sleeps delays[i] seconds and answers f"call {i}"; records cancelled calls."""
+
+    name = "scripted"
+
+    def __init__(self, *delays: float):
+        self.delays    = delays
+        self.calls     = 0
+        self.cancelled = []
+
+    async def generate(self, contents: list, config) -> str:
+        i = self.calls
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delays[i])
+        except asyncio.CancelledError:
+            self.cancelled.append(i)
+            raise
+        return f"call {i}"
+
+    def retryable(self, error: Exception) -> bool:
+        return False
+
+
+def hedging(provider: ScriptedProvider) -> ResilientLLM:
+    model = ResilientLLM(provider, ConcurrencyLimiter(4, 1.0, 4), 5.0, 5.0, 0, 0.0, True, 0.05, CircuitBreaker(5, 15.0))
+    for _ in range(llm.HEDGE_MIN_SAMPLES):
+        model.latency.record(0.01)  # p95 below the floor: hedge after hedge_min_delay
+    return model
+
+
+def test_hedge_wins_when_the_primary_stalls():
+    provider = ScriptedProvider(5.0, 0.01)
+    model    = hedging(provider)
+    assert asyncio.run(model.generate([], None)) == "call 1"
+    assert (model.hedged, model.hedge_wins) == (1, 1)
+    assert provider.cancelled == [0]
+
+
+def test_primary_wins_when_it_finishes_before_the_hedge():
+    provider = ScriptedProvider(0.1, 5.0)
+    model    = hedging(provider)
+    assert asyncio.run(model.generate([], None)) == "call 0"
+    assert (model.hedged, model.hedge_wins) == (1, 0)
+    assert provider.cancelled == [1]
+
+
+def test_no_hedge_before_the_delay_or_without_latency_samples():
+    model = hedging(ScriptedProvider(0.0))
+    assert asyncio.run(model.generate([], None)) == "call 0"
+    assert model.hedged == 0
+
+    cold = ResilientLLM(ScriptedProvider(0.0), ConcurrencyLimiter(4, 1.0, 4), 5.0, 5.0, 0, 0.0, True, 0.05,
+                        CircuitBreaker(5, 15.0))
+    assert cold.hedge_delay() is None
+
+
+def test_queue_wait_counts_against_the_deadline():
+    async def scenario():
+        limiter = ConcurrencyLimiter(1, 10.0, 4)
+        model   = ResilientLLM(ScriptedProvider(0.0), limiter, 0.2, 0.2, 0, 0.0, False, 0.05, CircuitBreaker(5, 15.0))
+        async with limiter.slot():  # someone else holds the only slot
+            started = asyncio.get_running_loop().time()
+            with pytest.raises(Overloaded):
+                await model.generate([], None)
+            return asyncio.get_running_loop().time() - started
+
+    assert asyncio.run(scenario()) < 1.0  # gave up at the 0.2s deadline, not the 10s queue timeout
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (httpx.ConnectError("refused"), True),
+    (httpx.ReadTimeout("slow"), True),
+    (ConnectionResetError(), True),
+    (errors.APIError(503, {}), True),
+    (errors.APIError(400, {}), False),
+    (ValueError("bad"), False),
+])
+def test_gemini_retries_network_faults_and_transient_statuses(error, retryable):
+    assert GeminiProvider(None, "m").retryable(error) is retryable
@@ -0,0 +1,29 @@
+from prompt import HistorySummarizer, estimate_tokens
+from sessions import Turn
+
+
+def conversation(n: int) -> list:
+    return [Turn("user" if i % 2 == 0 else "assistant", f"Turn {i} talks about composting and solar panels.")
+            for i in range(n)]
+
+
+def test_summary_cache_hits_whatever_budget_the_verbatim_turns_leave():
+    summarizer = HistorySummarizer()
+    turns = conversation(6)
+    full  = summarizer.summarize(turns, 1000)
+    short = summarizer.summarize(turns, 30)
+
+    assert summarizer.stats() == {"entries": 1, "hits": 1, "extends": 0, "misses": 1}
+    assert full.endswith(short) and estimate_tokens(short) <= 30
+    assert short.splitlines()[-1] == HistorySummarizer.line(turns[-1])
+
+
+def test_each_exchange_extends_the_previous_summary():
+    summarizer = HistorySummarizer()
+    turns = conversation(8)
+    summarizer.summarize(turns[:4], 50)
+    summarizer.summarize(turns[:6], 60)
+    summary = summarizer.summarize(turns, 1000)
+
+    assert summarizer.stats() == {"entries": 3, "hits": 0, "extends": 2, "misses": 1}
+    assert summary.splitlines() == [HistorySummarizer.line(t) for t in turns]
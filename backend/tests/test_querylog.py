@@ -0,0 +1,62 @@
+import asyncio
+import glob
+import json
+
+from querylog import QueryLog, QueryLogMiddleware, annotate
+from replay import load_log
+
+
+def entry(i: int) -> dict:
+    return {"ts": 1000.0 + i, "path": "/chat", "status": 200, "question": f"question number {i:03d}"}
+
+
+def test_rotation_keeps_the_newest_backups_and_replay_reads_them_in_order(tmp_path):
+    path = str(tmp_path / "queries.jsonl")
+    log  = QueryLog(path, max_bytes=300, backups=2, batch_size=2, flush_interval=0.01)
+    log.start()
+    for i in range(20):
+        log.record(entry(i))
+    log.close()
+
+    files = sorted(glob.glob(path + "*"))
+    assert files == [path, path + ".1", path + ".2"]
+    assert log.rotations > 2 and log.written == 20 and log.dropped == 0
+    for f in files:
+        with open(f, "rb") as fh:
+            assert len(fh.read()) <= 300
+
+    requests = load_log(files)
+    kept     = [r["message"] for r in requests]
+    assert kept == sorted(kept) and kept[-1] == "question number 019"
+    assert len(kept) < 20  # the oldest rotations were deleted
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    log = QueryLog(str(tmp_path / "q.jsonl"), 1 << 20, 1, max_pending=3)
+    for i in range(5):
+        log.record(entry(i))
+    assert log.stats()["pending"] == 3 and log.dropped == 2
+
+
+def test_middleware_records_annotations_and_status(tmp_path):
+    log = QueryLog(str(tmp_path / "q.jsonl"), 1 << 20, 1)
+
+    async def handler(scope, receive, send):
+        annotate(question="How do I compost?", category="waste")
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def ignore(message):
+        pass
+
+    app = QueryLogMiddleware(handler, log, ("/chat",))
+    asyncio.run(app({"type": "http", "path": "/chat"}, None, ignore))
+    asyncio.run(app({"type": "http", "path": "/health"}, None, ignore))
+
+    (recorded,) = list(log._queue)  # /health is not logged
+    assert recorded["status"] == 201 and recorded["question"] == "How do I compost?"
+
+    path = tmp_path / "replay.jsonl"
+    path.write_text(json.dumps(recorded) + "\n")
+    assert load_log([str(path)]) == [{"ts": recorded["ts"], "category": "waste", "session": None,
+                                      "message": "How do I compost?"}]
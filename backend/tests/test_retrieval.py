@@ -0,0 +1,70 @@
+import pytest
+
+from knowledge import KnowledgeStore
+from knowledge_base import SUSTAINABILITY_DOCS
+from retrieval import stem
+
+
+@pytest.mark.parametrize("words", [
+    ("compost", "composts", "composting", "composted"),
+    ("recycle", "recycles", "recycling", "recycled"),
+    ("battery", "batteries"),
+    ("shop", "shopping"),
+    ("save", "saves", "saving", "saved", "savings"),
+    ("make", "making"), ("give", "giving"), ("live", "living"), ("take", "taking"), ("bike", "biking"),
+    ("use", "uses", "used", "using"),
+    ("bus", "buses"), ("box", "boxes"), ("glass", "glasses"),
+])
+def test_inflections_share_a_stem(words):
+    assert len({stem(w) for w in words}) == 1
+
+
+@pytest.mark.parametrize("word", ["bus", "gas", "news", "need", "analysis", "2030s", "string"])
+def test_short_and_irregular_words_are_left_alone(word):
+    assert stem(word) == word
+
+
+def test_news_is_not_new():
+    assert stem("news") != stem("new")
+
+
+@pytest.mark.parametrize("query, best", [
+    ("How can I compost at home?", "composting-001"),
+    ("ways of saving water", "water-001"),
+])
+def test_query_inflection_matches_document_inflection(query, best):
+    store = KnowledgeStore("keyword", None, 600, 100, 0.5)
+    store.upsert(SUSTAINABILITY_DOCS)
+    assert store.snapshot.retrieve([query], 3, 12)[0][0].doc["id"] == best
+
+
+@pytest.fixture(scope="module")
+def snapshot():
+    store = KnowledgeStore("keyword", None, 600, 100, 0.5)
+    store.upsert(SUSTAINABILITY_DOCS)
+    return store.snapshot
+
+
+def test_misspelled_terms_expand_to_their_nearest_vocabulary_terms(snapshot):
+    index = snapshot.keyword.index
+    assert index.expand("compostng") == {"compost": pytest.approx(0.8)}
+    assert index.expand("solar panal").keys() >= {"solar", "panel"}
+
+
+def test_prefix_completes_only_the_last_word(snapshot):
+    index = snapshot.keyword.index
+    assert index.expand("insul") == {}
+    assert "insulation" in index.expand("insul", prefix=True)
+    assert "insulation" not in index.expand("insul home", prefix=True)
+    assert snapshot.retrieve(["insul"], 3, 12, prefix=True)[0]
+
+
+def test_retrieve_scores_the_expansion_it_is_given(snapshot):
+    hits = snapshot.retrieve(["zzz"], 3, 12, terms=[{"compost": 1.0}])[0]
+    assert hits[0].doc["id"] == "composting-001"
+
+
+def test_retrieve_endpoint_reports_the_terms_it_searched(client):
+    body = client.get("/retrieve", params={"q": "home insul"}).json()
+    assert body["terms"]["insulation"] == pytest.approx(0.8)
+    assert body["results"] and body["results"][0]["category"] in {"energy", "buildings"}
@@ -0,0 +1,65 @@
+import pytest
+
+from sessions import MemorySessionStore, SqliteSessionStore, Turn, turn_size
+
+TURNS = [Turn("user", "How do I compost?"), Turn("assistant", "Start with a bin.")]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        store = MemorySessionStore(1 << 20, 3600.0, 4)
+    else:
+        store = SqliteSessionStore(str(tmp_path / "sessions.db"), 3600.0, 4)
+    yield store
+    store.close()
+
+
+def test_history_round_trips_and_keeps_the_newest_messages(store):
+    session_id = store.create(TURNS)
+    assert store.get(session_id) == TURNS
+
+    more = [Turn("user", f"question {i}") for i in range(3)]
+    store.append(session_id, more)
+    assert store.get(session_id) == TURNS[1:] + more  # capped at max_messages
+    assert store.get("unknown") is None
+
+
+def test_stats_count_follows_create_and_delete(store):
+    ids = [store.create(TURNS) for _ in range(3)]
+    assert store.stats()["sessions"] == 3
+    assert store.delete(ids[0]) and not store.delete(ids[0])
+    assert store.stats()["sessions"] == 2
+
+
+def test_memory_store_evicts_least_recently_used_when_over_budget():
+    store = MemorySessionStore(3 * sum(turn_size(t) for t in TURNS), 3600.0, 10)
+    first, second, third = (store.create(TURNS) for _ in range(3))
+    store.get(first)                  # now the most recently used
+    store.create(TURNS)
+
+    assert store.get(second) is None
+    assert store.get(first) == TURNS and store.get(third) == TURNS
+    assert store.stats()["evictions"] == 1
+
+
+def test_idle_sessions_expire(tmp_path):
+    memory = MemorySessionStore(1 << 20, -1.0, 10)  # a negative TTL makes every session already idle
+    assert memory.get(memory.create(TURNS)) is None
+    assert memory.stats()["expirations"] == 1
+
+    sqlite = SqliteSessionStore(str(tmp_path / "sessions.db"), -1.0, 10)
+    assert sqlite.get(sqlite.create(TURNS)) is None
+    sqlite.close()
+
+
+def test_sqlite_sessions_survive_a_restart_and_are_recounted(tmp_path):
+    path  = str(tmp_path / "sessions.db")
+    other = SqliteSessionStore(path, 3600.0, 10)  # e.g. another worker on the same host
+    session_id = other.create(TURNS)
+    other.close()
+
+    store = SqliteSessionStore(path, 3600.0, 10)
+    assert store.stats()["sessions"] == 1
+    assert store.get(session_id) == TURNS
+    store.close()
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from cache import SingleFlight
+
+
+class Upstream:
+    """Counts calls; each one waits for `release` and then returns or raises `outcome`."""
+
+    def __init__(self, outcome="answer"):
+        self.outcome = outcome
+        self.calls   = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+def test_identical_calls_share_one_generation():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream()
+        waiters = [asyncio.ensure_future(flight.do("k", upstream)) for _ in range(5)]
+        other   = asyncio.ensure_future(flight.do("other", Upstream("different")))
+        await asyncio.sleep(0)
+        upstream.release.set()
+        assert await asyncio.gather(*waiters) == ["answer"] * 5
+        other.cancel()
+        return flight, upstream
+
+    flight, upstream = asyncio.run(scenario())
+    assert upstream.calls == 1
+    assert flight.stats() == {"in_flight": 0, "leaders": 2, "coalesced": 4}
+
+
+def test_an_error_reaches_every_waiter_and_is_not_cached():
+    async def scenario():
+        flight, failing = SingleFlight(), Upstream(RuntimeError("upstream down"))
+        waiters = [asyncio.ensure_future(flight.do("k", failing)) for _ in range(3)]
+        await asyncio.sleep(0)
+        failing.release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+
+        retry = Upstream("recovered")
+        retry.release.set()
+        return results, await flight.do("k", retry)
+
+    results, after = asyncio.run(scenario())
+    assert [str(r) for r in results] == ["upstream down"] * 3
+    assert after == "recovered"
+
+
+def test_a_cancelled_leader_does_not_cancel_its_followers():
+    async def scenario():
+        flight, upstream = SingleFlight(), Upstream()
+        leader   = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0)
+        leader.cancel()  # e.g. the first client disconnected
+        await asyncio.sleep(0)
+        upstream.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower, upstream.calls
+
+    assert asyncio.run(scenario()) == ("answer", 1)
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from knowledge import KnowledgeStore
+from knowledge_base import SUSTAINABILITY_DOCS
+from retrieval import fuse
+from vectors import HashingEmbedder, VectorIndex
+
+
+def test_fuse_scales_bm25_to_the_best_hit_and_adds_cosine():
+    keyword = [(1, 8.0), (2, 4.0)]
+    dense   = [(2, 0.9), (3, 0.5)]
+    fused   = dict(fuse(keyword, dense, 0.5, 10))
+    assert fused == pytest.approx({1: 0.5, 2: 0.25 + 0.45, 3: 0.25})
+    assert [o for o, _ in fuse(keyword, dense, 0.5, 2)] == [2, 1]
+    assert dict(fuse(keyword, [], 0.0, 10)) == pytest.approx({1: 1.0, 2: 0.5})
+
+
+def test_vector_index_ranks_by_cosine_and_skips_deleted_rows():
+    index = VectorIndex.build(np.eye(3, dtype=np.float32))
+    query = np.array([0.6, 0.8, 0.0], dtype=np.float32)
+    assert [o for o, _ in index.search(query, 3)] == [1, 0]
+    index.delete(1)
+    assert [o for o, _ in index.search(query, 3)] == [0]
+
+
+@pytest.mark.parametrize("retriever", ["vector", "hybrid"])
+def test_dense_and_hybrid_retrievers_find_the_topic(retriever):
+    store = KnowledgeStore(retriever, HashingEmbedder(256), 600, 100, 0.5)
+    store.upsert(SUSTAINABILITY_DOCS)
+    hits = store.snapshot.retrieve(["composting food scraps at home"], 3, 12)[0]
+    assert "composting-001" in [h.doc["id"] for h in hits]
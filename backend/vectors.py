@@ -0,0 +1,182 @@
+"""
+EcoSage dense retrieval — pluggable local embedders and a contiguous float32 vector index.
+"""
+
+import math
+import zlib
+from typing import Optional, Protocol
+
+import numpy as np
+
+from retrieval import tokenize
+
+
+class Embedder(Protocol):
+    dim: int
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Return a (len(texts), dim) float32 matrix of L2-normalised rows."""
+        ...
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class HashingEmbedder:
+    """Deterministic offline embedder: signed feature hashing of words and character trigrams.
+
+    Trigrams give partial credit to related word forms ("compost" / "composting"), and
+    crc32 keeps vectors identical across processes and restarts.
+    """
+
+    def __init__(self, dim: int = 256, trigram_weight: float = 0.5):
+        self.dim = dim
+        self.trigram_weight = trigram_weight
+
+    def _features(self, text: str) -> dict[str, float]:
+        feats: dict[str, float] = {}
+        for tok in tokenize(text):
+            feats[tok] = feats.get(tok, 0.0) + 1.0
+            padded = f"<{tok}>"
+            for i in range(len(padded) - 2):
+                gram = "#" + padded[i:i + 3]
+                feats[gram] = feats.get(gram, 0.0) + self.trigram_weight
+        return feats
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            vec = out[row]
+            for feat, weight in self._features(text).items():
+                h = zlib.crc32(feat.encode())
+                vec[h % self.dim] += (1.0 + math.log(weight)) if h & 0x80000000 else -(1.0 + math.log(weight))
+        return normalize_rows(out)
+
+
+class SentenceTransformerEmbedder:
+    """Wraps a local sentence-transformers model (optional dependency)."""
+
+    def __init__(self, model_name: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError("EMBEDDER=sentence-transformers:... needs `pip install sentence-transformers`") from e
+        self.model = SentenceTransformer(model_name)
+        self.dim   = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vecs = self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+        return np.ascontiguousarray(vecs, dtype=np.float32)
+
+
+def make_embedder(spec: str, dim: int) -> Embedder:
+    """`hashing` or `sentence-transformers:<model name>`."""
+    if spec == "hashing":
+        return HashingEmbedder(dim)
+    if spec.startswith("sentence-transformers:"):
+        return SentenceTransformerEmbedder(spec.split(":", 1)[1])
+    raise RuntimeError(f"Unknown EMBEDDER '{spec}' (expected 'hashing' or 'sentence-transformers:<model>')")
+
+
+class VectorIndex:
+    """Row-normalised float32 matrix; cosine similarity is a single matrix product.
+
+    Rows are only ever appended (growth reallocates, never shrinks in place) and
+    deletes are tombstones, so a `view()` stays valid while writers keep adding.
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.dim = dim
+        self.n   = 0
+        self.deleted: set[int] = set()
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray) -> "VectorIndex":
+        index = cls(vectors.shape[1], capacity=max(len(vectors), 1))
+        index.add(vectors)
+        return index
+
+    @classmethod
+    def wrap(cls, matrix: np.ndarray) -> "VectorIndex":
+        """Serve an existing (possibly read-only memmapped) matrix without copying it.
+        The first `add` moves the rows into a private, growable array."""
+        index = cls(matrix.shape[1], capacity=0)
+        index._matrix = matrix
+        index.n = len(matrix)
+        return index
+
+    def __len__(self) -> int:
+        return self.n
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._matrix[:self.n]
+
+    def add(self, vectors: np.ndarray) -> range:
+        start, end = self.n, self.n + len(vectors)
+        if end > len(self._matrix):
+            grown = np.zeros((max(end, 2 * len(self._matrix)), self.dim), dtype=np.float32)
+            grown[:start] = self._matrix[:start]
+            self._matrix = grown
+        self._matrix[start:end] = vectors
+        self.n = end
+        return range(start, end)
+
+    def delete(self, ordinal: int):
+        self.deleted.add(ordinal)
+
+    def view(self) -> "VectorView":
+        return VectorView(self.matrix, np.fromiter(self.deleted, dtype=np.int64, count=len(self.deleted)))
+
+    def search(self, query_vec: np.ndarray, top_k: int) -> list[tuple[int, float]]:
+        return self.view().search(query_vec, top_k)
+
+    def search_batch(self, query_vecs: np.ndarray, top_k: int) -> list[list[tuple[int, float]]]:
+        return self.view().search_batch(query_vecs, top_k)
+
+
+class VectorView:
+    """Read-only, point-in-time view of a VectorIndex."""
+
+    __slots__ = ("matrix", "deleted")
+
+    def __init__(self, matrix: np.ndarray, deleted: np.ndarray):
+        self.matrix  = matrix
+        self.deleted = deleted
+
+    def search(self, query_vec: np.ndarray, top_k: int) -> list[tuple[int, float]]:
+        return self.search_batch(query_vec.reshape(1, -1), top_k)[0]
+
+    def search_batch(self, query_vecs: np.ndarray, top_k: int,
+                     allowed: Optional[np.ndarray] = None) -> list[list[tuple[int, float]]]:
+        """Score many queries with one (q, dim) x (dim, n) product; each result is best first.
+        With `allowed` (a boolean mask over ordinals) only those rows are gathered and scored."""
+        rows = None
+        if allowed is not None:
+            rows = np.flatnonzero(allowed)
+            if len(self.deleted):
+                rows = np.setdiff1d(rows, self.deleted, assume_unique=True)
+        n = len(self.matrix) if rows is None else len(rows)
+        if n == 0 or top_k <= 0:
+            return [[] for _ in range(len(query_vecs))]
+        if rows is None:
+            scores = query_vecs @ self.matrix.T
+            if len(self.deleted):
+                scores[:, self.deleted] = -np.inf
+        else:
+            scores = query_vecs @ self.matrix[rows].T
+        k = min(top_k, n)
+        if k < n:
+            top = np.argpartition(scores, n - k, axis=1)[:, n - k:]
+        else:
+            top = np.broadcast_to(np.arange(n), (len(scores), n))
+        results = []
+        for row, cand in zip(scores, top):
+            cand = cand[np.argsort(-row[cand])]
+            ids  = cand if rows is None else rows[cand]
+            results.append([(int(o), float(row[i])) for i, o in zip(cand, ids) if row[i] > 0])
+        return results
@@ -47,6 +47,25 @@ const CATEGORY_ICONS = {
     general: "🌱",
 };
 
+// ─── Snippet highlighting ──────────────────────────────────────────────────
+// The backend returns [start, end) ranges of query terms within each snippet.
+const highlightSnippet = (snippet, ranges) => {
+    if (!ranges?.length) return snippet;
+    const parts = [];
+    let pos = 0;
+    ranges.forEach(([start, end], i) => {
+        if (start > pos) parts.push(snippet.slice(pos, start));
+        parts.push(
+            <mark key={i} style={s.highlight}>
+                {snippet.slice(start, end)}
+            </mark>,
+        );
+        pos = end;
+    });
+    parts.push(snippet.slice(pos));
+    return parts;
+};
+
 // ─── Floating particles ────────────────────────────────────────────────────
 const PARTICLES = ["🌱", "🍃", "🌿", "🌊", "☀️", "🌍", "♻️", "🌲"];
 
@@ -63,6 +82,7 @@ export default function EcoSage() {
     const [loading, setLoading] = useState(false);
     const [backendStatus, setBackendStatus] = useState("checking"); // checking | online | offline
     const [activeSources, setActiveSources] = useState(null); // show sources panel
+    const [preview, setPreview] = useState(null); // documents matching the draft, from /retrieve
     const [particles] = useState(() =>
         Array.from({ length: 14 }, (_, i) => ({
             id: i,
@@ -75,6 +95,7 @@ export default function EcoSage() {
         })),
     );
     const bottomRef = useRef(null);
+    const sessionRef = useRef(null); // server-side conversation id from the backend
     const inputRef = useRef(null);
 
     // Check backend health on mount
@@ -91,20 +112,80 @@ export default function EcoSage() {
         bottomRef.current?.scrollIntoView({ behavior: "smooth" });
     }, [messages, loading]);
 
-    // ── Send via RAG backend ───────────────────────────────────────────────
-    const sendViaBackend = async (question, history) => {
-        const res = await fetch(`${API_BASE}/chat`, {
+    // Search-as-you-type: show which documents the draft question will draw on.
+    // /retrieve is generation-free and typo tolerant, so it is cheap to call per keystroke.
+    useEffect(() => {
+        const q = input.trim();
+        if (backendStatus !== "online" || q.length < 3) {
+            setPreview(null);
+            return;
+        }
+        const ctrl = new AbortController();
+        const timer = setTimeout(() => {
+            fetch(`${API_BASE}/retrieve?q=${encodeURIComponent(q)}&k=3`, { signal: ctrl.signal })
+                .then((r) => (r.ok ? r.json() : null))
+                .then((d) => setPreview(d?.results?.length ? d.results : null))
+                .catch(() => {});
+        }, 120);
+        return () => {
+            clearTimeout(timer);
+            ctrl.abort();
+        };
+    }, [input, backendStatus]);
+
+    // ── Send via RAG backend (SSE stream) ─────────────────────────────────
+    // Calls onUpdate with partial results as `sources` and `delta` events arrive.
+    // The backend keeps the conversation; history is only sent to seed a new session.
+    const sendViaBackend = async (question, history, onUpdate) => {
+        const body = sessionRef.current
+            ? { message: question, session_id: sessionRef.current }
+            : {
+                  message: question,
+                  history: history
+                      .slice(-8)
+                      .map((m) => ({ role: m.role, content: m.content })),
+              };
+        const res = await fetch(`${API_BASE}/chat/stream`, {
             method: "POST",
             headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({
-                message: question,
-                history: history
-                    .slice(-8)
-                    .map((m) => ({ role: m.role, content: m.content })),
-            }),
+            body: JSON.stringify(body),
         });
         if (!res.ok) throw new Error(`Backend error: ${res.status}`);
-        return await res.json();
+
+        const result = { answer: "", retrieved_docs: [], model: null };
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        for (;;) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let sep;
+            while ((sep = buffer.indexOf("\n\n")) !== -1) {
+                const frame = buffer.slice(0, sep);
+                buffer = buffer.slice(sep + 2);
+                let event = "message";
+                let data = "";
+                for (const line of frame.split("\n")) {
+                    if (line.startsWith("event: ")) event = line.slice(7);
+                    else if (line.startsWith("data: ")) data += line.slice(6);
+                }
+                const payload = data ? JSON.parse(data) : {};
+                if (event === "sources") {
+                    result.retrieved_docs = payload.retrieved_docs || [];
+                    result.model = payload.model;
+                    sessionRef.current = payload.session_id || null;
+                } else if (event === "delta") {
+                    result.answer += payload.text;
+                } else if (event === "done" && payload.degraded) {
+                    result.model = `${payload.model} (quick answer, model unavailable)`;
+                } else if (event === "error") {
+                    throw new Error(payload.detail || "Backend error");
+                }
+                onUpdate({ ...result });
+            }
+        }
+        return result;
     };
 
     // ── Fallback: direct Claude API ───────────────────────────────────────
@@ -136,6 +217,7 @@ export default function EcoSage() {
         const userMsg = (text || input).trim();
         if (!userMsg || loading) return;
         setInput("");
+        setPreview(null);
 
         const newHistory = [
             ...messages,
@@ -147,7 +229,20 @@ export default function EcoSage() {
         try {
             let result;
             if (backendStatus === "online") {
-                result = await sendViaBackend(userMsg, newHistory.slice(0, -1));
+                result = await sendViaBackend(
+                    userMsg,
+                    newHistory.slice(0, -1),
+                    (partial) =>
+                        setMessages([
+                            ...newHistory,
+                            {
+                                role: "assistant",
+                                content: partial.answer,
+                                sources: partial.retrieved_docs,
+                                model: partial.model,
+                            },
+                        ]),
+                );
             } else if (USE_FALLBACK) {
                 result = await sendViaFallback(
                     userMsg,
@@ -432,7 +527,10 @@ export default function EcoSage() {
                                                                 s.sourceSnippet
                                                             }
                                                         >
-                                                            {src.snippet}
+                                                            {highlightSnippet(
+                                                                src.snippet,
+                                                                src.highlights,
+                                                            )}
                                                         </p>
                                                     </div>
                                                 ))}
@@ -445,8 +543,10 @@ export default function EcoSage() {
                             </div>
                         ))}
 
-                        {/* Typing indicator */}
-                        {loading && (
+                        {/* Typing indicator (hidden once a streamed answer starts) */}
+                        {loading &&
+                            messages[messages.length - 1]?.role !==
+                                "assistant" && (
                             <div
                                 style={{
                                     ...s.row,
@@ -500,6 +600,18 @@ export default function EcoSage() {
                         <div ref={bottomRef} />
                     </div>
 
+                    {/* Live source preview */}
+                    {preview && !loading && (
+                        <div style={s.previewWrap}>
+                            <span style={s.suggestLabel}>Sources:</span>
+                            {preview.map((d) => (
+                                <span key={d.id} style={s.previewChip}>
+                                    {d.title}
+                                </span>
+                            ))}
+                        </div>
+                    )}
+
                     {/* Input */}
                     <div style={s.inputWrap}>
                         <textarea
@@ -851,6 +963,12 @@ const s = {
         margin: 0,
         lineHeight: 1.5,
     },
+    highlight: {
+        background: "rgba(16,185,129,0.25)",
+        color: "rgba(167,243,208,0.85)",
+        borderRadius: "3px",
+        padding: "0 2px",
+    },
     dots: {
         display: "flex",
         gap: "5px",
@@ -884,6 +1002,21 @@ const s = {
         fontFamily: "'Sora', sans-serif",
         textAlign: "left",
     },
+    previewWrap: {
+        display: "flex",
+        flexWrap: "wrap",
+        alignItems: "baseline",
+        gap: "6px",
+        padding: "8px 20px 0",
+        background: "rgba(4,12,6,0.7)",
+    },
+    previewChip: {
+        border: "1px solid rgba(52,211,153,0.12)",
+        borderRadius: "20px",
+        padding: "3px 10px",
+        fontSize: "0.68rem",
+        color: "rgba(167,243,208,0.6)",
+    },
     inputWrap: {
         display: "flex",
         gap: "10px",